@@ -0,0 +1,64 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections.abc import Callable
+
+from feral_services.home_size import HomeSizeTracker
+
+
+def _walk_size(root: str) -> int:
+    size = 0
+    for dirpath, _, filenames in os.walk(root):
+        for file in filenames:
+            size += os.path.getsize(os.path.join(dirpath, file))
+    return size
+
+
+def _make_tree(root: str, files: int, files_per_dir: int, top_level_dirs: int) -> list[str]:
+    directories = []
+    for n in range(0, files, files_per_dir):
+        directory = os.path.join(root, f"group{n // files_per_dir % top_level_dirs}", f"release{n}")
+        os.makedirs(directory)
+        directories.append(directory)
+        for i in range(min(files_per_dir, files - n)):
+            with open(os.path.join(directory, f"file{i}"), "wb") as file:
+                file.write(b"x" * (i % 64))
+    return directories
+
+
+def _timed(label: str, fn: Callable[[], int]) -> int:
+    started = time.perf_counter()
+    size = fn()
+    print(f"{label:<28} {time.perf_counter() - started:8.2f}s  {size:,} bytes")
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare a full os.walk with scandir and incremental rescans")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument("--top-level-dirs", type=int, default=16)
+    parser.add_argument("--changed-dirs", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Creating {args.files:,} files...")
+        directories = _make_tree(root, args.files, args.files_per_dir, args.top_level_dirs)
+
+        tracker = HomeSizeTracker(root)
+        _timed("full os.walk + getsize", lambda: _walk_size(root))
+        _timed("scandir cold scan, 1 worker", HomeSizeTracker(root, workers=1).scan)
+        _timed("tracker cold scan", tracker.scan)
+        _timed("tracker rescan, no changes", tracker.scan)
+
+        for directory in random.sample(directories, min(args.changed_dirs, len(directories))):
+            with open(os.path.join(directory, "new"), "wb") as file:
+                file.write(b"y" * 1024)
+        expected = _timed("full walk after changes", lambda: _walk_size(root))
+        assert _timed(f"tracker rescan, {args.changed_dirs} changed", tracker.scan) == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+from feral_services import jackett
+from feral_services.result_stream import ResultCollector, ResultsParser
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _result(n: int) -> dict[str, Any]:
+    return {
+        "FirstSeen": "0001-01-01T00:00:00",
+        "Tracker": "IPTorrents",
+        "TrackerId": "iptorrents",
+        "TrackerType": "private",
+        "CategoryDesc": "Movies/BluRay",
+        "BlackholeLink": None,
+        "Title": f"Some Release Name {n} 2023 REMASTERED 1080p BluRay H264 AAC-GROUP",
+        "Guid": f"https://jackett.example.com/dl/iptorrents/?jackett_apikey=abc&path=abc{n}&file=Some+Release",
+        "Link": f"https://jackett.example.com/dl/iptorrents/?jackett_apikey=abc&path=abc{n}&file=Some+Release",
+        "Details": f"https://iptorrents.example.com/details.php?id={n}",
+        "PublishDate": "2023-04-09T21:55:13.9457906+00:00",
+        "Category": [2050, 100048],
+        "Size": 2909840384 + n,
+        "Files": None,
+        "Grabs": 163,
+        "Description": "Tags: 9.3 1994 Drama 1080p Uploaded by: Someone",
+        "RageID": None,
+        "TVDBId": None,
+        "Imdb": 111161,
+        "TMDb": None,
+        "TVMazeId": None,
+        "TraktId": None,
+        "DoubanId": None,
+        "Genres": ["Drama"],
+        "Languages": [],
+        "Subs": [],
+        "Year": 1994,
+        "Author": None,
+        "BookTitle": None,
+        "Publisher": None,
+        "Artist": None,
+        "Album": None,
+        "Label": None,
+        "Track": None,
+        "Seeders": n % 500,
+        "Peers": n % 37,
+        "Poster": f"https://iptorrents.example.com/posters/{n}.jpg",
+        "InfoHash": None,
+        "MagnetUri": None,
+        "MinimumRatio": 1.0,
+        "MinimumSeedTime": 1209600,
+        "DownloadVolumeFactor": 1.0,
+        "UploadVolumeFactor": 1.0,
+        "Gain": 113.82000160217285,
+    }
+
+
+def _write_payload(path: str, results: int) -> None:
+    with open(path, "w") as file:
+        file.write('{"Results": [')
+        for n in range(results):
+            if n:
+                file.write(",")
+            json.dump(_result(n), file)
+        file.write('], "Indexers": []}')
+
+
+def _run_mode(mode: str, path: str) -> None:
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if mode == "full":
+        with open(path, "rb") as file:
+            body = file.read()
+        results = list({r["Guid"]: r for r in json.loads(body).get("Results") or []}.values())
+    else:
+        parser = ResultsParser(jackett._RESULT_FIELDS)
+        collector = ResultCollector(20 if mode == "stream-top-k" else None, jackett.RankingWeights().score)
+        with open(path, "rb") as file:
+            while chunk := file.read(_CHUNK_SIZE):
+                collector.extend(parser.feed(chunk))
+        parser.close()
+        results = collector.results()
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    print(f"{mode:<14} {elapsed:6.2f}s  peak RSS +{peak / 1024:7.1f} MiB  {len(results):,} results kept")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare full and streaming parsing of Jackett responses")
+    parser.add_argument("--results", type=int, default=50_000)
+    parser.add_argument("--mode", choices=["full", "stream", "stream-top-k"])
+    parser.add_argument("--payload")
+    args = parser.parse_args()
+
+    if args.mode:
+        _run_mode(args.mode, args.payload)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.json")
+        _write_payload(path, args.results)
+        print(f"Payload: {args.results:,} results, {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+        for mode in ("full", "stream", "stream-top-k"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.jackett_parse_bench", "--mode", mode, "--payload", path],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import httpx
+
+_TOKEN = "123456:load-test"
+_BOT_ID = 123456
+_JACKETT_SEARCH = "/api/v2.0/indexers/all/results"
+_ADD_TORRENT = "/rutorrent/php/addtorrent.php"
+_RESULT_ID = re.compile(r"^/get(\d+) - ", re.MULTILINE)
+_WEBHOOK_SECRET = "load-test-secret"
+
+
+def _string(value: bytes) -> bytes:
+    return b"%d:%s" % (len(value), value)
+
+
+def _torrent(n: int) -> bytes:
+    info = b"d6:lengthi1e4:name" + _string(b"Some.Show.S01E%02d.mkv" % (n % 100)) + b"6:pieces20:" + b"\0" * 20 + b"e"
+    return b"d8:announce" + _string(b"http://tracker/announce") + b"4:info" + info + b"e"
+
+
+class _Stub:
+    def __init__(self, handler: type[BaseHTTPRequestHandler], **attributes: Any) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        for name, value in attributes.items():
+            setattr(self.server, name, value)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "application/json", **headers: str) -> None:
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+
+class _JackettHandler(_QuietHandler):
+    def do_GET(self) -> None:
+        server: Any = self.server
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        url = urllib.parse.urlparse(self.path)
+        time.sleep(server.latency)
+        if url.path.startswith("/dl/"):
+            self._send(200, _torrent(int(url.path.rsplit("/", 1)[-1])), "application/x-bittorrent")
+            return
+
+        query = urllib.parse.parse_qs(url.query)["Query"][0]
+        results = [
+            {
+                "Guid": f"{base_url}/details/{query}/{n}",
+                "Title": f"{query} S01E{n % 100:02} 1080p WEB H264-GROUP",
+                "Tracker": "StubTracker",
+                "Size": 1_500_000_000 + n,
+                "Seeders": (n * 7919) % 500 + 1,
+                "Peers": n % 50,
+                "MagnetUri": None if n % 2 else f"magnet:?xt=urn:btih:{n:040x}",
+                "Link": f"{base_url}/dl/{n}",
+                "InfoHash": None,
+                "Details": f"{base_url}/details/{n}",
+                "Description": None,
+            }
+            for n in range(server.results)
+        ]
+        self._send(200, json.dumps({"Results": results, "Indexers": []}).encode())
+
+
+class _RuTorrentHandler(_QuietHandler):
+    def do_POST(self) -> None:
+        server: Any = self.server
+        self._body()
+        time.sleep(server.latency)
+        if self.path.startswith(_ADD_TORRENT):
+            self._send(302, Location=f"{_ADD_TORRENT}?result[]=Success")
+        else:
+            self._send(200, b'{"t": {}, "cid": 1}')
+
+    def do_GET(self) -> None:
+        self._send(200, b"<html></html>", "text/html")
+
+
+class _TelegramHandler(_QuietHandler):
+    def do_POST(self) -> None:
+        server: Any = self.server
+        method = self.path.rsplit("/", 1)[-1]
+        body = self._body()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body or b"{}")
+        else:
+            params = {key: values[0] for key, values in urllib.parse.parse_qs(body.decode()).items()}
+
+        result = server.telegram.handle(method, params)
+        self._send(200, json.dumps({"ok": True, "result": result}).encode())
+
+
+class _FakeTelegram:
+    def __init__(self) -> None:
+        self.sent: dict[str, int] = defaultdict(int)
+        self._condition = threading.Condition()
+        self._updates: list[dict[str, Any]] = []
+        self._next_update = 1
+        self._next_message = 1
+        self._replies: dict[int, Any] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._webhook: tuple[httpx.AsyncClient, str] | None = None
+
+    def use_webhook(self, client: httpx.AsyncClient, url: str) -> None:
+        self._webhook = (client, url)
+
+    async def push(self, chat_id: int, text: str) -> "asyncio.Future[str]":
+        self._loop = asyncio.get_running_loop()
+        reply: asyncio.Future[str] = self._loop.create_future()
+        command_length = len(text.split(" ", 1)[0])
+        with self._condition:
+            self._replies[chat_id] = reply
+            update = {
+                "update_id": self._next_update,
+                "message": {
+                    **self._message(chat_id, text, from_bot=False),
+                    "entities": [{"type": "bot_command", "offset": 0, "length": command_length}],
+                },
+            }
+            self._next_update += 1
+            if not self._webhook:
+                self._updates.append(update)
+                self._condition.notify_all()
+
+        if self._webhook:
+            client, url = self._webhook
+            response = await client.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": _WEBHOOK_SECRET})
+            response.raise_for_status()
+        return reply
+
+    def handle(self, method: str, params: dict[str, Any]) -> Any:
+        self.sent[method] += 1
+        if method == "getMe":
+            return {"id": _BOT_ID, "is_bot": True, "first_name": "Load", "username": "load_bot"}
+        if method == "getUpdates":
+            return self._get_updates(int(params.get("offset") or 0), float(params.get("timeout") or 0))
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params["chat_id"])
+            if method == "sendMessage":
+                self._reply(chat_id, params["text"])
+            return self._message(chat_id, params["text"], from_bot=True)
+        return True
+
+    def _get_updates(self, offset: int, timeout: float) -> list[dict[str, Any]]:
+        with self._condition:
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            if not self._updates:
+                self._condition.wait(min(timeout, 0.5))
+            return list(self._updates)
+
+    def _reply(self, chat_id: int, text: str) -> None:
+        with self._condition:
+            reply = self._replies.pop(chat_id, None)
+        if reply is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: reply.done() or reply.set_result(text))
+
+    def _message(self, chat_id: int, text: str, from_bot: bool) -> dict[str, Any]:
+        with self._condition:
+            message_id = self._next_message
+            self._next_message += 1
+        sender = {"id": _BOT_ID, "is_bot": True, "first_name": "Load"} if from_bot else None
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": sender
+            or {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}", "username": f"u{chat_id}"},
+            "text": text,
+        }
+
+
+async def _virtual_user(
+    telegram: _FakeTelegram,
+    user_id: int,
+    commands: int,
+    get_ratio: float,
+    queries: int,
+    latencies: dict[str, list[float]],
+) -> None:
+    rng = random.Random(user_id)
+    result_ids: list[str] = []
+    for _ in range(commands):
+        if result_ids and rng.random() < get_ratio:
+            command, text = "get", f"/get{rng.choice(result_ids)}"
+        else:
+            command, text = "search", f"/search show {rng.randrange(queries)}"
+
+        started = time.perf_counter()
+        reply = await asyncio.wait_for(await telegram.push(user_id, text), timeout=120)
+        latencies[command].append(time.perf_counter() - started)
+        if command == "search":
+            result_ids = _RESULT_ID.findall(reply)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+async def _run(args: argparse.Namespace, telegram: _FakeTelegram, bot_url: str) -> None:
+    from telegram.ext import Application
+
+    import main
+
+    for user_id in range(1, args.users + 1):
+        main._USERS.add(user_id)
+    main._USERS.flush()
+
+    application = main.build_application(Application.builder().token(_TOKEN).base_url(f"{bot_url}/bot"))
+    latencies: dict[str, list[float]] = defaultdict(list)
+    async with application, httpx.AsyncClient(timeout=30) as client:
+        await application.start()
+        assert application.updater is not None
+        if args.webhook:
+            port = _free_port()
+            webhook_url = f"http://127.0.0.1:{port}/webhook"
+            await application.updater.start_webhook(
+                listen="127.0.0.1",
+                port=port,
+                url_path="webhook",
+                webhook_url=webhook_url,
+                secret_token=_WEBHOOK_SECRET,
+            )
+            telegram.use_webhook(client, webhook_url)
+        else:
+            await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _virtual_user(telegram, user_id, args.commands, args.get_ratio, args.queries, latencies)
+                for user_id in range(1, args.users + 1)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+        await application.updater.stop()
+        await application.stop()
+    await main.post_shutdown(application)
+
+    total = sum(len(values) for values in latencies.values())
+    mode = "webhook" if args.webhook else "polling"
+    print(
+        f"{args.users} users x {args.commands} commands, {mode}, {args.workers} workers, "
+        f"Jackett {args.jackett_latency * 1000:.0f} ms"
+    )
+    print(f"{'throughput':<12} {total / elapsed:8.1f} commands/s ({total} in {elapsed:.2f}s)")
+    for command, values in sorted(latencies.items()):
+        print(
+            f"{command:<12} {len(values):6} runs  p50 {_percentile(values, 0.5) * 1000:8.1f} ms  "
+            f"p99 {_percentile(values, 0.99) * 1000:8.1f} ms  mean {statistics.fmean(values) * 1000:8.1f} ms"
+        )
+    print(f"{'max RSS':<12} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:8.1f} MiB (bot and stubs)")
+    print(f"{'Bot API':<12} " + ", ".join(f"{method} {count}" for method, count in sorted(telegram.sent.items())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Drive the bot's handlers against local Jackett/ruTorrent/Telegram stubs"
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--commands", type=int, default=10, help="commands per user")
+    parser.add_argument("--get-ratio", type=float, default=0.5, help="share of commands that are /get")
+    parser.add_argument("--queries", type=int, default=1000, help="distinct search terms")
+    parser.add_argument("--results", type=int, default=100, help="results per Jackett response")
+    parser.add_argument("--jackett-latency", type=float, default=0.05)
+    parser.add_argument("--rutorrent-latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent update workers (UPDATE_WORKERS)")
+    parser.add_argument("--webhook", action="store_true", help="receive updates through a local webhook")
+    args = parser.parse_args()
+
+    telegram = _FakeTelegram()
+    jackett_stub = _Stub(_JackettHandler, latency=args.jackett_latency, results=args.results)
+    ru_torrent_stub = _Stub(_RuTorrentHandler, latency=args.rutorrent_latency)
+    telegram_stub = _Stub(_TelegramHandler, telegram=telegram)
+    state = tempfile.TemporaryDirectory()
+
+    os.environ.update(
+        {
+            "TELEGRAM_TOKEN": _TOKEN,
+            "JACKETT_URL": jackett_stub.url,
+            "JACKETT_URL_SEARCH": _JACKETT_SEARCH,
+            "JACKETT_API_KEY": "key",
+            "JACKETT_INDEXERS": "",
+            "RU_TORRENT_URL": f"{ru_torrent_stub.url}{_ADD_TORRENT}",
+            "RU_TORRENT_TOKEN": "dXNlcjpwYXNz",
+            "USERS_DB": os.path.join(state.name, "users.sqlite"),
+            "RESULTS_DB": "",
+            "TORRENT_CACHE_DIR": "",
+            "METRICS_PORT": "",
+            "PROFILE": "",
+            "RATE_LIMIT_SEARCH": "1000000/1,1000000/1",
+            "RATE_LIMIT_GET": "1000000/1,1000000/1",
+            "UPDATE_WORKERS": str(args.workers),
+        }
+    )
+    if "main" in sys.modules:
+        raise RuntimeError("main must be imported after the stub environment is configured")
+
+    try:
+        asyncio.run(_run(args, telegram, telegram_stub.url))
+    finally:
+        for stub in (jackett_stub, ru_torrent_stub, telegram_stub):
+            stub.close()
+        state.cleanup()
+
+
+if __name__ == "__main__":
+    main()
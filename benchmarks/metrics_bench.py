@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import time
+
+from feral_services import metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-request cost of recording metrics")
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    duration = metrics.histogram("bench_seconds", "Benchmark", ("command",))
+    errors = metrics.counter("bench_errors_total", "Benchmark", ("command",))
+
+    async def handler() -> None:
+        pass
+
+    timed_handler = metrics.timed(duration, errors, command="search")(handler)
+
+    async def run(func: object) -> float:
+        started = time.perf_counter()
+        for _ in range(args.calls):
+            await func()  # type: ignore[operator]
+        return time.perf_counter() - started
+
+    bare = asyncio.run(run(handler))
+    timed = asyncio.run(run(timed_handler))
+    print(f"{'bare handler':<24} {bare / args.calls * 1e9:8.0f} ns/call")
+    print(f"{'timed handler':<24} {timed / args.calls * 1e9:8.0f} ns/call")
+    print(f"{'overhead':<24} {(timed - bare) / args.calls * 1e9:8.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
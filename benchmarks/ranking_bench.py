@@ -0,0 +1,72 @@
+import argparse
+import functools
+import random
+import timeit
+from typing import Any
+
+from feral_services import jackett
+
+
+def _previous_top(results: list[dict[str, Any]], count: int) -> list[dict[str, Any]]:
+    top = sorted(results, key=lambda k: k.get("Seeders", 0), reverse=True)[:count]
+    return [result for result in top if result["Seeders"] >= 1]
+
+
+def _releases(count: int, rng: random.Random) -> list[dict[str, Any]]:
+    # Roughly three copies of each release across trackers, half of them without an InfoHash.
+    releases = []
+    for n in range(count):
+        release = rng.randrange(max(count // 3, 1))
+        releases.append(
+            {
+                "Guid": str(n),
+                "Title": f"Some.Show.S{release // 100:02}E{release % 100:02}.1080p.WEB.H264-GROUP",
+                "Size": 1024**3 + release,
+                "Seeders": rng.randint(0, 500),
+                "Peers": rng.randint(0, 50),
+                "Tracker": rng.choice(["1337x", "TGx", "IPTorrents", "RARBG"]),
+                "InfoHash": f"{release:040x}" if rng.random() < 0.5 else None,
+            }
+        )
+    return releases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare full sort with heap top-K ranking")
+    parser.add_argument("--results", type=int, default=10_000)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = [
+        {
+            "Guid": str(n),
+            "Seeders": rng.choice([0, 0, rng.randint(1, 5000)]),
+            "Size": rng.randint(1, 60) * 1024**3,
+            "Gain": rng.random() * 500,
+            "DownloadVolumeFactor": rng.choice([0.0, 0.5, 1.0]),
+        }
+        for n in range(args.results)
+    ]
+    weights = jackett.RankingWeights()
+    combined = jackett.RankingWeights(seeders=1, size_gb=-0.5, gain=0.1, freeleech=50)
+    assert _previous_top(results, args.top) == jackett.rank_results(results, args.top, weights)
+
+    for label, fn in [
+        ("sorted + slice (previous)", lambda: _previous_top(results, args.top)),
+        ("heap top-K, seeders", lambda: jackett.rank_results(results, args.top, weights)),
+        ("heap top-K, combined score", lambda: jackett.rank_results(results, args.top, combined)),
+    ]:
+        per_call = min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat
+        print(f"{label:<28} {per_call * 1000:8.3f} ms per ranking of {args.results:,}")
+
+    for count in (args.results // 10, args.results, args.results * 10):
+        releases = _releases(count, rng)
+        merged = jackett.merge_duplicates(releases)
+        per_call = min(timeit.repeat(functools.partial(jackett.merge_duplicates, releases), number=5, repeat=3)) / 5
+        print(f"{'merge duplicates':<28} {per_call * 1000:8.3f} ms for {count:,} results -> {len(merged):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from feral_services.jackett import TorrentInfo
+from feral_services.result_store import ResultStore
+
+
+@dataclass
+class _UnslottedTorrentInfo:
+    name: str
+    size: str
+    seeds: int
+    peers: int
+    source: str
+    magnet: str
+    link: str
+
+
+def _fill(store: Any, info_type: Callable[..., Any], users: int, results_per_user: int) -> None:
+    for user_id in range(users):
+        store[user_id] = {
+            str(10000 + n): info_type(
+                f"Some.Release.Name.S01E{n:02}.1080p.WEB.H264-GROUP",
+                "2.71 GB",
+                n,
+                n,
+                "IPTorrents",
+                "",
+                f"http://jackett/dl/{user_id}/{n}",
+            )
+            for n in range(results_per_user)
+        }
+
+
+def _measure(label: str, fill: Callable[[], Any]) -> None:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = fill()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} {current / 1024 / 1024:8.1f} MiB  {elapsed:6.2f}s  {len(kept):,} users kept")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memory used by per-user search results")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--results-per-user", type=int, default=20)
+    parser.add_argument("--max-results", type=int, default=100_000)
+    args = parser.parse_args()
+
+    def unbounded_dict() -> dict[int, Any]:
+        results: dict[int, Any] = {}
+        _fill(results, _UnslottedTorrentInfo, args.users, args.results_per_user)
+        return results
+
+    def unbounded_slots() -> dict[int, Any]:
+        results: dict[int, Any] = {}
+        _fill(results, TorrentInfo, args.users, args.results_per_user)
+        return results
+
+    def bounded_store() -> ResultStore:
+        store = ResultStore(ttl=86400, max_results=args.max_results)
+        _fill(store, TorrentInfo, args.users, args.results_per_user)
+        return store
+
+    _measure("dict + dataclass (previous)", unbounded_dict)
+    _measure("dict + slotted dataclass", unbounded_slots)
+    _measure(f"ResultStore(max_results={args.max_results:,})", bounded_store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Any
+
+from feral_services.search_index import SearchIndex
+
+_WORDS = ["arcane", "severance", "andor", "shogun", "fallout", "succession", "dune", "oppenheimer", "barbie", "alien"]
+
+
+def _results(count: int, rng: random.Random) -> list[dict[str, Any]]:
+    return [
+        {
+            "Guid": f"https://tracker/{n}",
+            "Title": f"{rng.choice(_WORDS).title()} S{rng.randint(1, 5):02}E{rng.randint(1, 12):02} 1080p WEB H264-GROUP",
+            "Size": rng.randint(1, 60) * 1024**3,
+            "Seeders": rng.randint(0, 5000),
+            "Peers": rng.randint(0, 100),
+            "Tracker": rng.choice(["1337x", "TGx", "IPTorrents"]),
+            "MagnetUri": None,
+            "Link": f"https://tracker/dl/{n}",
+        }
+        for n in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure search index writes and lookups")
+    parser.add_argument("--results", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = _results(args.results, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        index = SearchIndex(os.path.join(directory, "index.db"), max_age=86400)
+
+        started = time.perf_counter()
+        for start in range(0, len(results), args.batch):
+            index.add(results[start : start + args.batch])
+        elapsed = time.perf_counter() - started
+        print(f"add {args.batch}-result batches   {elapsed / (len(results) / args.batch) * 1000:8.2f} ms per batch")
+
+        started = time.perf_counter()
+        index.add(results[: args.batch])
+        print(f"upsert {args.batch} existing       {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+        queries = [f"{rng.choice(_WORDS)} s{rng.randint(1, 5):02}e{rng.randint(1, 12):02}" for _ in range(args.queries)]
+        started = time.perf_counter()
+        found = sum(len((index.search(query) or ([], 0.0))[0]) for query in queries)
+        elapsed = time.perf_counter() - started
+        print(
+            f"search                      {elapsed / len(queries) * 1000:8.2f} ms per query, {found / len(queries):.0f} hits"
+        )
+
+        started = time.perf_counter()
+        hits = len((index.search(_WORDS[0]) or ([], 0.0))[0])
+        print(f"search one word             {(time.perf_counter() - started) * 1000:8.2f} ms, {hits} hits (limit)")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from benchmarks.home_size_bench import _make_tree
+from feral_services.home_size import HomeSizeTracker
+
+_TOKEN = "123456:startup-test"
+_USER_ID = 42
+_MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+class _Telegram:
+    # Answers every getUpdates with a fresh /space command once the previous one has been replied to.
+    def __init__(self, started: float) -> None:
+        self.started = started
+        self.first_poll: float | None = None
+        self.replies: list[tuple[float, str]] = []
+        self._condition = threading.Condition()
+        self._next_update = 1
+        self._waiting_reply = False
+
+    def handle(self, method: str, params: dict[str, Any]) -> Any:
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Startup", "username": "startup_bot"}
+        if method == "getUpdates":
+            return self._get_updates()
+        if method == "sendMessage":
+            with self._condition:
+                self.replies.append((time.perf_counter() - self.started, params["text"]))
+                self._waiting_reply = False
+                self._condition.notify_all()
+            return {
+                "message_id": len(self.replies),
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "text": params["text"],
+            }
+        return True
+
+    def _get_updates(self) -> list[dict[str, Any]]:
+        with self._condition:
+            if self.first_poll is None:
+                self.first_poll = time.perf_counter() - self.started
+            if self._waiting_reply:
+                self._condition.wait(0.5)
+                return []
+            self._waiting_reply = True
+            update_id = self._next_update
+            self._next_update += 1
+        chat = {"id": _USER_ID, "type": "private"}
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": chat,
+            "from": {"id": _USER_ID, "is_bot": False, "first_name": "User"},
+            "text": "/space",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        }
+        return [{"update_id": update_id, "message": message}]
+
+    def wait_for(self, predicate: Callable[["_Telegram"], bool], timeout: float) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: predicate(self), timeout)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        server: Any = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body or b"{}")
+        else:
+            params = {key: values[0] for key, values in urllib.parse.parse_qs(body.decode()).items()}
+        response = json.dumps({"ok": True, "result": server.telegram.handle(self.path.rsplit("/", 1)[-1], params)})
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response.encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def _import_seconds() -> float:
+    code = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(_MAIN), capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip())
+
+
+def _run_bot(home: str, workdir: str, providers: str, timeout: float) -> _Telegram:
+    server: Any = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = {
+        **os.environ,
+        "HOME": home,
+        "TELEGRAM_TOKEN": _TOKEN,
+        "TELEGRAM_BASE_URL": f"http://127.0.0.1:{server.server_address[1]}/bot",
+        "SPACE_PROVIDERS": providers,
+    }
+    env.pop("WEBHOOK_URL", None)
+
+    telegram = _Telegram(time.perf_counter())
+    server.telegram = telegram
+    process = subprocess.Popen([sys.executable, _MAIN], cwd=workdir, env=env, stdout=subprocess.DEVNULL)
+    try:
+        telegram.wait_for(lambda t: any("calculating" not in text for _, text in t.replies), timeout)
+    finally:
+        process.terminate()
+        process.wait()
+        server.shutdown()
+        server.server_close()
+    return telegram
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure time until the bot polls and answers /space")
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument("--top-level-dirs", type=int, default=16)
+    parser.add_argument("--providers", default="walk", help="SPACE_PROVIDERS for the bot")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(f"import main: {_import_seconds():.3f}s")
+    with tempfile.TemporaryDirectory() as home, tempfile.TemporaryDirectory() as workdir:
+        print(f"Creating {args.files:,} files...")
+        _make_tree(home, args.files, args.files_per_dir, args.top_level_dirs)
+        with open(os.path.join(workdir, "users.json"), "w") as file:
+            json.dump([_USER_ID], file)
+
+        started = time.perf_counter()
+        HomeSizeTracker(home).scan()
+        print(f"cold home scan: {time.perf_counter() - started:.3f}s")
+
+        telegram = _run_bot(home, workdir, args.providers, args.timeout)
+        if telegram.first_poll is None:
+            print("bot never polled")
+            return
+        print(f"first getUpdates: {telegram.first_poll:.3f}s")
+        calculating = [at for at, text in telegram.replies if "calculating" in text]
+        if calculating:
+            print(f"first /space reply: {calculating[0]:.3f}s (still calculating, {len(calculating)} replies)")
+        sizes = [at for at, text in telegram.replies if "calculating" not in text]
+        print(f"first /space with a size: {sizes[0]:.3f}s" if sizes else "no size before the timeout")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import importlib
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from feral_services import bencode
+
+
+def _string(value: bytes) -> bytes:
+    return b"%d:%s" % (len(value), value)
+
+
+def _make_torrent(size: int, files: int) -> bytes:
+    file_list = b"".join(
+        b"d6:lengthi%de4:pathl%s%see" % (n * 1000, _string(b"Season 01"), _string(b"Episode.%04d.mkv" % n))
+        for n in range(files)
+    )
+    info = (
+        b"d5:filesl"
+        + file_list
+        + b"e4:name"
+        + _string(b"Some.Show.S01.1080p.WEB.H264-GROUP")
+        + b"12:piece lengthi262144e6:pieces"
+        + _string(b"\x5a" * size)
+        + b"e"
+    )
+    return b"d8:announce" + _string(b"http://tracker.example.com/announce") + b"4:info" + info + b"e"
+
+
+def _measure(label: str, fn: Callable[[], Any], repeat: int) -> None:
+    per_call = min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {per_call * 1000:9.3f} ms  peak alloc {peak / 1024 / 1024:7.2f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare full bencode decoding with the info.name scanner")
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    torrent = _make_torrent(args.size_mb * 1024 * 1024, args.files)
+    print(f"Torrent: {len(torrent) / 1024 / 1024:.1f} MiB, {args.files:,} files")
+
+    try:
+        bencodepy: Any = importlib.import_module("bencodepy")
+    except ImportError:
+        print("bencodepy not installed, skipping the full decode comparison")
+    else:
+        _measure("bencodepy.decode (previous)", lambda: bencodepy.decode(torrent)[b"info"][b"name"].decode(), 3)
+    _measure("bencode.torrent_name", lambda: bencode.torrent_name(torrent), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
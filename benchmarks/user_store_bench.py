@@ -0,0 +1,37 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from feral_services.user_store import UserStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of persisting users during an /auth storm")
+    parser.add_argument("--users", type=int, default=5_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.json")
+
+        users: set[int] = set()
+        started = time.perf_counter()
+        for user_id in range(args.users):
+            users.add(user_id)
+            with open(path, "w") as file:
+                json.dump(list(users), file)
+        print(f"{'rewrite per /auth (previous)':<32} {time.perf_counter() - started:6.2f}s  {args.users:,} writes")
+
+        for label, db_path in (("UserStore (json)", None), ("UserStore (sqlite)", os.path.join(directory, "users.db"))):
+            os.remove(path)
+            started = time.perf_counter()
+            store = UserStore(path, db_path=db_path, delay=1.0)
+            for user_id in range(args.users):
+                store.add(user_id)
+            store.close()
+            print(f"{label:<32} {time.perf_counter() - started:6.2f}s  {store.writes:,} writes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import hashlib
+
+_DICT = ord("d")
+_LIST = ord("l")
+_INT = ord("i")
+_END = ord("e")
+
+
+def _string(data: bytes, position: int) -> tuple[int, int]:
+    colon = data.index(b":", position)
+    start = colon + 1
+    end = start + int(data[position:colon])
+    if not start <= end <= len(data):
+        raise ValueError("String length is out of range")
+    return start, end
+
+
+def _skip(data: bytes, position: int) -> int:
+    kind = data[position]
+    if kind == _INT:
+        return data.index(b"e", position) + 1
+    if kind in (_LIST, _DICT):
+        position += 1
+        while data[position] != _END:
+            position = _skip(data, position)
+        return position + 1
+    return _string(data, position)[1]
+
+
+def _dict_value(data: bytes, position: int, key: bytes) -> int:
+    if data[position] != _DICT:
+        raise ValueError("Expected a dictionary")
+    position += 1
+    while data[position] != _END:
+        start, end = _string(data, position)
+        if data[start:end] == key:
+            return end
+        position = _skip(data, end)
+    raise KeyError(key)
+
+
+def torrent_name(data: bytes) -> str:
+    try:
+        info = _dict_value(data, 0, b"info")
+        name = _dict_value(data, info, b"name")
+        start, end = _string(data, name)
+        return data[start:end].decode()
+    except (IndexError, KeyError, RecursionError, UnicodeDecodeError) as e:
+        raise ValueError(f"Not a valid torrent file: {e!r}") from e
+
+
+def info_hash(data: bytes) -> str:
+    try:
+        start = _dict_value(data, 0, b"info")
+        end = _skip(data, start)
+    except (IndexError, KeyError, RecursionError) as e:
+        raise ValueError(f"Not a valid torrent file: {e!r}") from e
+    return hashlib.sha1(memoryview(data)[start:end]).hexdigest()
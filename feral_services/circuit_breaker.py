@@ -0,0 +1,153 @@
+import asyncio
+import bisect
+import math
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from feral_services import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+TRANSITIONS = metrics.counter(
+    "feral_circuit_transitions_total", "Circuit breaker state changes", ("upstream", "target", "state")
+)
+HEDGES = metrics.counter("feral_hedged_requests_total", "Hedged upstream requests by which request won", ("winner",))
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    # Opens after `failures` consecutive failures and rejects calls for `reset_seconds`; then a single trial call
+    # is let through (half open), and its outcome closes the circuit or opens it again.
+    def __init__(
+        self,
+        upstream: str,
+        target: str,
+        failures: int = 5,
+        reset_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.upstream = upstream
+        self.target = target
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.rejected = 0
+        self._clock = clock
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_started: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.retry_in() == 0:
+            self._change(HALF_OPEN)
+        return self._state
+
+    def retry_in(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_seconds - self._clock())
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            # A trial that never reported back (e.g. it was cancelled) must not wedge the circuit half open.
+            now = self._clock()
+            if self._trial_started is None or now - self._trial_started >= self.reset_seconds:
+                self._trial_started = now
+                return True
+        self.rejected += 1
+        return False
+
+    def record(self, success: bool) -> None:
+        self._trial_started = None
+        if success:
+            self.consecutive_failures = 0
+            if self._state != CLOSED:
+                self._change(CLOSED)
+            return
+
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failures:
+            self._opened_at = self._clock()
+            if self._state != OPEN:
+                self._change(OPEN)
+
+    def unavailable(self, name: str) -> str:
+        return f"{name} is unavailable, retrying in {math.ceil(self.retry_in())}s"
+
+    def _change(self, state: str) -> None:
+        print(f"Circuit {self.upstream}/{self.target}: {self._state} -> {state}")
+        self._state = state
+        TRANSITIONS.inc(upstream=self.upstream, target=self.target, state=state)
+
+
+class LatencyWindow:
+    # The last `size` latencies, kept sorted alongside arrival order so a percentile is a lookup.
+    def __init__(self, size: int = 200, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._order: deque[float] = deque(maxlen=size)
+        self._sorted: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def observe(self, seconds: float) -> None:
+        if len(self._order) == self._order.maxlen:
+            del self._sorted[bisect.bisect_left(self._sorted, self._order[0])]
+        self._order.append(seconds)
+        bisect.insort(self._sorted, seconds)
+
+    def percentile(self, fraction: float) -> float | None:
+        if len(self._sorted) < self.min_samples:
+            return None
+        return self._sorted[min(len(self._sorted) - 1, int(fraction * len(self._sorted)))]
+
+
+async def hedged(call: Callable[[bool], Awaitable[Any]], delay: float | None, failed: Callable[[Any], bool]) -> Any:
+    # Starts a second identical call (told it is the hedge) if the first is still running after `delay`; the first
+    # good answer wins.
+    tasks = [asyncio.ensure_future(call(False))]
+    try:
+        if delay is None:
+            return await tasks[0]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(call(True)))
+
+        result: Any = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if not failed(result):
+                    if len(tasks) > 1:
+                        HEDGES.inc(winner="hedge" if task is tasks[1] else "first")
+                    return result
+        if len(tasks) > 1:
+            HEDGES.inc(winner="none")
+        return result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def from_env(upstream: str, target: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        upstream,
+        target,
+        failures=int(os.getenv("CIRCUIT_FAILURES") or 5),
+        reset_seconds=float(os.getenv("CIRCUIT_RESET_SECONDS") or 30),
+    )
@@ -0,0 +1,128 @@
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+_Inode = tuple[int, int]
+
+
+@dataclass
+class _DirEntry:
+    mtime_ns: int
+    files_size: int
+    subdirs: list[str]
+    linked: dict[_Inode, int] = field(default_factory=dict)
+
+
+@dataclass
+class _SubtreeScan:
+    index: dict[str, _DirEntry] = field(default_factory=dict)
+    files_size: int = 0
+    linked: dict[_Inode, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return self.files_size + sum(self.linked.values())
+
+
+def _list_dir(path: str, mtime_ns: int) -> _DirEntry:
+    entry = _DirEntry(mtime_ns, 0, [])
+    try:
+        with os.scandir(path) as it:
+            for dir_entry in it:
+                try:
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        entry.subdirs.append(dir_entry.path)
+                        continue
+                    st = dir_entry.stat()
+                except OSError:
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    continue
+                if st.st_nlink > 1 and not dir_entry.is_symlink():
+                    entry.linked[(st.st_dev, st.st_ino)] = st.st_size
+                else:
+                    entry.files_size += st.st_size
+    except OSError:
+        pass
+    return entry
+
+
+def _scan_subtree(root: str, previous: dict[str, _DirEntry], visited: set[_Inode], recurse: bool) -> _SubtreeScan:
+    scan = _SubtreeScan()
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if (st.st_dev, st.st_ino) in visited:
+            continue
+        visited.add((st.st_dev, st.st_ino))
+
+        entry = previous.get(path)
+        if entry is None or entry.mtime_ns != st.st_mtime_ns:
+            entry = _list_dir(path, st.st_mtime_ns)
+        scan.index[path] = entry
+        scan.files_size += entry.files_size
+        scan.linked.update(entry.linked)
+        if recurse:
+            stack.extend(entry.subdirs)
+    return scan
+
+
+class HomeSizeTracker:
+    # Directory mtimes only change when entries are added, removed or renamed, so an
+    # incremental scan misses files growing in place; every full_scan_every-th scan
+    # relists everything to correct for that.
+    def __init__(self, root: str, full_scan_every: int = 24, workers: int = 8) -> None:
+        self.root = root
+        self.full_scan_every = full_scan_every
+        self.workers = workers
+        self.total = 0
+        self.top_level: dict[str, int] = {}
+        self.updated_at: float | None = None
+        self._index: dict[str, _DirEntry] = {}
+        self._scans = 0
+        self._lock = threading.Lock()
+
+    @property
+    def scanning(self) -> bool:
+        return self._lock.locked()
+
+    def age(self) -> float | None:
+        return None if self.updated_at is None else time.time() - self.updated_at
+
+    def largest(self, count: int) -> list[tuple[str, int]]:
+        return sorted(self.top_level.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def scan(self, full: bool = False) -> int:
+        with self._lock:
+            full = full or self._scans % self.full_scan_every == 0
+            previous = {} if full else self._index
+            visited: set[_Inode] = set()
+
+            root = _scan_subtree(self.root, previous, visited, recurse=False)
+            subdirs = root.index[self.root].subdirs if self.root in root.index else []
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                subtrees = list(pool.map(lambda path: _scan_subtree(path, previous, visited, True), subdirs))
+
+            index = root.index
+            files_size = root.files_size
+            linked = root.linked
+            for subtree in subtrees:
+                index.update(subtree.index)
+                files_size += subtree.files_size
+                linked.update(subtree.linked)
+
+            self._index = index
+            self._scans += 1
+            self.total = files_size + sum(linked.values())
+            self.top_level = {
+                os.path.basename(path): subtree.total for path, subtree in zip(subdirs, subtrees, strict=True)
+            }
+            self.updated_at = time.time()
+            return self.total
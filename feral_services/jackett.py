@@ -1,16 +1,93 @@
+import asyncio
+import hashlib
+import heapq
+import math
 import os
-import random
+import re
+import sqlite3
+import time
 import traceback
-from dataclasses import dataclass
+from collections.abc import AsyncGenerator, Container, MutableMapping
+from dataclasses import dataclass, field
 from typing import Any
 
-import requests
-from requests.exceptions import ConnectionError, Timeout
+import httpx
+from dotenv import load_dotenv
+
+from feral_services import circuit_breaker, metrics, tracing
+from feral_services.cache import SingleFlight, TTLCache
+from feral_services.circuit_breaker import CircuitBreaker, LatencyWindow
+from feral_services.rate_limit import ConcurrencyLimit
+from feral_services.result_stream import ResultCollector, ResultsParser
+from feral_services.search_index import SearchIndex
+
+load_dotenv()
 
 _TOTAL_RESULTS_TO_RETURN = 20
+_ID_MIN = 10000
+_ID_SPACE = 90000
+_CATEGORIES = (
+    "2000",
+    "2010",
+    "2020",
+    "2030",
+    "2040",
+    "2045",
+    "2050",
+    "2060",
+    "2070",
+    "5000",
+    "5010",
+    "5020",
+    "5030",
+    "5040",
+    "5045",
+    "5060",
+    "5070",
+    "5080",
+)
+_TIMEOUT = httpx.Timeout(60, connect=3)
+_MIN_ADAPTIVE_TIMEOUT = 10.0
+_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+_CLIENT: httpx.AsyncClient | None = None
+_RESULT_FIELDS = (
+    "Guid",
+    "Title",
+    "Size",
+    "Seeders",
+    "Peers",
+    "Tracker",
+    "MagnetUri",
+    "Link",
+    "InfoHash",
+    "Gain",
+    "DownloadVolumeFactor",
+)
+_ALL_INDEXERS = "/indexers/all/"
+_DEFAULT_INDEXER_TIMEOUT = 10.0
+_DEFAULT_TORRENT_MAX_BYTES = 32 * 1024 * 1024
+_LINK_TIMEOUT = httpx.Timeout(20, connect=3)
+_CONCURRENCY = ConcurrencyLimit(int(os.getenv("JACKETT_CONCURRENCY") or 4))
+_LINK_CONCURRENCY = ConcurrencyLimit(int(os.getenv("JACKETT_LINK_CONCURRENCY") or 4))
+_TITLE_SEPARATORS = re.compile(r"[\W_]+")
+_FINGERPRINT_SIZE_BYTES = 1024 * 1024
 
+_SearchKey = tuple[str, frozenset[str], str | None]
+_SearchResult = tuple[str | None, list[dict[str, Any]] | None]
+_CACHE = TTLCache(
+    max_size=int(os.getenv("JACKETT_CACHE_SIZE") or 256),
+    ttl=float(os.getenv("JACKETT_CACHE_TTL") or 300),
+)
+_IN_FLIGHT = SingleFlight()
+_BREAKERS: dict[str, CircuitBreaker] = {}
+_LATENCIES: dict[str, LatencyWindow] = {}
+_INDEX_PATH = os.getenv("SEARCH_INDEX_DB")
+_INDEX = (
+    SearchIndex(_INDEX_PATH, max_age=float(os.getenv("SEARCH_INDEX_MAX_AGE") or 30 * 86400)) if _INDEX_PATH else None
+)
 
-@dataclass
+
+@dataclass(slots=True)
 class TorrentInfo:
     name: str
     size: str
@@ -19,94 +96,444 @@ class TorrentInfo:
     source: str
     magnet: str
     link: str
+    guid: str = ""
+    info_hash: str = ""
+    other_sources: int = 0
 
     def format_response(self, req_id: str | None = None) -> str:
         prefix = f"/get{req_id} - " if req_id else "Success - "
-        return f"{prefix}{self.name}\n└─ {self.source} | Seeds: {self.seeds:,} | Size: {self.size}"
-
-
-def search(query: str) -> tuple[str | None, list[dict[str, Any]] | None]:
-    params = (
-        ("apikey", os.getenv("JACKETT_API_KEY")),
-        ("Query", query),
-        (
-            "Category[]",
-            [
-                "2000",
-                "2010",
-                "2020",
-                "2030",
-                "2040",
-                "2045",
-                "2050",
-                "2060",
-                "2070",
-                "5000",
-                "5010",
-                "5020",
-                "5030",
-                "5040",
-                "5045",
-                "5060",
-                "5070",
-                "5080",
-            ],
-        ),
-    )
+        source = f"{self.source} +{self.other_sources}" if self.other_sources else self.source
+        return f"{prefix}{self.name}\n└─ {source} | Seeds: {self.seeds:,} | Size: {self.size}"
+
+
+@dataclass(frozen=True)
+class RankingWeights:
+    seeders: float = 1.0
+    size_gb: float = 0.0
+    gain: float = 0.0
+    freeleech: float = 0.0
+
+    def score(self, result: dict[str, Any]) -> float:
+        score = self.seeders * (result.get("Seeders") or 0)
+        if self.size_gb:
+            score += self.size_gb * (result.get("Size") or 0) / 1024**3
+        if self.gain:
+            score += self.gain * (result.get("Gain") or 0)
+        if self.freeleech:
+            download_factor = result.get("DownloadVolumeFactor")
+            score += self.freeleech * (1 - (1 if download_factor is None else download_factor))
+        return score
+
+
+_SEEDERS_ONLY = RankingWeights()
+
+
+@dataclass
+class ResultPages:
+    # The rest of a search, kept unranked until /more first asks for a later page.
+    results: list[dict[str, Any]]
+    weights: RankingWeights
+    shown: int
+    total: int = field(init=False)
+    ranked: bool = False
+
+    def __post_init__(self) -> None:
+        self.total = len(self.results)
+
+    def next_page(self, count: int) -> tuple[int, list[dict[str, Any]]]:
+        if not self.ranked:
+            self.results = rank_results(self.results, len(self.results), self.weights)
+            self.ranked = True
+        start = self.shown
+        self.shown = min(start + count, len(self.results))
+        return start, self.results[start : self.shown]
+
+
+@dataclass
+class IndexerResult:
+    indexer: str
+    error: str | None
+    results: list[dict[str, Any]]
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(timeout=_TIMEOUT, limits=_LIMITS)
+    return _CLIENT
+
+
+async def close() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+    if _INDEX is not None:
+        _INDEX.close()
+
+
+def configured_indexers() -> list[str]:
+    return [indexer.strip() for indexer in (os.getenv("JACKETT_INDEXERS") or "").split(",") if indexer.strip()]
+
+
+def indexer_timeout() -> float:
+    return float(os.getenv("JACKETT_INDEXER_TIMEOUT") or _DEFAULT_INDEXER_TIMEOUT)
+
+
+def cache_stats() -> dict[str, int]:
+    return {
+        "hits": _CACHE.hits,
+        "misses": _CACHE.misses,
+        "coalesced": _IN_FLIGHT.coalesced,
+        "size": len(_CACHE),
+    }
+
+
+def index_stats() -> dict[str, int] | None:
+    if _INDEX is None:
+        return None
+    return {"results": len(_INDEX), "writes": _INDEX.writes}
+
+
+def concurrency_stats() -> dict[str, int]:
+    return {"active": _CONCURRENCY.active, "waiting": _CONCURRENCY.waiting, "limit": _CONCURRENCY.limit}
+
+
+def link_concurrency_stats() -> dict[str, int]:
+    return {
+        "active": _LINK_CONCURRENCY.active,
+        "waiting": _LINK_CONCURRENCY.waiting,
+        "limit": _LINK_CONCURRENCY.limit,
+    }
+
+
+def _breaker(target: str) -> CircuitBreaker:
+    if (breaker := _BREAKERS.get(target)) is None:
+        breaker = _BREAKERS[target] = circuit_breaker.from_env("jackett", target)
+    return breaker
+
+
+def _latency(target: str) -> LatencyWindow:
+    if (latency := _LATENCIES.get(target)) is None:
+        latency = _LATENCIES[target] = LatencyWindow()
+    return latency
+
+
+def breakers() -> list[CircuitBreaker]:
+    return list(_BREAKERS.values())
+
+
+def circuit_open(indexer: str | None = None) -> bool:
+    return _breaker(indexer or "all").state == circuit_breaker.OPEN
+
+
+def _search_timeout(target: str) -> httpx.Timeout:
+    # Jackett answers once its slowest tracker does, so the read timeout follows the observed p95 for the target.
+    multiplier = float(os.getenv("JACKETT_TIMEOUT_P95_MULTIPLIER") or 3)
+    p95 = _latency(target).percentile(0.95)
+    if not multiplier or p95 is None:
+        return _TIMEOUT
+    read = min(_TIMEOUT.read or 60, max(_MIN_ADAPTIVE_TIMEOUT, p95 * multiplier))
+    return httpx.Timeout(read, connect=_TIMEOUT.connect)
+
+
+def _hedge_delay(target: str) -> float | None:
+    if (os.getenv("JACKETT_HEDGE") or "").casefold() not in ("1", "true", "yes"):
+        return None
+    return _latency(target).percentile(0.95)
+
+
+def timeout_stats() -> dict[str, tuple[float, float]]:
+    return {
+        target: (p95, _search_timeout(target).read or 0)
+        for target, latency in _LATENCIES.items()
+        if (p95 := latency.percentile(0.95)) is not None
+    }
+
+
+def _cache_key(query: str, indexer: str | None) -> _SearchKey:
+    return " ".join(query.casefold().split()), frozenset(_CATEGORIES), indexer
+
+
+def is_cached(query: str, indexer: str | None = None) -> bool:
+    return _cache_key(query, indexer) in _CACHE
+
+
+async def search(query: str, indexer: str | None = None, deadline: float | None = None) -> _SearchResult:
+    key = _cache_key(query, indexer)
+    if (cached := _CACHE.get(key)) is not None:
+        return None, cached
+    result: _SearchResult = await _IN_FLIGHT.do(key, lambda: _search_and_cache(key, query, indexer, deadline))
+    return result
+
+
+async def _search_and_cache(
+    key: _SearchKey, query: str, indexer: str | None, deadline: float | None = None
+) -> _SearchResult:
+    target = indexer or "all"
+    breaker = _breaker(target)
+    if not breaker.allow():
+        return breaker.unavailable("Jackett"), None
+
+    timeout = _search_timeout(target)
+    async with _CONCURRENCY.slot():
+        started = time.perf_counter()
+        with tracing.span("jackett.search", indexer=target, timeout=timeout.read):
+            # The deadline starts once a slot is free, so time spent queued behind other searches doesn't count.
+            try:
+                async with asyncio.timeout(deadline):
+                    error, results = await circuit_breaker.hedged(
+                        lambda hedge: _timed_search(query, indexer, timeout, hedge),
+                        _hedge_delay(target),
+                        lambda result: bool(result[0]),
+                    )
+            except TimeoutError:
+                error, results = "timed out", None
+        metrics.observe_upstream("jackett", target, started, bool(error))
+    breaker.record(not error)
+    if not error and results is not None:
+        _CACHE.set(key, results)
+        await _add_to_index(results)
+    return error, results
+
+
+async def _timed_search(query: str, indexer: str | None, timeout: httpx.Timeout, hedge: bool) -> _SearchResult:
+    # Each attempt feeds the latency window on its own, so a hedge winning doesn't pull the p95 (and with it the
+    # hedge delay and timeout) down. A hedge needs a free slot, and is skipped rather than queued without one.
+    latency = _latency(indexer or "all")
+    if hedge and not _CONCURRENCY.available:
+        return "no free slot to hedge", None
+    started = time.perf_counter()
+    try:
+        if hedge:
+            async with _CONCURRENCY.slot():
+                error, results = await _search_upstream(query, indexer, timeout)
+        else:
+            error, results = await _search_upstream(query, indexer, timeout)
+    except asyncio.CancelledError:
+        # A first attempt that lost to its hedge took at least this long.
+        if not hedge and time.perf_counter() - started >= (latency.percentile(0.95) or math.inf):
+            latency.observe(time.perf_counter() - started)
+        raise
+    if not error:
+        latency.observe(time.perf_counter() - started)
+    return error, results
+
+
+async def _add_to_index(results: list[dict[str, Any]]) -> None:
+    if _INDEX is None:
+        return
+    try:
+        with tracing.span("search_index.add", results=len(results)):
+            await asyncio.to_thread(_INDEX.add, results)
+    except sqlite3.Error as e:
+        print(f"Could not update the search index: {e}")
+
+
+async def search_index(query: str) -> tuple[list[dict[str, Any]], float] | None:
+    if _INDEX is None:
+        return None
+    try:
+        with tracing.span("search_index.search"):
+            return await asyncio.to_thread(_INDEX.search, query)
+    except sqlite3.Error as e:
+        print(f"Could not read the search index: {e}")
+        return None
+
+
+async def _search_upstream(query: str, indexer: str | None, timeout: httpx.Timeout = _TIMEOUT) -> _SearchResult:
+    params = {
+        "apikey": os.getenv("JACKETT_API_KEY"),
+        "Query": query,
+        "Category[]": _CATEGORIES,
+    }
 
     try:
         jackett_url = os.getenv("JACKETT_URL")
         jackett_search = os.getenv("JACKETT_URL_SEARCH")
         if not jackett_url or not jackett_search:
             return "Missing JACKETT_URL or JACKETT_URL_SEARCH environment variables", None
+        if indexer:
+            if _ALL_INDEXERS not in jackett_search:
+                return f"JACKETT_URL_SEARCH must contain {_ALL_INDEXERS} to search single indexers", None
+            jackett_search = jackett_search.replace(_ALL_INDEXERS, f"/indexers/{indexer}/", 1)
 
-        response = requests.get(
-            jackett_url + jackett_search,
-            params=params,
-            timeout=(3, 60),
-        )
-    except Timeout:
+        async with _get_client().stream(
+            "GET", jackett_url + jackett_search, params=params, timeout=timeout
+        ) as response:
+            if not response.is_success:
+                return str(response.status_code or 500), None
+            results = await _read_results(response)
+    except httpx.TimeoutException:
         return "Jackett timed out", None
-    except ConnectionError:
+    except httpx.NetworkError:
         return "Jackett didn't respond", None
     except Exception as e:
         error_msg = f"Something went wrong: {type(e).__name__}: {e!s}"
         stack_trace = traceback.format_exc()
         return f"{error_msg}\n\nStack trace:\n{stack_trace}", None
 
-    if not response.ok:
-        return str(response.status_code or 500), None
+    return None, results
 
-    json_response = response.json()
-    unfiltered_results = json_response.get("Results") or []
-    unique_results_by_guid = {r["Guid"]: r for r in unfiltered_results}
-    return None, list(unique_results_by_guid.values())
 
+async def _read_results(response: httpx.Response) -> list[dict[str, Any]]:
+    parser = ResultsParser(_RESULT_FIELDS)
+    top_k = int(os.getenv("JACKETT_STREAM_TOP_K") or 0)
+    collector = ResultCollector(top_k, ranking_weights().score)
+    parse_seconds = 0.0
+    async for chunk in response.aiter_bytes():
+        started = time.perf_counter()
+        collector.extend(parser.feed(chunk))
+        parse_seconds += time.perf_counter() - started
+    parser.close()
+    tracing.annotate(parse_seconds=round(parse_seconds, 6), results=collector.seen)
+    return collector.results()
 
-def format_and_filter_results(
-    results: list[dict[str, Any]], user_id: int, user_id_to_results: dict[int, dict[str, TorrentInfo]]
-) -> str:
-    results_by_top_seeds = sorted(
-        results,
-        key=lambda k: k.get("Seeders", 0),
-        reverse=True,
-    )[:_TOTAL_RESULTS_TO_RETURN]
 
-    returned_results = []
-    user_id_to_results[user_id] = {}
+async def fetch_link(link: str) -> tuple[str | None, str | None, bytes | None]:
+    async with _LINK_CONCURRENCY.slot():
+        started = time.perf_counter()
+        with tracing.span("jackett.fetch_link"):
+            error, magnet, torrent_file = await _fetch_link(link)
+        metrics.observe_upstream("jackett", "link", started, bool(error))
+    return error, magnet, torrent_file
+
+
+async def _fetch_link(link: str) -> tuple[str | None, str | None, bytes | None]:
+    max_bytes = int(os.getenv("TORRENT_MAX_BYTES") or _DEFAULT_TORRENT_MAX_BYTES)
+    try:
+        async with _get_client().stream("GET", link, timeout=_LINK_TIMEOUT) as response:
+            if response.status_code == 302:
+                return None, response.headers["Location"], None
+            if response.is_error:
+                return f"Indexer returned {response.status_code}", None, None
+            if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                return "Torrent file is too large", None, None
+
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    return "Torrent file is too large", None, None
+                chunks.append(chunk)
+    except httpx.TimeoutException:
+        return "Indexer timed out", None, None
+    except httpx.HTTPError as e:
+        return f"Indexer didn't respond: {type(e).__name__}", None, None
+
+    return None, None, b"".join(chunks)
+
+
+async def _search_indexer(query: str, indexer: str, deadline: float, fan_out: asyncio.Semaphore) -> IndexerResult:
+    async with fan_out:
+        error, results = await search(query, indexer, deadline)
+    return IndexerResult(indexer, error, results or [])
+
+
+async def search_indexers(
+    query: str, indexers: list[str], timeout: float | None = None
+) -> AsyncGenerator[IndexerResult, None]:
+    # One search takes at most half the Jackett slots, so a fan-out over many indexers can't starve other users.
+    deadline = indexer_timeout() if timeout is None else timeout
+    fan_out = asyncio.Semaphore(max(1, _CONCURRENCY.limit // 2))
+    tasks = [asyncio.create_task(_search_indexer(query, indexer, deadline, fan_out)) for indexer in indexers]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
 
-    for result in reversed(results_by_top_seeds):
-        if result["Seeders"] < 1:
-            continue
+def ranking_weights() -> RankingWeights:
+    weights = {}
+    for pair in (os.getenv("JACKETT_RANKING") or "").split(","):
+        name, _, value = pair.partition("=")
+        if name.strip() in RankingWeights.__dataclass_fields__ and value.strip():
+            weights[name.strip()] = float(value)
+    return RankingWeights(**weights)
 
-        req_id = str(random.randint(10000, 99999))
-        count = 0
-        while req_id in user_id_to_results[user_id] and count < 5:
-            req_id = str(random.randint(10000, 99999))
-            count += 1
-            if count > 4:
-                return "id collision happened?..."
 
+def _fingerprint(result: dict[str, Any]) -> tuple[str, int] | None:
+    title = _TITLE_SEPARATORS.sub(" ", (result.get("Title") or "").casefold()).strip()
+    size = result.get("Size") or 0
+    if not title or not size:
+        return None
+    return title, round(size / _FINGERPRINT_SIZE_BYTES)
+
+
+def merge_duplicates(results: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Groups the same release seen on several trackers, by InfoHash or else by normalized title and size, keeping
+    # the best-seeded copy as the source for /get. Trackers share the swarm, so seeders are maxed rather than summed.
+    groups: list[list[dict[str, Any]]] = []
+    hashes: list[str] = []
+    by_hash: dict[str, int] = {}
+    by_fingerprint: dict[tuple[str, int], int] = {}
+    for result in results:
+        info_hash = (result.get("InfoHash") or "").casefold()
+        fingerprint = _fingerprint(result)
+        index = by_hash.get(info_hash) if info_hash else None
+        if index is None and fingerprint is not None:
+            index = by_fingerprint.get(fingerprint)
+            if index is not None and info_hash and hashes[index]:
+                index = None
+
+        if index is None:
+            index = len(groups)
+            groups.append([])
+            hashes.append("")
+            if fingerprint is not None:
+                by_fingerprint.setdefault(fingerprint, index)
+        groups[index].append(result)
+        if info_hash and not hashes[index]:
+            hashes[index] = info_hash
+            by_hash[info_hash] = index
+
+    return [
+        group[0] if len(group) == 1 else _merge_group(group, info_hash)
+        for group, info_hash in zip(groups, hashes, strict=True)
+    ]
+
+
+def _merge_group(group: list[dict[str, Any]], info_hash: str) -> dict[str, Any]:
+    best = max(group, key=lambda result: result.get("Seeders") or 0)
+    trackers = {result.get("Tracker") for result in group} - {best.get("Tracker")}
+    merged = {
+        **best,
+        "Seeders": best.get("Seeders") or 0,
+        "Peers": max(result.get("Peers") or 0 for result in group),
+        "InfoHash": best.get("InfoHash") or info_hash or None,
+    }
+    if trackers:
+        # Tracker stays the best source's name, since ruTorrent labels the torrent with it.
+        merged["OtherTrackers"] = len(trackers)
+    return merged
+
+
+def rank_results(
+    results: list[dict[str, Any]], count: int, weights: RankingWeights | None = None
+) -> list[dict[str, Any]]:
+    weights = weights or ranking_weights()
+    seeded = [result for result in results if (result.get("Seeders") or 0) >= 1]
+    if weights == _SEEDERS_ONLY:
+        return heapq.nlargest(count, seeded, key=lambda result: result["Seeders"])
+    return heapq.nlargest(count, seeded, key=weights.score)
+
+
+def _result_id(result: dict[str, Any], taken: Container[str]) -> str:
+    guid = result.get("Guid") or result.get("Link") or result["Title"]
+    digest = hashlib.blake2b(guid.encode(), digest_size=8).digest()
+    slot = int.from_bytes(digest, "big") % _ID_SPACE
+    while (req_id := str(_ID_MIN + slot)) in taken:
+        slot = (slot + 1) % _ID_SPACE
+    return req_id
+
+
+def _add_results(results: list[dict[str, Any]], user_results: dict[str, TorrentInfo]) -> list[str]:
+    returned_results = []
+    for result in reversed(results):
+        req_id = _result_id(result, user_results)
         torrent_info = TorrentInfo(
             name=result["Title"],
             size=f"{round((result['Size'] / 1024 / 1024 / 1024), 2)} GB",
@@ -115,11 +542,60 @@ def format_and_filter_results(
             source=result["Tracker"],
             magnet=result["MagnetUri"],
             link=result["Link"],
+            guid=result.get("Guid") or "",
+            info_hash=(result.get("InfoHash") or "").casefold(),
+            other_sources=result.get("OtherTrackers") or 0,
         )
 
-        user_id_to_results[user_id][req_id] = torrent_info
+        user_results[req_id] = torrent_info
         returned_results.append(torrent_info.format_response(req_id))
+    return returned_results
+
+
+def _more_hint(remaining: int) -> str:
+    return f"\n\n/more - next {min(remaining, _TOTAL_RESULTS_TO_RETURN)} of {remaining} more" if remaining > 0 else ""
+
+
+def format_and_filter_results(
+    results: list[dict[str, Any]],
+    user_id: int,
+    user_id_to_results: MutableMapping[int, dict[str, TorrentInfo]],
+    pages: TTLCache | None = None,
+) -> str:
+    results = merge_duplicates(results)
+    weights = ranking_weights()
+    top_results = rank_results(results, _TOTAL_RESULTS_TO_RETURN, weights)
+
+    user_results: dict[str, TorrentInfo] = {}
+    returned_results = _add_results(top_results, user_results)
+    user_id_to_results[user_id] = user_results
 
     result_count_str = f"Results ({len(returned_results)}/{len(results)})"
     returned_results_str = "\n\n".join(returned_results)
-    return f"{result_count_str}\n\n{returned_results_str}"
+    text = f"{result_count_str}\n\n{returned_results_str}"
+    if pages is not None:
+        pages.set(user_id, ResultPages(results, weights, len(top_results)))
+        remaining = sum(1 for result in results if (result.get("Seeders") or 0) >= 1) - len(top_results)
+        text += _more_hint(remaining)
+    return text
+
+
+def format_more_results(
+    user_id: int, user_id_to_results: MutableMapping[int, dict[str, TorrentInfo]], pages: TTLCache
+) -> str:
+    page = pages.get(user_id)
+    previous_results = user_id_to_results.get(user_id)
+    if page is None or previous_results is None:
+        return "Results expired, please /search again"
+
+    start, page_results = page.next_page(_TOTAL_RESULTS_TO_RETURN)
+    if not page_results:
+        return "No more results"
+
+    user_results = dict(previous_results)
+    returned_results = _add_results(page_results, user_results)
+    user_id_to_results[user_id] = user_results
+
+    result_count_str = f"Results ({start + 1}-{page.shown}/{page.total})"
+    returned_results_str = "\n\n".join(returned_results)
+    return f"{result_count_str}\n\n{returned_results_str}{_more_hint(len(page.results) - page.shown)}"
@@ -0,0 +1,218 @@
+import bisect
+import functools
+import threading
+import time
+from collections.abc import Callable, Coroutine, Mapping
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_Labels = tuple[str, ...]
+
+
+def _format_labels(names: _Labels, values: _Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: _Labels = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: dict[_Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: _Labels = (), buckets: tuple[float, ...] = _BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values: dict[_Labels, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        self._observe(tuple(labels[name] for name in self.labels), value)
+
+    def _observe(self, key: _Labels, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(tuple(labels[name] for name in self.labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts, strict=True):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Callback:
+    # Read at scrape time, so counters that already exist elsewhere cost nothing per request.
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        kind: str,
+        read: Callable[[], float | Mapping[_Labels, float]],
+        labels: _Labels = (),
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labels = labels
+        self._read = read
+
+    def render(self) -> list[str]:
+        value = self._read()
+        values = value.items() if isinstance(value, Mapping) else [((), value)]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+        return lines
+
+
+_METRICS: dict[str, Counter | Histogram | Callback] = {}
+
+
+def _register(metric: Any) -> Any:
+    if metric.name in _METRICS:
+        raise ValueError(f"Metric {metric.name} is already registered")
+    _METRICS[metric.name] = metric
+    return metric
+
+
+def counter(name: str, help_text: str, labels: _Labels = ()) -> Counter:
+    registered: Counter = _register(Counter(name, help_text, labels))
+    return registered
+
+
+def histogram(name: str, help_text: str, labels: _Labels = ()) -> Histogram:
+    registered: Histogram = _register(Histogram(name, help_text, labels))
+    return registered
+
+
+def callback(
+    name: str,
+    help_text: str,
+    kind: str,
+    read: Callable[[], float | Mapping[_Labels, float]],
+    labels: _Labels = (),
+) -> None:
+    _register(Callback(name, help_text, kind, read, labels))
+
+
+def unregister(name: str) -> None:
+    _METRICS.pop(name, None)
+
+
+def render() -> str:
+    lines = []
+    for metric in list(_METRICS.values()):
+        try:
+            lines += metric.render()
+        except Exception as e:
+            lines.append(f"# {metric.name} failed: {type(e).__name__}")
+    return "\n".join(lines) + "\n"
+
+
+def timed(
+    duration: Histogram, errors: Counter | None = None, **labels: str
+) -> Callable[[Callable[..., Coroutine[Any, Any, Any]]], Callable[..., Coroutine[Any, Any, Any]]]:
+    key = tuple(labels[name] for name in duration.labels)
+
+    def decorator(func: Callable[..., Coroutine[Any, Any, Any]]) -> Callable[..., Coroutine[Any, Any, Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(1.0, **labels)
+                raise
+            finally:
+                duration._observe(key, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", _CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+UPSTREAM_SECONDS = histogram(
+    "feral_upstream_request_seconds", "Duration of requests to Jackett and ruTorrent", ("upstream", "target")
+)
+UPSTREAM_ERRORS = counter(
+    "feral_upstream_errors_total", "Failed requests to Jackett and ruTorrent", ("upstream", "target")
+)
+
+
+def observe_upstream(upstream: str, target: str, started: float, failed: bool) -> None:
+    UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream=upstream, target=target)
+    if failed:
+        UPSTREAM_ERRORS.inc(upstream=upstream, target=target)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable, Hashable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from feral_services.cache import TTLCache
+
+
+@dataclass(frozen=True)
+class Limit:
+    count: float
+    per_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.count / self.per_seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        count, _, per_seconds = value.partition("/")
+        limit = cls(float(count), float(per_seconds or 1))
+        if limit.count <= 0 or limit.per_seconds <= 0:
+            raise ValueError(f"Invalid rate limit: {value!r}")
+        return limit
+
+
+class TokenBucket:
+    def __init__(self, limit: Limit, clock: Callable[[], float] = time.monotonic) -> None:
+        self.limit = limit
+        self._clock = clock
+        self._tokens = limit.count
+        self._updated = clock()
+
+    def wait_time(self) -> float:
+        now = self._clock()
+        self._tokens = min(self.limit.count, self._tokens + (now - self._updated) * self.limit.rate)
+        self._updated = now
+        return max(0.0, (1 - self._tokens) / self.limit.rate)
+
+    def take(self) -> None:
+        self._tokens -= 1
+
+
+class RateLimiter:
+    # Admitted requests may borrow tokens ahead of time; the debt is the wait they are queued for.
+    def __init__(
+        self,
+        per_user: Limit,
+        overall: Limit,
+        max_wait: float,
+        max_users: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_wait = max_wait
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.waiting = 0
+        self._per_user = per_user
+        self._clock = clock
+        self._overall = TokenBucket(overall, clock)
+        self._users = TTLCache(max_size=max_users, ttl=per_user.per_seconds + max_wait, clock=clock)
+
+    def acquire(self, user_id: Hashable) -> tuple[bool, float]:
+        bucket: TokenBucket | None = self._users.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self._per_user, self._clock)
+        wait = max(bucket.wait_time(), self._overall.wait_time())
+        if wait > self.max_wait:
+            self.rejected += 1
+            return False, wait
+
+        bucket.take()
+        self._overall.take()
+        self._users.set(user_id, bucket)
+        self.admitted += 1
+        if wait > 0:
+            self.queued += 1
+        return True, wait
+
+    async def wait(self, seconds: float) -> None:
+        self.waiting += 1
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.waiting -= 1
+
+
+class ConcurrencyLimit:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def available(self) -> bool:
+        return self.active + self.waiting < self.limit
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        semaphore = self._semaphore
+
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            semaphore.release()
@@ -0,0 +1,142 @@
+import dataclasses
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, MutableMapping
+
+from feral_services.jackett import TorrentInfo
+
+_UserResults = dict[str, TorrentInfo]
+_Entry = tuple[float, _UserResults]
+
+
+class ResultStore(MutableMapping[int, _UserResults]):
+    # Writes to the database are batched and flushed from a timer thread, off the event loop that stores results.
+    def __init__(
+        self,
+        ttl: float,
+        max_results: int,
+        path: str | None = None,
+        clock: Callable[[], float] = time.time,
+        delay: float = 1.0,
+    ) -> None:
+        self.ttl = ttl
+        self.max_results = max_results
+        self.delay = delay
+        self.writes = 0
+        self._clock = clock
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._pending: dict[int, _Entry | None] = {}
+        self._timer: threading.Timer | None = None
+        self._db: sqlite3.Connection | None = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (user_id INTEGER PRIMARY KEY, expires_at REAL, data TEXT)"
+            )
+            self._db.execute("DELETE FROM results WHERE expires_at <= ?", (self._clock(),))
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._entries))
+
+    def __getitem__(self, user_id: int) -> _UserResults:
+        entry = self._entries.get(user_id) or self._load(user_id)
+        if entry is None:
+            raise KeyError(user_id)
+
+        expires_at, results = entry
+        if expires_at <= self._clock():
+            del self[user_id]
+            raise KeyError(user_id)
+
+        self._remember(user_id, expires_at, results)
+        return results
+
+    def __setitem__(self, user_id: int, results: _UserResults) -> None:
+        expires_at = self._clock() + self.ttl
+        self._remember(user_id, expires_at, results)
+        self._write(user_id, (expires_at, results))
+
+    def __delitem__(self, user_id: int) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry:
+            self._count -= len(entry[1])
+        self._write(user_id, None)
+
+    @property
+    def result_count(self) -> int:
+        return self._count
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending or not self._db:
+                return
+
+            replaced = [
+                (
+                    user_id,
+                    entry[0],
+                    json.dumps({req_id: dataclasses.astuple(info) for req_id, info in entry[1].items()}),
+                )
+                for user_id, entry in self._pending.items()
+                if entry is not None
+            ]
+            deleted = [(user_id,) for user_id, entry in self._pending.items() if entry is None]
+            with self._db:
+                self._db.executemany("REPLACE INTO results VALUES (?, ?, ?)", replaced)
+                self._db.executemany("DELETE FROM results WHERE user_id = ?", deleted)
+            self._pending = {}
+            self.writes += 1
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._db:
+                self._db.close()
+                self._db = None
+
+    def _write(self, user_id: int, entry: _Entry | None) -> None:
+        if not self._db:
+            return
+        with self._lock:
+            self._pending[user_id] = entry
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _remember(self, user_id: int, expires_at: float, results: _UserResults) -> None:
+        if (previous := self._entries.get(user_id)) is not None:
+            self._count -= len(previous[1])
+        self._entries[user_id] = (expires_at, results)
+        self._entries.move_to_end(user_id)
+        self._count += len(results)
+        while self._count > self.max_results and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._count -= len(evicted)
+
+    def _load(self, user_id: int) -> _Entry | None:
+        with self._lock:
+            if not self._db:
+                return None
+            if user_id in self._pending:
+                return self._pending[user_id]
+            row = self._db.execute("SELECT expires_at, data FROM results WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        try:
+            results = {req_id: TorrentInfo(*fields) for req_id, fields in json.loads(row[1]).items()}
+        except (TypeError, ValueError):
+            return None
+        return row[0], results
@@ -0,0 +1,88 @@
+import codecs
+import heapq
+import itertools
+import json
+import re
+from collections.abc import Callable, Collection, Iterable
+from typing import Any
+
+_RESULTS_START = re.compile(r'"Results"\s*:\s*\[')
+_SEPARATORS = re.compile(r"[\s,]*")
+_SEEK_TAIL = 32
+
+
+class ResultsParser:
+    def __init__(self, fields: Collection[str]) -> None:
+        self.done = False
+        self._fields = fields
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._in_results = False
+
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        if self.done:
+            return []
+        self._buffer += self._text.decode(chunk)
+
+        if not self._in_results:
+            match = _RESULTS_START.search(self._buffer)
+            if not match:
+                self._buffer = self._buffer[-_SEEK_TAIL:]
+                return []
+            self._buffer = self._buffer[match.end() :]
+            self._in_results = True
+
+        results = []
+        position = 0
+        while True:
+            match = _SEPARATORS.match(self._buffer, position)
+            position = match.end() if match else position
+            if position >= len(self._buffer):
+                break
+            if self._buffer[position] == "]":
+                self.done = True
+                break
+            try:
+                result, position = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                break
+            results.append({field: result[field] for field in self._fields if field in result})
+
+        self._buffer = "" if self.done else self._buffer[position:]
+        return results
+
+    def close(self) -> None:
+        if self._in_results and not self.done:
+            raise ValueError("Jackett response ended inside the Results array")
+
+
+class ResultCollector:
+    def __init__(self, limit: int | None = None, key: Callable[[dict[str, Any]], float] | None = None) -> None:
+        self.limit = limit
+        self.seen = 0
+        self._key = key or (lambda result: result.get("Seeders") or 0)
+        self._by_guid: dict[str, dict[str, Any]] = {}
+        self._guids: set[str] = set()
+        self._heap: list[tuple[float, int, dict[str, Any]]] = []
+        self._order = itertools.count()
+
+    def extend(self, results: Iterable[dict[str, Any]]) -> None:
+        for result in results:
+            self.seen += 1
+            if not self.limit:
+                self._by_guid[result["Guid"]] = result
+                continue
+            if result["Guid"] in self._guids or (result.get("Seeders") or 0) < 1:
+                continue
+            self._guids.add(result["Guid"])
+            item = (self._key(result), -next(self._order), result)
+            if len(self._heap) < self.limit:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heappushpop(self._heap, item)
+
+    def results(self) -> list[dict[str, Any]]:
+        if not self.limit:
+            return list(self._by_guid.values())
+        return [result for _, _, result in sorted(self._heap, reverse=True)]
@@ -1,17 +1,36 @@
+import asyncio
 import os
+import random
+import time
 import urllib.parse
+from typing import Any
 
-import bencodepy
-import requests
+import httpx
 from dotenv import load_dotenv
 
+from feral_services import bencode, circuit_breaker, metrics, tracing
+from feral_services.cache import SingleFlight, TTLCache
+from feral_services.circuit_breaker import CircuitBreaker, CircuitOpenError
 from feral_services.jackett import TorrentInfo
+from feral_services.rate_limit import ConcurrencyLimit
 
 load_dotenv()
 
 
 _HEADERS = {"Authorization": f"Basic {os.getenv('RU_TORRENT_TOKEN')}"}
 _RU_TORRENT_URL = os.getenv("RU_TORRENT_URL")
+_TIMEOUT = httpx.Timeout(30, connect=5)
+_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=5)
+_RETRIES = 3
+_BACKOFF = 0.5
+_RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+_ADD_TORRENT_PATH = "/php/addtorrent.php"
+_HTTPRPC_PATH = "/plugins/httprpc/action.php"
+_LOADED_KEY = "loaded"
+_LOADED = TTLCache(max_size=1, ttl=float(os.getenv("RU_TORRENT_LIST_TTL") or 30))
+_LOADED_FLIGHT = SingleFlight()
+_CONCURRENCY = ConcurrencyLimit(int(os.getenv("RU_TORRENT_CONCURRENCY") or 4))
+_BREAKER = circuit_breaker.from_env("rutorrent", "all")
 
 
 def _format_return_url(url: str) -> str:
@@ -20,51 +39,187 @@ def _format_return_url(url: str) -> str:
     return query_params["result[]"][0].strip().casefold()
 
 
-def upload_torrent(torrent_file: bytes, label: str, username: str, torrent_info: TorrentInfo) -> str:
-    metadata = bencodepy.decode(torrent_file)
-    file_name = urllib.parse.quote(
-        metadata[b"info"][b"name"].decode(),
-    )
+def _format_error(error: httpx.HTTPError) -> str:
+    if isinstance(error, httpx.TimeoutException):
+        return "Error: ruTorrent timed out"
+    return "Error: ruTorrent didn't respond"
+
+
+def _rpc_url() -> str | None:
+    if rpc_url := os.getenv("RU_TORRENT_RPC_URL"):
+        return rpc_url
+    if _RU_TORRENT_URL and _ADD_TORRENT_PATH in _RU_TORRENT_URL:
+        return _RU_TORRENT_URL.split(_ADD_TORRENT_PATH)[0] + _HTTPRPC_PATH
+    return None
+
+
+class RuTorrentClient:
+    def __init__(
+        self,
+        headers: dict[str, str],
+        retries: int = _RETRIES,
+        backoff: float = _BACKOFF,
+        transport: httpx.AsyncBaseTransport | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or _BREAKER
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=_TIMEOUT,
+            limits=_LIMITS,
+            follow_redirects=True,
+            transport=transport,
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _post(self, url: str, **kwargs: Any) -> httpx.Response:
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.unavailable("ruTorrent"))
+        try:
+            response = await self._post_with_retries(url, **kwargs)
+        except httpx.HTTPError:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(response.status_code < 500)
+        return response
+
+    async def _post_with_retries(self, url: str, **kwargs: Any) -> httpx.Response:
+        target = urllib.parse.urlparse(url).path.rsplit("/", 1)[-1]
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                async with _CONCURRENCY.slot():
+                    with tracing.span("rutorrent.post", target=target, attempt=attempt):
+                        response = await self._client.post(url, **kwargs)
+                metrics.observe_upstream("rutorrent", target, started, response.is_error)
+                if response.status_code < 500 or attempt >= self.retries:
+                    return response
+            except _RETRYABLE_ERRORS:
+                metrics.observe_upstream("rutorrent", target, started, True)
+                if attempt >= self.retries:
+                    raise
+            await asyncio.sleep(random.uniform(0, self.backoff * 2**attempt))
+            attempt += 1
+
+    async def loaded_hashes(self, rpc_url: str) -> set[str]:
+        response = await self._post(rpc_url, data={"mode": "list"})
+        response.raise_for_status()
+        torrents = response.json().get("t") or {}
+        return {info_hash.casefold() for info_hash in torrents}
+
+    async def upload_torrent(self, url: str, torrent_file: bytes, label: str, torrent_info: TorrentInfo) -> str:
+        try:
+            file_name = urllib.parse.quote(bencode.torrent_name(torrent_file))
+        except ValueError:
+            return "Error: Not a valid torrent file"
+
+        try:
+            response = await self._post(
+                url,
+                files={"torrent_file": (file_name, torrent_file)},
+                params={"label": label},
+            )
+        except httpx.HTTPError as e:
+            return _format_error(e)
+        except CircuitOpenError as e:
+            return f"Error: {e}"
+
+        if response.is_success:
+            status = _format_return_url(str(response.url))
+            if status == "success":
+                return torrent_info.format_response()
+        return f"Error: {response.status_code}"
+
+    async def upload_magnet(self, url: str, magnet_link: str, label: str, torrent_info: TorrentInfo | None) -> str:
+        try:
+            response = await self._post(
+                url,
+                data={"url": magnet_link},
+                params={"label": label},
+            )
+        except httpx.HTTPError as e:
+            return _format_error(e)
+        except CircuitOpenError as e:
+            return f"Error: {e}"
+
+        if response.is_success:
+            status = _format_return_url(str(response.url))
+            if torrent_info:
+                if status == "success":
+                    return torrent_info.format_response()
+            else:
+                return status.capitalize()
+        return f"Error: {response.status_code}"
+
+
+_CLIENT: RuTorrentClient | None = None
+
+
+def _get_client() -> RuTorrentClient:
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = RuTorrentClient(_HEADERS)
+    return _CLIENT
+
+
+def breakers() -> list[CircuitBreaker]:
+    return [_BREAKER]
+
 
+def concurrency_stats() -> dict[str, int]:
+    return {"active": _CONCURRENCY.active, "waiting": _CONCURRENCY.waiting, "limit": _CONCURRENCY.limit}
+
+
+async def close() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+
+async def is_loaded(info_hash: str) -> bool:
+    rpc_url = _rpc_url()
+    if not rpc_url:
+        return False
+
+    loaded: set[str] | None = _LOADED.get(_LOADED_KEY)
+    if loaded is None:
+        try:
+            loaded = await _LOADED_FLIGHT.do(_LOADED_KEY, lambda: _get_client().loaded_hashes(rpc_url))
+        except (httpx.HTTPError, CircuitOpenError, ValueError, AttributeError):
+            return False
+        _LOADED.set(_LOADED_KEY, loaded)
+    return info_hash.casefold() in loaded
+
+
+async def upload_torrent(torrent_file: bytes, label: str, username: str, torrent_info: TorrentInfo) -> str:
     if username:
         label = f"{username}, {label}"
 
     if not _RU_TORRENT_URL:
         return "Error: RU_TORRENT_URL not configured"
 
-    response = requests.post(
-        _RU_TORRENT_URL,
-        headers=_HEADERS,
-        files={"torrent_file": (file_name, torrent_file)},
-        params={"label": label},
-    )
-
-    if response.ok:
-        status = _format_return_url(response.url)
-        if status == "success":
-            return torrent_info.format_response()
-    return f"Error: {response.status_code}"
+    response = await _get_client().upload_torrent(_RU_TORRENT_URL, torrent_file, label, torrent_info)
+    _LOADED.pop(_LOADED_KEY)
+    return response
 
 
-def upload_magnet(magnet_link: str, label: str, username: str, torrent_info: TorrentInfo | None = None) -> str:
+async def upload_magnet(magnet_link: str, label: str, username: str, torrent_info: TorrentInfo | None = None) -> str:
     if username:
         label = f"{username}, {label}"
 
     if not _RU_TORRENT_URL:
         return "Error: RU_TORRENT_URL not configured"
 
-    response = requests.post(
-        _RU_TORRENT_URL,
-        headers=_HEADERS,
-        data={"url": magnet_link},
-        params={"label": label},
-    )
-
-    if response.ok:
-        status = _format_return_url(response.url)
-        if torrent_info:
-            if status == "success":
-                return torrent_info.format_response()
-        else:
-            return status.capitalize()
-    return f"Error: {response.status_code}"
+    response = await _get_client().upload_magnet(_RU_TORRENT_URL, magnet_link, label, torrent_info)
+    _LOADED.pop(_LOADED_KEY)
+    return response
@@ -0,0 +1,97 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+_WORDS = re.compile(r"\w+")
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY,
+        guid TEXT UNIQUE NOT NULL,
+        title TEXT NOT NULL,
+        seeders INTEGER NOT NULL,
+        updated_at REAL NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS results_updated_at ON results (updated_at)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(title, content='results', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS results_ai AFTER INSERT ON results BEGIN
+        INSERT INTO results_fts (rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS results_ad AFTER DELETE ON results BEGIN
+        INSERT INTO results_fts (results_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS results_au AFTER UPDATE OF title ON results BEGIN
+        INSERT INTO results_fts (results_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO results_fts (rowid, title) VALUES (new.id, new.title);
+    END""",
+)
+_UPSERT = """INSERT INTO results (guid, title, seeders, updated_at, data) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (guid) DO UPDATE SET
+        title = excluded.title, seeders = excluded.seeders, updated_at = excluded.updated_at, data = excluded.data"""
+_SEARCH = """SELECT results.data, results.updated_at FROM results_fts JOIN results ON results.id = results_fts.rowid
+    WHERE results_fts MATCH ? AND results.updated_at > ? ORDER BY results.seeders DESC LIMIT ?"""
+
+
+def _match_query(query: str) -> str:
+    # Every word of the search must appear in the title, in any order, like Jackett's own matching.
+    return " ".join(f'"{word}"' for word in _WORDS.findall(query.casefold()))
+
+
+class SearchIndex:
+    # Past Jackett results in SQLite FTS5, upserted by Guid, so /search can answer while Jackett is slow or down.
+    def __init__(self, path: str, max_age: float, limit: int = 1000, clock: Callable[[], float] = time.time) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.limit = limit
+        self.writes = 0
+        self._clock = clock
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connect().execute("SELECT COUNT(*) FROM results").fetchone()
+            return int(count)
+
+    def add(self, results: Iterable[dict[str, Any]]) -> None:
+        now = self._clock()
+        rows = [
+            (result["Guid"], result.get("Title") or "", result.get("Seeders") or 0, now, json.dumps(result))
+            for result in results
+            if result.get("Guid")
+        ]
+        if not rows:
+            return
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.executemany(_UPSERT, rows)
+                db.execute("DELETE FROM results WHERE updated_at <= ?", (now - self.max_age,))
+            self.writes += 1
+
+    def search(self, query: str) -> tuple[list[dict[str, Any]], float] | None:
+        if not (match := _match_query(query)):
+            return None
+        with self._lock:
+            rows = self._connect().execute(_SEARCH, (match, self._clock() - self.max_age, self.limit)).fetchall()
+        if not rows:
+            return None
+        return [json.loads(data) for data, _ in rows], max(updated_at for _, updated_at in rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db:
+                self._db.close()
+                self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            with self._db:
+                for statement in _SCHEMA:
+                    self._db.execute(statement)
+        return self._db
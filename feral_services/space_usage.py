@@ -0,0 +1,169 @@
+import dataclasses
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from feral_services.home_size import HomeSizeTracker
+
+_QUOTA_TIMEOUT = 5.0
+_DU_TIMEOUT = 300.0
+_TREE_INTERVAL = 3600.0
+_DEFAULT_PROVIDERS = "quota,du,walk"
+_ERRORS = (OSError, ValueError, IndexError, subprocess.SubprocessError)
+
+
+@dataclass(frozen=True, slots=True)
+class SpaceUsage:
+    used: int
+    limit: int | None = None
+    source: str = ""
+    measured_at: float = 0.0
+
+
+_Provider = Callable[[], SpaceUsage | None]
+
+
+def quota_usage() -> SpaceUsage | None:
+    if not shutil.which("quota"):
+        return None
+    # quota exits non-zero when a limit is exceeded, so the output is parsed regardless of the return code.
+    output = subprocess.run(["quota", "-w"], capture_output=True, text=True, timeout=_QUOTA_TIMEOUT).stdout
+    lines = output.splitlines()
+    header = next((n for n, line in enumerate(lines) if line.split()[:1] == ["Filesystem"]), None)
+    if header is None or header + 1 >= len(lines):
+        return None
+    fields = lines[header + 1].split()
+    used, soft, hard = (int(value.rstrip("*")) * 1024 for value in fields[1:4])
+    return SpaceUsage(used, hard or soft or None, measured_at=time.time())
+
+
+def statvfs_usage(path: str) -> SpaceUsage | None:
+    stats = os.statvfs(path)
+    return SpaceUsage(
+        (stats.f_blocks - stats.f_bfree) * stats.f_frsize, stats.f_blocks * stats.f_frsize, measured_at=time.time()
+    )
+
+
+def du_usage(path: str) -> SpaceUsage | None:
+    if not shutil.which("du"):
+        return None
+    output = subprocess.run(["du", "-sk", path], capture_output=True, text=True, timeout=_DU_TIMEOUT, check=True)
+    return SpaceUsage(int(output.stdout.split()[0]) * 1024, measured_at=time.time())
+
+
+def walk_usage(tracker: HomeSizeTracker) -> SpaceUsage | None:
+    if tracker.updated_at is None:
+        return None
+    return SpaceUsage(tracker.total, measured_at=tracker.updated_at)
+
+
+def _scan(tracker: HomeSizeTracker) -> SpaceUsage | None:
+    tracker.scan()
+    return walk_usage(tracker)
+
+
+class BackgroundUsage:
+    # Takes readings from a slow provider on a thread and answers with the last one, so a request never waits on du
+    # or a walk; a reading older than ttl starts a new one, and a failed one keeps the previous reading.
+    def __init__(self, provider: _Provider, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.provider = provider
+        self.ttl = ttl
+        self._clock = clock
+        self._last: SpaceUsage | None = None
+        self._measured_at: float | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def refreshing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def read(self, refresh: bool = False) -> tuple[SpaceUsage | None, bool]:
+        # The flag says whether the first reading is still being taken.
+        with self._lock:
+            stale = self._measured_at is None or self._measured_at + self.ttl <= self._clock()
+            if (refresh or stale) and not self.refreshing:
+                self._thread = threading.Thread(target=self._measure, daemon=True)
+                self._thread.start()
+            return self._last, self._measured_at is None
+
+    def _measure(self) -> None:
+        try:
+            usage = self.provider()
+        except _ERRORS:
+            usage = None
+        with self._lock:
+            self._last = usage or self._last
+            self._measured_at = self._clock()
+
+
+class SpaceMonitor:
+    # Asks each provider in turn until one answers, so a cheap quota call avoids measuring the tree. Background
+    # readings are already cached by their provider, so only synchronous answers are kept for ttl.
+    def __init__(
+        self,
+        providers: list[tuple[str, _Provider | BackgroundUsage]],
+        ttl: float,
+        limit: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.providers = providers
+        self.ttl = ttl
+        self.limit = limit
+        self._clock = clock
+        self._cached: tuple[float, SpaceUsage] | None = None
+        self._lock = threading.Lock()
+
+    def usage(self, refresh: bool = False) -> SpaceUsage | None:
+        with self._lock:
+            if not refresh and self._cached and self._cached[0] > self._clock():
+                return self._cached[1]
+
+            self._cached = None
+            for name, provider in self.providers:
+                if isinstance(provider, BackgroundUsage):
+                    usage, pending = provider.read(refresh)
+                    if usage is not None:
+                        return dataclasses.replace(usage, source=name, limit=self.limit or usage.limit)
+                    if pending:
+                        # Starting a slower fallback would only measure the same tree twice.
+                        return None
+                    continue
+                try:
+                    usage = provider()
+                except _ERRORS:
+                    continue
+                if usage is not None:
+                    usage = dataclasses.replace(usage, source=name, limit=self.limit or usage.limit)
+                    self._cached = (self._clock() + self.ttl, usage)
+                    return usage
+            return None
+
+    def refreshing(self, name: str) -> bool:
+        provider = dict(self.providers).get(name)
+        return isinstance(provider, BackgroundUsage) and provider.refreshing
+
+
+def providers_from_env(path: str, tracker: HomeSizeTracker) -> list[tuple[str, _Provider | BackgroundUsage]]:
+    available: dict[str, _Provider | BackgroundUsage] = {
+        "quota": quota_usage,
+        "statvfs": lambda: statvfs_usage(path),
+        # Measuring the whole tree is the expensive part, so du and walk rerun hourly; /spaceforce starts one sooner.
+        "du": BackgroundUsage(lambda: du_usage(path), _TREE_INTERVAL),
+        "walk": BackgroundUsage(lambda: _scan(tracker), _TREE_INTERVAL),
+    }
+    names = [name.strip() for name in (os.getenv("SPACE_PROVIDERS") or _DEFAULT_PROVIDERS).split(",")]
+    return [(name, available[name]) for name in names if name in available]
+
+
+def from_env(path: str, tracker: HomeSizeTracker) -> SpaceMonitor:
+    limit_gb = float(os.getenv("SPACE_LIMIT_GB") or 0)
+    return SpaceMonitor(
+        providers_from_env(path, tracker),
+        ttl=float(os.getenv("SPACE_CACHE_TTL") or 60),
+        limit=int(limit_gb * 1024**3) or None,
+    )
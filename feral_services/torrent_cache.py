@@ -0,0 +1,222 @@
+import base64
+import binascii
+import hashlib
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from feral_services import bencode
+
+_TORRENT = ".torrent"
+_MAGNET = ".magnet"
+_ALIAS = ".alias"
+
+
+@dataclass
+class ResolvedTorrent:
+    info_hash: str | None
+    magnet: str | None
+    torrent_file: bytes | None
+
+    @classmethod
+    def create(cls, magnet: str | None, torrent_file: bytes | None) -> "ResolvedTorrent":
+        return cls(_info_hash_of(magnet, torrent_file), magnet, torrent_file)
+
+
+def magnet_info_hash(magnet: str) -> str | None:
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(magnet.strip()).query)
+    for exact_topic in query.get("xt", []):
+        if not exact_topic.casefold().startswith("urn:btih:"):
+            continue
+        value = exact_topic[len("urn:btih:") :]
+        if len(value) == 40:
+            return value.casefold()
+        if len(value) == 32:
+            return base64.b32decode(value.upper()).hex()
+    return None
+
+
+def _info_hash_of(magnet: str | None, torrent_file: bytes | None) -> str | None:
+    try:
+        if torrent_file:
+            return bencode.info_hash(torrent_file)
+        if magnet:
+            return magnet_info_hash(magnet)
+    except (ValueError, binascii.Error):
+        pass
+    return None
+
+
+class TorrentCache:
+    # Content is stored once per info hash; small alias files map result Guids onto it. Aliases count towards
+    # max_bytes and go with their content. Hits set a file's access time, which orders entries after a restart.
+    def __init__(self, directory: str, max_bytes: int, ttl: float, clock: Callable[[], float] = time.time) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._aliases: dict[str, str] = {}
+        self._aliases_of: dict[str, set[str]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def get(self, guid: str, info_hash: str = "") -> ResolvedTorrent | None:
+        with self._lock:
+            self._load()
+            info_hash = info_hash.casefold() or self._read_alias(guid)
+            for suffix in (_TORRENT, _MAGNET):
+                name = f"{info_hash}{suffix}"
+                if not info_hash or name not in self._entries:
+                    continue
+                if self._expired(name):
+                    self._remove(name)
+                    continue
+                try:
+                    with open(self._path(name), "rb") as file:
+                        data = file.read()
+                except OSError:
+                    self._remove(name)
+                    continue
+
+                self._entries.move_to_end(name)
+                self._touch(name)
+                self.hits += 1
+                if suffix == _MAGNET:
+                    return ResolvedTorrent(info_hash, data.decode(), None)
+                return ResolvedTorrent(info_hash, None, data)
+
+            self.misses += 1
+            return None
+
+    def put(self, guid: str, torrent: ResolvedTorrent) -> None:
+        if not torrent.info_hash:
+            return
+        if torrent.torrent_file:
+            name, data = f"{torrent.info_hash}{_TORRENT}", torrent.torrent_file
+        elif torrent.magnet:
+            name, data = f"{torrent.info_hash}{_MAGNET}", torrent.magnet.encode()
+        else:
+            return
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._load()
+            self._write(name, data)
+            self._size += len(data) - self._entries.get(name, 0)
+            self._entries[name] = len(data)
+            self._entries.move_to_end(name)
+            if guid:
+                self._put_alias(self._alias_name(guid), torrent.info_hash)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.directory, exist_ok=True)
+        with os.scandir(self.directory) as it:
+            files = sorted((entry.stat().st_atime, entry.name, entry.stat().st_size) for entry in it)
+        for _, name, size in files:
+            if name.endswith((_TORRENT, _MAGNET)):
+                self._entries[name] = size
+                self._size += size
+        for _, name, _ in files:
+            if not name.endswith(_ALIAS):
+                continue
+            try:
+                with open(self._path(name)) as file:
+                    info_hash = file.read().strip()
+            except OSError:
+                continue
+            if self._expired(name) or not self._has_content(info_hash):
+                self._remove_file(name)
+            else:
+                self._remember_alias(name, info_hash)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _alias_name(self, guid: str) -> str:
+        return f"{hashlib.sha1(guid.encode()).hexdigest()}{_ALIAS}"
+
+    def _expired(self, name: str) -> bool:
+        try:
+            return os.path.getmtime(self._path(name)) + self.ttl <= self._clock()
+        except OSError:
+            return True
+
+    def _has_content(self, info_hash: str) -> bool:
+        return f"{info_hash}{_TORRENT}" in self._entries or f"{info_hash}{_MAGNET}" in self._entries
+
+    def _read_alias(self, guid: str) -> str:
+        name = self._alias_name(guid)
+        if not guid or name not in self._aliases:
+            return ""
+        if self._expired(name):
+            self._remove_alias(name)
+            return ""
+        return self._aliases[name]
+
+    def _put_alias(self, name: str, info_hash: str) -> None:
+        self._write(name, info_hash.encode())
+        self._forget_alias(name)
+        self._remember_alias(name, info_hash)
+
+    def _remember_alias(self, name: str, info_hash: str) -> None:
+        self._aliases[name] = info_hash
+        self._aliases_of.setdefault(info_hash, set()).add(name)
+        self._size += len(info_hash)
+
+    def _forget_alias(self, name: str) -> None:
+        if (info_hash := self._aliases.pop(name, None)) is None:
+            return
+        self._size -= len(info_hash)
+        names = self._aliases_of[info_hash]
+        names.discard(name)
+        if not names:
+            del self._aliases_of[info_hash]
+
+    def _remove_alias(self, name: str) -> None:
+        self._forget_alias(name)
+        self._remove_file(name)
+
+    def _touch(self, name: str) -> None:
+        try:
+            os.utime(self._path(name), (self._clock(), os.path.getmtime(self._path(name))))
+        except OSError:
+            pass
+
+    def _write(self, name: str, data: bytes) -> None:
+        temp_path = self._path(f".{name}.tmp")
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, self._path(name))
+
+    def _remove(self, name: str) -> None:
+        self._size -= self._entries.pop(name, 0)
+        self._remove_file(name)
+        info_hash = name.removesuffix(_TORRENT).removesuffix(_MAGNET)
+        if not self._has_content(info_hash):
+            for alias in list(self._aliases_of.get(info_hash, ())):
+                self._remove_alias(alias)
+
+    def _remove_file(self, name: str) -> None:
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
@@ -0,0 +1,174 @@
+import functools
+import heapq
+import json
+import logging
+import os
+import time
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import cProfile
+
+_CURRENT: ContextVar["Span | None"] = ContextVar("feral_span", default=None)
+_DEFAULT_SLOW_SECONDS = 5.0
+_DEFAULT_TRACE_FILE = "traces.jsonl"
+_DEFAULT_PROFILE_DIR = "profiles"
+_MAX_TRACE_FILE_BYTES = 10 * 1024 * 1024
+_TRACE_FILE_BACKUPS = 3
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    started: float
+    duration: float = 0.0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    children: list["Span"] = field(default_factory=list)
+    clock: Callable[[], float] = field(default=time.perf_counter, repr=False)
+
+    def to_dict(self, origin: float) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "offset": round(self.started - origin, 6),
+            "duration": round(self.duration, 6),
+            **({"attributes": self.attributes} if self.attributes else {}),
+            **({"children": [child.to_dict(origin) for child in self.children]} if self.children else {}),
+        }
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    parent = _CURRENT.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.clock(), attributes=attributes, clock=parent.clock)
+    parent.children.append(child)
+    token = _CURRENT.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        child.duration = child.clock() - child.started
+        _CURRENT.reset(token)
+
+
+def annotate(**attributes: Any) -> None:
+    if (current := _CURRENT.get()) is not None:
+        current.attributes.update(attributes)
+
+
+class Tracer:
+    def __init__(
+        self,
+        path: str,
+        slow_seconds: float,
+        profile_top: int = 0,
+        profile_dir: str = _DEFAULT_PROFILE_DIR,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.slow_seconds = slow_seconds
+        self.profile_top = profile_top
+        self.profile_dir = profile_dir
+        self.traced = 0
+        self.written = 0
+        self._profiling = False
+        self._clock = clock
+        self._slowest: list[tuple[float, str]] = []
+        self._logger = logging.Logger(f"feral_services.tracing.{path}")
+        handler = RotatingFileHandler(path, maxBytes=_MAX_TRACE_FILE_BYTES, backupCount=_TRACE_FILE_BACKUPS, delay=True)
+        self._logger.addHandler(handler)
+
+    def trace(
+        self, name: str
+    ) -> Callable[[Callable[..., Coroutine[Any, Any, Any]]], Callable[..., Coroutine[Any, Any, Any]]]:
+        def decorator(func: Callable[..., Coroutine[Any, Any, Any]]) -> Callable[..., Coroutine[Any, Any, Any]]:
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                root = Span(name, self._clock(), clock=self._clock)
+                started_at = time.time()
+                token = _CURRENT.set(root)
+                profile = self._start_profile()
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException as e:
+                    root.attributes["error"] = type(e).__name__
+                    raise
+                finally:
+                    if profile is not None:
+                        profile.disable()
+                        self._profiling = False
+                    root.duration = self._clock() - root.started
+                    _CURRENT.reset(token)
+                    self._finish(root, started_at, profile)
+
+            return wrapper
+
+        return decorator
+
+    def close(self) -> None:
+        for handler in list(self._logger.handlers):
+            handler.close()
+            self._logger.removeHandler(handler)
+
+    def _start_profile(self) -> "cProfile.Profile | None":
+        # Only one profiler can be active per thread, so concurrent updates are sampled one at a time.
+        if not self.profile_top or self._profiling:
+            return None
+        import cProfile
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None
+        self._profiling = True
+        return profile
+
+    def _finish(self, root: Span, started_at: float, profile: "cProfile.Profile | None") -> None:
+        self.traced += 1
+        trace_id = os.urandom(8).hex()
+        profile_path = self._keep_profile(trace_id, root.duration, profile) if profile else None
+        if root.duration < self.slow_seconds:
+            return
+
+        trace = {"trace_id": trace_id, "started_at": started_at, **root.to_dict(root.started)}
+        if profile_path:
+            trace["profile"] = profile_path
+        self._logger.info(json.dumps(trace, default=str))
+        self.written += 1
+
+    def _keep_profile(self, trace_id: str, duration: float, profile: "cProfile.Profile") -> str | None:
+        if len(self._slowest) >= self.profile_top and duration <= self._slowest[0][0]:
+            return None
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{trace_id}.prof")
+        profile.dump_stats(path)
+        heapq.heappush(self._slowest, (duration, path))
+        if len(self._slowest) > self.profile_top:
+            _, evicted = heapq.heappop(self._slowest)
+            try:
+                os.remove(evicted)
+            except OSError:
+                pass
+        return path
+
+
+def from_env() -> Tracer | None:
+    if os.getenv("PROFILE", "").casefold() not in ("1", "true", "yes"):
+        return None
+    return Tracer(
+        os.getenv("PROFILE_TRACE_FILE") or _DEFAULT_TRACE_FILE,
+        slow_seconds=float(os.getenv("PROFILE_SLOW_SECONDS") or _DEFAULT_SLOW_SECONDS),
+        profile_top=int(os.getenv("PROFILE_CPROFILE_TOP") or 0),
+        profile_dir=os.getenv("PROFILE_CPROFILE_DIR") or _DEFAULT_PROFILE_DIR,
+    )
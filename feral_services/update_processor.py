@@ -0,0 +1,90 @@
+import asyncio
+import contextlib
+import contextvars
+from collections.abc import AsyncIterator, Awaitable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+_UNBOUNDED = 2**31 - 1
+_HOLDS_WORKER = contextvars.ContextVar("holds_worker", default=False)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    # PTB's own semaphore is acquired before do_process_update, so it is left unbounded: a chat with a backlog
+    # waits on its lock without holding a worker, and only the update at the front of each chat takes one.
+    def __init__(self, workers: int) -> None:
+        super().__init__(_UNBOUNDED)
+        if workers < 1:
+            raise ValueError("workers must be a positive integer")
+        self.workers = workers
+        self.active = 0
+        self.pending = 0
+        self._workers: asyncio.Semaphore | None = None
+        self._chats: dict[int, tuple[asyncio.Lock, int]] = {}
+
+    @property
+    def queued(self) -> int:
+        return self.pending - self.active
+
+    async def initialize(self) -> None:
+        self._workers = asyncio.Semaphore(self.workers)
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self._workers is None:
+            await self.initialize()
+        assert self._workers is not None
+
+        self.pending += 1
+        try:
+            await self._process(update, coroutine, self._workers)
+        finally:
+            self.pending -= 1
+
+    async def _process(self, update: object, coroutine: Awaitable[Any], workers: asyncio.Semaphore) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with workers:
+                await self._run(coroutine)
+            return
+
+        lock, waiting = self._chats.get(chat.id) or (asyncio.Lock(), 0)
+        self._chats[chat.id] = (lock, waiting + 1)
+        try:
+            async with lock, workers:
+                await self._run(coroutine)
+        finally:
+            lock, waiting = self._chats[chat.id]
+            if waiting == 1:
+                del self._chats[chat.id]
+            else:
+                self._chats[chat.id] = (lock, waiting - 1)
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        self.active += 1
+        holds_worker = _HOLDS_WORKER.set(True)
+        try:
+            await coroutine
+        finally:
+            _HOLDS_WORKER.reset(holds_worker)
+            self.active -= 1
+
+    @contextlib.asynccontextmanager
+    async def idle(self) -> AsyncIterator[None]:
+        # Lends the caller's worker to other chats while it waits on something other than work, such as a rate
+        # limit; its chat stays locked, so the chat's later updates still wait their turn.
+        if self._workers is None or not _HOLDS_WORKER.get():
+            yield
+            return
+        self._workers.release()
+        self.active -= 1
+        try:
+            yield
+        finally:
+            self.active += 1
+            # Shielded so a cancelled wait still ends up holding the worker that _process releases.
+            await asyncio.shield(self._workers.acquire())
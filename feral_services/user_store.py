@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+def _load_json(path: str) -> set[int]:
+    try:
+        with open(path) as file:
+            return {int(user_id) for user_id in json.load(file)}
+    except FileNotFoundError:
+        return set()
+
+
+class UserStore:
+    def __init__(self, path: str, db_path: str | None = None, delay: float = 1.0) -> None:
+        self.path = path
+        self.delay = delay
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._users: set[int] = set()
+        self._pending: set[int] = set()
+        self._timer: threading.Timer | None = None
+        self._db: sqlite3.Connection | None = None
+        self._db_path = db_path
+        self._loaded = False
+
+    def __contains__(self, user_id: object) -> bool:
+        with self._lock:
+            self._load()
+            if user_id in self._users or user_id in self._pending:
+                return True
+            if not self._db or not isinstance(user_id, int):
+                return False
+            if not self._db.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone():
+                return False
+            self._users.add(user_id)
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            if not self._db:
+                return len(self._users | self._pending)
+            stored: int = self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            return stored + len(self._pending)
+
+    def add(self, user_id: int) -> None:
+        if user_id in self:
+            return
+        with self._lock:
+            self._pending.add(user_id)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+
+            self._load()
+            if self._db:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO users VALUES (?)", [(user_id,) for user_id in self._pending]
+                )
+                self._db.commit()
+            else:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w") as file:
+                    json.dump(sorted(self._users | self._pending), file)
+                os.replace(temp_path, self.path)
+
+            self._users |= self._pending
+            self._pending = set()
+            self.writes += 1
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self._db_path:
+            self._users = _load_json(self.path)
+            return
+
+        self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY)")
+        if not self._db.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            self._db.executemany("INSERT INTO users VALUES (?)", [(user_id,) for user_id in _load_json(self.path)])
+        self._db.commit()
+
+    def close(self) -> None:
+        self.flush()
+        if self._db:
+            self._db.close()
+            self._db = None
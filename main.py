@@ -1,31 +1,102 @@
-import json
+import asyncio
+import contextlib
+import math
 import os
 import threading
+import time
 from collections.abc import Callable
 from typing import Any
 
-import requests
 from dotenv import load_dotenv
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler
 from telegram.ext.filters import COMMAND
+from telegram.request import HTTPXRequest
 
-from feral_services import jackett, ru_torrent
+from feral_services import circuit_breaker, jackett, metrics, ru_torrent, space_usage, tracing
+from feral_services.cache import TTLCache
+from feral_services.home_size import HomeSizeTracker
 from feral_services.jackett import TorrentInfo
+from feral_services.rate_limit import Limit, RateLimiter
+from feral_services.result_store import ResultStore
+from feral_services.torrent_cache import ResolvedTorrent, TorrentCache
+from feral_services.update_processor import ChatOrderedUpdateProcessor
+from feral_services.user_store import UserStore
 
 load_dotenv()
 
-_RESULTS: dict[int, dict[str, TorrentInfo]] = {}
-_LAST_RESULT_DICT: dict[int, int] = {}
+_RESULTS_TTL = float(os.getenv("RESULTS_TTL") or 86400)
+_RESULTS_MAX = int(os.getenv("RESULTS_MAX") or 100_000)
+_RESULTS = ResultStore(ttl=_RESULTS_TTL, max_results=_RESULTS_MAX, path=os.getenv("RESULTS_DB"))
+_LAST_RESULT_MSG_IDS = TTLCache(max_size=_RESULTS_MAX, ttl=_RESULTS_TTL)
+_RESULT_PAGES = TTLCache(max_size=int(os.getenv("RESULTS_PAGES_MAX") or 64), ttl=_RESULTS_TTL)
 _USERS_FILE = "users.json"
-_USERS: set[int] = set(json.load(open(_USERS_FILE)))
+_USERS = UserStore(_USERS_FILE, db_path=os.getenv("USERS_DB"))
 _ADMINS: set[str] = set((os.getenv("ADMINS") or "").split(","))
-_LINUX_DIR_SIZE = 0
+_HOME_DIR = os.path.expanduser("~")
+_HOME_SIZE = HomeSizeTracker(_HOME_DIR)
+_SPACE = space_usage.from_env(_HOME_DIR, _HOME_SIZE)
+_SEARCH_EDIT_INTERVAL = 1.0
+_GET_BATCH_LIMIT = 10
+_GET_CONCURRENCY = 4
+_UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS") or 8)
+_RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT") or 30)
+_RATE_LIMIT_DEFAULTS = {
+    "search": ("3/30", "20/60"),
+    "get": ("10/60", "60/60"),
+    "download": ("10/60", "60/60"),
+}
+_TORRENT_CACHE_DIR = os.getenv("TORRENT_CACHE_DIR")
+_TORRENT_CACHE = (
+    TorrentCache(
+        _TORRENT_CACHE_DIR,
+        max_bytes=int(os.getenv("TORRENT_CACHE_MAX_BYTES") or 512 * 1024 * 1024),
+        ttl=float(os.getenv("TORRENT_CACHE_TTL") or 7 * 86400),
+    )
+    if _TORRENT_CACHE_DIR
+    else None
+)
+
+
+def _rate_limiter(command: str) -> RateLimiter:
+    per_user, overall = _RATE_LIMIT_DEFAULTS[command]
+    configured_user, _, configured_overall = (os.getenv(f"RATE_LIMIT_{command.upper()}") or "").partition(",")
+    return RateLimiter(
+        Limit.parse(configured_user or per_user),
+        Limit.parse(configured_overall or overall),
+        _RATE_LIMIT_MAX_WAIT,
+    )
+
+
+_RATE_LIMITERS = {command: _rate_limiter(command) for command in _RATE_LIMIT_DEFAULTS}
+_COMMAND_SECONDS = metrics.histogram("feral_command_seconds", "Time spent handling bot commands", ("command",))
+_COMMAND_ERRORS = metrics.counter("feral_command_errors_total", "Bot commands that raised", ("command",))
+
+
+_TRACER = tracing.from_env()
+
 
+def instrumented(
+    command: str,
+) -> Callable[[Callable[[Update, ContextTypes.DEFAULT_TYPE], Any]], Callable[[Update, ContextTypes.DEFAULT_TYPE], Any]]:
+    timed = metrics.timed(_COMMAND_SECONDS, _COMMAND_ERRORS, command=command)
+    if not _TRACER:
+        return timed
 
-def save_user(user_id: int) -> None:
-    _USERS.add(user_id)
-    json.dump(list(_USERS), open(_USERS_FILE, "w"))
+    traced = _TRACER.trace(command)
+
+    def decorator(
+        func: Callable[[Update, ContextTypes.DEFAULT_TYPE], Any],
+    ) -> Callable[[Update, ContextTypes.DEFAULT_TYPE], Any]:
+        return timed(traced(func))
+
+    return decorator
+
+
+class _TracedRequest(HTTPXRequest):
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> tuple[int, bytes]:
+        with tracing.span(f"telegram.{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, *args, **kwargs)
 
 
 def auth_required(
@@ -37,6 +108,7 @@ def auth_required(
         if update.effective_user.id not in _USERS:
             await update.message.reply_text("Authorise pls")
             return
+        tracing.annotate(user_id=update.effective_user.id)
         return await func(update, context)
 
     return wrapper
@@ -56,21 +128,50 @@ def admin_required(
     return wrapper
 
 
-def get_home_size(start_new_thread: bool = True) -> None:
-    global _LINUX_DIR_SIZE
+def rate_limited(
+    command: str,
+) -> Callable[[Callable[[Update, ContextTypes.DEFAULT_TYPE], Any]], Callable[[Update, ContextTypes.DEFAULT_TYPE], Any]]:
+    limiter = _RATE_LIMITERS[command]
 
-    size = 0
-    home = os.path.expanduser("~")
-    for dirpath, _, filenames in os.walk(home):
-        for file in filenames:
-            file_path = os.path.join(dirpath, file)
-            size += os.path.getsize(file_path)
+    def decorator(
+        func: Callable[[Update, ContextTypes.DEFAULT_TYPE], Any],
+    ) -> Callable[[Update, ContextTypes.DEFAULT_TYPE], Any]:
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Any:
+            if not update.effective_user or not update.message:
+                return
+            if not (update.message.text or "").startswith(f"/{command}"):
+                return await func(update, context)
 
-    _LINUX_DIR_SIZE = size
-    if start_new_thread:
-        threading.Timer(3600, get_home_size).start()
+            admitted, wait = limiter.acquire(update.effective_user.id)
+            if not admitted:
+                await update.message.reply_text(f"Too many /{command} requests, try again in {math.ceil(wait)}s")
+                return
+            if wait > 0:
+                await update.message.reply_text(f"Busy, your /{command} will start in about {math.ceil(wait)}s")
+                processor = context.application.update_processor
+                idle = (
+                    processor.idle() if isinstance(processor, ChatOrderedUpdateProcessor) else contextlib.nullcontext()
+                )
+                async with idle:
+                    await limiter.wait(wait)
+            return await func(update, context)
+
+        return wrapper
+
+    return decorator
 
 
+def _format_age(seconds: float | None) -> str:
+    if seconds is None:
+        return "never"
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    return f"{int(seconds // 3600)} h ago"
+
+
+@instrumented("auth")
 async def auth(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.effective_user or not update.message:
         return
@@ -81,66 +182,258 @@ async def auth(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
 
     password = os.getenv("PASSWORD")
     if password and password in (update.message.text or ""):
-        save_user(update.effective_user.id)
+        _USERS.add(update.effective_user.id)
         await update.message.reply_text("Authorized")
         return
 
     await update.message.reply_text("Wrong password")
 
 
+@instrumented("spaceforce")
 @auth_required
 async def spaceforce(_update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
-    get_home_size(start_new_thread=False)
+    await asyncio.to_thread(_SPACE.usage, True)
     await space(_update, _context)
 
 
+@instrumented("space")
 @auth_required
 async def space(_update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
     if not _update.message:
         return
-    await _update.message.reply_text(
-        f"Home dir size: {_LINUX_DIR_SIZE / 1024 / 1024 / 1024:.2f}/1000 GB",
-    )
+    usage = await asyncio.to_thread(_SPACE.usage)
+    if usage is None:
+        await _update.message.reply_text("Space used: still calculating, try again in a minute")
+        return
+    used_gb = usage.used / 1024 / 1024 / 1024
+    if usage.limit:
+        used = f"{used_gb:.2f}/{usage.limit / 1024 / 1024 / 1024:.0f} GB ({usage.used / usage.limit:.0%})"
+    else:
+        used = f"{used_gb:.2f} GB"
+    walked = usage.source == "walk"
+    refreshing = ", recalculating" if _SPACE.refreshing(usage.source) else ""
+    age = _format_age(time.time() - usage.measured_at)
+    lines = [f"Space used: {used} (via {usage.source}, updated {age}{refreshing})"]
+    if walked:
+        lines.extend(f"└─ {name}: {size / 1024 / 1024 / 1024:.2f} GB" for name, size in _HOME_SIZE.largest(5))
+    await _update.message.reply_text("\n".join(lines))
+
+
+async def _expire_previous_results(user_id: int, chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if prior_search_msg_id := _LAST_RESULT_MSG_IDS.get(user_id):
+        await context.bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=prior_search_msg_id,
+            text=r"Previous search results have expired\. "
+            r"Use the latest search results below\.",
+            parse_mode="MarkdownV2",
+        )
+
+
+def _cached_note(indexed_at: float) -> str:
+    return f"Cached {_format_age(time.time() - indexed_at)}"
+
+
+def _indexer_status(pending: list[str], failed: dict[str, str]) -> str:
+    lines = []
+    if pending:
+        lines.append(f"Waiting on: {', '.join(pending)}")
+    for indexer, error in failed.items():
+        lines.append(f"{indexer}: {error}")
+    return "\n".join(lines)
+
+
+async def _search_indexers(update: Update, context: ContextTypes.DEFAULT_TYPE, term: str, indexers: list[str]) -> None:
+    if not update.message or not update.effective_user or not update.effective_chat:
+        return
+
+    user_id = update.effective_user.id
+    await _expire_previous_results(user_id, update.effective_chat.id, context)
+    indexed = await jackett.search_index(term)
+    indexed_by_guid = {r["Guid"]: r for r in indexed[0]} if indexed else {}
+    results_by_guid: dict[str, dict[str, Any]] = {}
+    pending = list(indexers)
+    failed: dict[str, str] = {}
+
+    def render() -> str:
+        # Indexed results fill in until every indexer has answered, or for good if none of them returned anything.
+        shown = results_by_guid if results_by_guid and not pending else {**indexed_by_guid, **results_by_guid}
+        if shown:
+            with tracing.span("format_results", results=len(shown)):
+                text = jackett.format_and_filter_results(list(shown.values()), user_id, _RESULTS, _RESULT_PAGES)
+        else:
+            text = "No results found" if not pending else f"Searching {len(indexers)} indexers..."
+        status = _indexer_status(pending, failed)
+        if indexed and shown is not results_by_guid:
+            status = "\n".join(filter(None, (_cached_note(indexed[1]), status)))
+        return f"{text}\n\n{status}" if status else text
+
+    message = await update.message.reply_text(render())
+    _LAST_RESULT_MSG_IDS.set(user_id, message.message_id)
+
+    async def collect() -> None:
+        async with contextlib.aclosing(jackett.search_indexers(term, indexers)) as indexer_results:
+            async for indexer_result in indexer_results:
+                pending.remove(indexer_result.indexer)
+                if indexer_result.error:
+                    # Unexpected errors carry a stack trace, which would push the edit past Telegram's size limit.
+                    failed[indexer_result.indexer] = indexer_result.error.splitlines()[0]
+                results_by_guid.update((r["Guid"], r) for r in indexer_result.results)
+
+    async def stream() -> None:
+        # Renders what has arrived at most once per interval, not once per indexer.
+        collector = asyncio.ensure_future(collect())
+        last_text = message.text
+        rendered = len(pending)
+        try:
+            while not collector.done():
+                await asyncio.wait([collector], timeout=_SEARCH_EDIT_INTERVAL)
+                if _LAST_RESULT_MSG_IDS.get(user_id) != message.message_id:
+                    # A newer search owns the stored results and pages now, so this one stops rather than replace them.
+                    return
+                if len(pending) == rendered:
+                    continue
+                rendered = len(pending)
+                if (text := render()) != last_text:
+                    await message.edit_text(text)
+                    last_text = text
+            await collector
+        finally:
+            collector.cancel()
+
+    # Edits happen outside the handler, so later updates in this chat (a /get, say) don't wait for every indexer.
+    context.application.create_task(stream(), update=update)
+
+
+@instrumented("stats")
+@admin_required
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not update.message:
+        return
+    cache = jackett.cache_stats()
+    lines = [
+        f"Search cache: {cache['hits']} hits, {cache['misses']} misses, "
+        f"{cache['coalesced']} coalesced, {cache['size']} cached"
+    ]
+    if index := jackett.index_stats():
+        lines.append(f"Search index: {index['results']} results, {index['writes']} writes")
+    if _TORRENT_CACHE:
+        lines.append(
+            f"Torrent cache: {_TORRENT_CACHE.hits} hits, {_TORRENT_CACHE.misses} misses, {len(_TORRENT_CACHE)} cached"
+        )
+    for name, upstream in (
+        ("Jackett", jackett.concurrency_stats()),
+        ("Jackett links", jackett.link_concurrency_stats()),
+        ("ruTorrent", ru_torrent.concurrency_stats()),
+    ):
+        lines.append(f"{name}: {upstream['active']}/{upstream['limit']} active, {upstream['waiting']} waiting")
+    for breaker in jackett.breakers() + ru_torrent.breakers():
+        retry = f", retrying in {math.ceil(breaker.retry_in())}s" if breaker.state == circuit_breaker.OPEN else ""
+        lines.append(
+            f"Circuit {breaker.upstream}/{breaker.target}: {breaker.state}{retry}, {breaker.rejected} rejected"
+        )
+    for target, (p95, timeout) in jackett.timeout_stats().items():
+        lines.append(f"Jackett {target}: p95 {p95:.1f}s, timeout {timeout:.0f}s")
+    for command, limiter in _RATE_LIMITERS.items():
+        lines.append(
+            f"/{command}: {limiter.admitted} admitted, {limiter.queued} queued, "
+            f"{limiter.rejected} rejected, {limiter.waiting} waiting"
+        )
+    if isinstance(processor := context.application.update_processor, ChatOrderedUpdateProcessor):
+        lines.append(f"Updates: {processor.active}/{processor.workers} active, {processor.queued} queued")
+    await update.message.reply_text("\n".join(lines))
 
 
+@instrumented("search")
 @auth_required
+@rate_limited("search")
 async def search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message or not update.message.text or not update.effective_user or not update.effective_chat:
         return
 
     _, term = update.message.text.split("/search", 1)
-    error, results = jackett.search(term)
+    tracing.annotate(query=term.strip())
+    if indexers := jackett.configured_indexers():
+        await _search_indexers(update, context, term, indexers)
+        return
+    if not jackett.is_cached(term) and (indexed := await jackett.search_index(term)):
+        await _search_with_index(update, context, term, *indexed)
+        return
+
+    error, results = await jackett.search(term)
     if error or not results:
         await update.message.reply_text(error or "No results found")
         return
 
     user_id = update.effective_user.id
-    if prior_search_msg_id := _LAST_RESULT_DICT.get(user_id):
-        await context.bot.edit_message_text(
-            chat_id=update.effective_chat.id,
-            message_id=prior_search_msg_id,
-            text=r"Previous search results have expired\. "
-            r"Use the latest search results below\.",
-            parse_mode="MarkdownV2",
+    await _expire_previous_results(user_id, update.effective_chat.id, context)
+
+    with tracing.span("format_results", results=len(results)):
+        returned_results_str = jackett.format_and_filter_results(
+            results,
+            user_id,
+            _RESULTS,
+            _RESULT_PAGES,
         )
-
-    returned_results_str = jackett.format_and_filter_results(
-        results,
-        user_id,
-        _RESULTS,
-    )
     message = await update.message.reply_text(returned_results_str)
-    _LAST_RESULT_DICT[user_id] = message.message_id
+    _LAST_RESULT_MSG_IDS.set(user_id, message.message_id)
+
 
+async def _search_with_index(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, term: str, indexed: list[dict[str, Any]], indexed_at: float
+) -> None:
+    if not update.message or not update.effective_user or not update.effective_chat:
+        return
 
+    user_id = update.effective_user.id
+    await _expire_previous_results(user_id, update.effective_chat.id, context)
+    with tracing.span("format_results", results=len(indexed)):
+        text = jackett.format_and_filter_results(indexed, user_id, _RESULTS, _RESULT_PAGES)
+    if jackett.circuit_open():
+        message = await update.message.reply_text(f"{text}\n\n{_cached_note(indexed_at)}, Jackett is unavailable")
+        _LAST_RESULT_MSG_IDS.set(user_id, message.message_id)
+        return
+    message = await update.message.reply_text(f"{text}\n\n{_cached_note(indexed_at)}, refreshing...")
+    _LAST_RESULT_MSG_IDS.set(user_id, message.message_id)
+
+    async def refresh() -> None:
+        error, results = await jackett.search(term)
+        if _LAST_RESULT_MSG_IDS.get(user_id) != message.message_id:
+            return
+        if error or not results:
+            reason = error.splitlines()[0] if error else "no fresh results"
+            await message.edit_text(f"{text}\n\n{_cached_note(indexed_at)}, refresh failed: {reason}")
+            return
+
+        with tracing.span("format_results", results=len(results)):
+            fresh = jackett.format_and_filter_results(results, user_id, _RESULTS, _RESULT_PAGES)
+        await message.edit_text(fresh)
+
+    # Refreshed outside the handler, so a /get in reply to the cached answer doesn't wait for Jackett.
+    context.application.create_task(refresh(), update=update)
+
+
+@instrumented("more")
 @auth_required
+async def more(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not update.message or not update.effective_user:
+        return
+
+    with tracing.span("format_results"):
+        text = jackett.format_more_results(update.effective_user.id, _RESULTS, _RESULT_PAGES)
+    await update.message.reply_text(text)
+
+
+@instrumented("download")
+@auth_required
+@rate_limited("download")
 async def download(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message or not update.message.text or not update.effective_user:
         return
 
     _, magnet = update.message.text.split("/download", 1)
     username = update.effective_user.username or update.effective_user.first_name or "Unknown"
-    magnet_upload_result = ru_torrent.upload_magnet(
+    magnet_upload_result = await ru_torrent.upload_magnet(
         magnet,
         "/download",
         username,
@@ -148,7 +441,63 @@ async def download(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(magnet_upload_result)
 
 
+async def _resolve_torrent(result: TorrentInfo) -> tuple[str | None, ResolvedTorrent | None]:
+    if result.magnet:
+        return None, ResolvedTorrent.create(result.magnet, None)
+    if not result.link:
+        return None, None
+
+    if _TORRENT_CACHE and (cached := await asyncio.to_thread(_TORRENT_CACHE.get, result.guid, result.info_hash)):
+        return None, cached
+
+    error, redirect_magnet, torrent_file = await jackett.fetch_link(result.link)
+    if error:
+        return error, None
+
+    resolved = ResolvedTorrent.create(redirect_magnet, torrent_file)
+    if _TORRENT_CACHE:
+        await asyncio.to_thread(_TORRENT_CACHE.put, result.guid, resolved)
+    return None, resolved
+
+
+async def _get_result(result: TorrentInfo, username: str) -> str:
+    error, resolved = await _resolve_torrent(result)
+    if error:
+        return f"Something went wrong downloading torrent file ({error}). The url was: {result.link}"
+    if not resolved:
+        return "Something went wrong"
+
+    info_hash = result.info_hash or resolved.info_hash
+    if info_hash and await ru_torrent.is_loaded(info_hash):
+        return f"Already in ruTorrent - {result.name}"
+
+    try:
+        if resolved.magnet:
+            return await ru_torrent.upload_magnet(resolved.magnet, result.source, username, result)
+        if resolved.torrent_file:
+            return await ru_torrent.upload_torrent(resolved.torrent_file, result.source, username, result)
+    except Exception as e:
+        print(e)
+
+    return "Something went wrong"
+
+
+def _select_results(
+    users_data: dict[str, TorrentInfo], args: list[str]
+) -> tuple[list[tuple[str, TorrentInfo | None]], int]:
+    selected: list[tuple[str, TorrentInfo | None]]
+    if args[:1] == ["top"]:
+        count = int(args[1]) if len(args) > 1 and args[1].isdigit() else 1
+        by_seeds = sorted(users_data.items(), key=lambda item: item[1].seeds, reverse=True)
+        selected = list(by_seeds[:count])
+    else:
+        selected = [(get_id, users_data.get(get_id)) for get_id in dict.fromkeys(args)]
+    return selected[:_GET_BATCH_LIMIT], max(0, len(selected) - _GET_BATCH_LIMIT)
+
+
+@instrumented("get")
 @auth_required
+@rate_limited("get")
 async def get(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message or not update.message.text or not update.effective_user:
         return
@@ -165,61 +514,154 @@ async def get(update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("Not a valid item")
         return
 
-    _, get_id = update.message.text.split("/get", 1)
-    result = users_data.get(get_id)
-    if not result:
+    _, get_args = update.message.text.split("/get", 1)
+    selected, skipped = _select_results(users_data, get_args.split())
+    if not selected or (len(selected) == 1 and not selected[0][1]):
         await update.message.reply_text("Not a valid item")
         return
 
     username = update.effective_user.username or update.effective_user.first_name or "Unknown"
-    if magnet := result.magnet:
-        magnet_upload_result = ru_torrent.upload_magnet(magnet, result.source, username, result)
-        await update.message.reply_text(magnet_upload_result)
-        return
-
-    elif link := result.link:
-        url_response = requests.get(link, allow_redirects=False)
-        if not url_response.ok:
-            await update.message.reply_text(
-                f"Something went wrong downloading torrent file. The url was: {link}",
+    semaphore = asyncio.Semaphore(_GET_CONCURRENCY)
+
+    async def get_one(get_id: str, result: TorrentInfo | None) -> str:
+        if not result:
+            return f"Not a valid item: {get_id}"
+        async with semaphore:
+            return await _get_result(result, username)
+
+    replies = await asyncio.gather(*(get_one(get_id, result) for get_id, result in selected))
+    if skipped:
+        replies.append(f"Skipped {skipped} more, /get takes up to {_GET_BATCH_LIMIT} at a time")
+    await update.message.reply_text("\n\n".join(replies))
+
+
+def _register_metrics(application: Application) -> None:
+    def search_cache() -> dict[tuple[str, ...], float]:
+        return {(name,): value for name, value in jackett.cache_stats().items()}
+
+    def rate_limits() -> dict[tuple[str, ...], float]:
+        return {
+            (command, outcome): getattr(limiter, outcome)
+            for command, limiter in _RATE_LIMITERS.items()
+            for outcome in ("admitted", "queued", "rejected")
+        }
+
+    def upstream_concurrency() -> dict[tuple[str, ...], float]:
+        return {
+            (upstream, state): stats[state]
+            for upstream, stats in (
+                ("jackett", jackett.concurrency_stats()),
+                ("jackett_links", jackett.link_concurrency_stats()),
+                ("rutorrent", ru_torrent.concurrency_stats()),
             )
-            return
-
-        try:
-            if url_response.status_code == 302:
-                magnet_upload_result = ru_torrent.upload_magnet(
-                    url_response.headers["Location"], result.source, username, result
-                )
-                await update.message.reply_text(magnet_upload_result)
-                return
-
-            torrent_upload_result = ru_torrent.upload_torrent(url_response.content, result.source, username, result)
-            await update.message.reply_text(torrent_upload_result)
-            return
-        except Exception as e:
-            print(e)
-
-    await update.message.reply_text("Something went wrong")
+            for state in ("active", "waiting")
+        }
+
+    def circuit_states() -> dict[tuple[str, ...], float]:
+        return {
+            (breaker.upstream, breaker.target): circuit_breaker.STATES.index(breaker.state)
+            for breaker in jackett.breakers() + ru_torrent.breakers()
+        }
+
+    metrics.callback("feral_search_cache", "Search cache counters", "gauge", search_cache, ("stat",))
+    metrics.callback("feral_rate_limit_total", "Rate limiter decisions", "counter", rate_limits, ("command", "outcome"))
+    metrics.callback(
+        "feral_rate_limit_waiting",
+        "Requests currently queued by the rate limiter",
+        "gauge",
+        lambda: {(command,): limiter.waiting for command, limiter in _RATE_LIMITERS.items()},
+        ("command",),
+    )
+    metrics.callback(
+        "feral_upstream_concurrency", "Upstream calls in flight", "gauge", upstream_concurrency, ("upstream", "state")
+    )
+    if isinstance(processor := application.update_processor, ChatOrderedUpdateProcessor):
+        update_processor = processor
+        metrics.callback(
+            "feral_updates",
+            "Telegram updates being handled or waiting for a worker",
+            "gauge",
+            lambda: {("active",): update_processor.active, ("queued",): update_processor.queued},
+            ("state",),
+        )
+    metrics.callback(
+        "feral_circuit_state",
+        "Circuit breaker state (0 closed, 1 half open, 2 open)",
+        "gauge",
+        circuit_states,
+        ("upstream", "target"),
+    )
+    metrics.callback("feral_stored_results", "Search results kept for /get", "gauge", lambda: _RESULTS.result_count)
+    if _TORRENT_CACHE:
+        torrent_cache = _TORRENT_CACHE
+        metrics.callback(
+            "feral_torrent_cache",
+            "Torrent cache counters",
+            "gauge",
+            lambda: {("hits",): torrent_cache.hits, ("misses",): torrent_cache.misses, ("size",): len(torrent_cache)},
+            ("stat",),
+        )
 
 
-def main() -> None:
-    token = os.getenv("TELEGRAM_TOKEN")
-    if not token:
-        raise ValueError("TELEGRAM_TOKEN environment variable is required")
-    application = Application.builder().token(token).build()
+async def post_shutdown(_application: Application) -> None:
+    await jackett.close()
+    await ru_torrent.close()
+    _RESULTS.close()
+    _USERS.close()
+    if _TRACER:
+        _TRACER.close()
+
+
+def build_application(builder: ApplicationBuilder | None = None) -> Application:
+    if builder is None:
+        token = os.getenv("TELEGRAM_TOKEN")
+        if not token:
+            raise ValueError("TELEGRAM_TOKEN environment variable is required")
+        builder = Application.builder().token(token)
+        if base_url := os.getenv("TELEGRAM_BASE_URL"):
+            builder = builder.base_url(base_url)
+    builder = builder.post_shutdown(post_shutdown).concurrent_updates(ChatOrderedUpdateProcessor(_UPDATE_WORKERS))
+    if _TRACER:
+        builder = builder.request(_TracedRequest())
+    application = builder.build()
     application.add_handlers(
         [
             CommandHandler("spaceforce", spaceforce),
             CommandHandler("space", space),
             CommandHandler("auth", auth),
             CommandHandler("search", search),
+            CommandHandler("more", more),
+            CommandHandler("stats", stats),
             CommandHandler("download", download),
             MessageHandler(COMMAND, get),
         ],
     )
+    return application
+
 
-    print("Getting home size!")
-    get_home_size()
+def main() -> None:
+    application = build_application()
+
+    if metrics_port := os.getenv("METRICS_PORT"):
+        _register_metrics(application)
+        metrics.serve(int(metrics_port))
+        print(f"Serving metrics on 127.0.0.1:{metrics_port}/metrics")
+
+    print("Getting home size in the background!")
+    threading.Thread(target=_SPACE.usage, daemon=True).start()
+
+    if webhook_url := os.getenv("WEBHOOK_URL"):
+        listen = os.getenv("WEBHOOK_LISTEN") or "127.0.0.1"
+        port = int(os.getenv("WEBHOOK_PORT") or 8443)
+        print(f"Starting webhook on {listen}:{port}!")
+        application.run_webhook(
+            listen=listen,
+            port=port,
+            url_path=os.getenv("WEBHOOK_PATH") or "",
+            secret_token=os.getenv("WEBHOOK_SECRET") or None,
+            webhook_url=webhook_url,
+        )
+        return
 
     print("Starting polling!")
     application.run_polling()
@@ -0,0 +1,81 @@
+import hashlib
+from typing import Any
+
+import pytest
+
+from feral_services import bencode
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, int):
+        return b"i%de" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"%d:%s" % (len(value), value)
+    if isinstance(value, list):
+        return b"l" + b"".join(_encode(item) for item in value) + b"e"
+    items = sorted((key.encode(), item) for key, item in value.items())
+    return b"d" + b"".join(_encode(key) + _encode(item) for key, item in items) + b"e"
+
+
+def test_torrent_name_single_file() -> None:
+    torrent = _encode(
+        {
+            "announce": "http://tracker/announce",
+            "creation date": 1700000000,
+            "info": {"length": 123, "name": "Some.Movie.2023.mkv", "piece length": 16384, "pieces": b"\x00" * 200},
+        }
+    )
+
+    assert bencode.torrent_name(torrent) == "Some.Movie.2023.mkv"
+
+
+def test_torrent_name_multi_file_with_nested_values() -> None:
+    torrent = _encode(
+        {
+            "announce-list": [["http://a"], ["http://b", "http://c"]],
+            "info": {
+                "files": [{"length": n, "path": ["Season 1", f"e{n}.mkv"]} for n in range(50)],
+                "name": "Série 1",
+                "pieces": b"\xff" * 400,
+            },
+        }
+    )
+
+    assert bencode.torrent_name(torrent) == "Série 1"
+
+
+def test_torrent_name_stops_before_piece_table() -> None:
+    torrent = _encode({"info": {"name": "x", "pieces": b"\x00" * 100}})
+
+    assert bencode.torrent_name(torrent[: torrent.index(b"6:pieces")]) == "x"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"<html>Please log in</html>",
+        _encode({"announce": "x"}),
+        _encode({"info": {"length": 1}}),
+        _encode({"info": "not a dict"}),
+        b"d4:infod4:name99:shorte",
+        b"d4:infod4:name-1:e",
+    ],
+)
+def test_torrent_name_rejects_invalid_data(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        bencode.torrent_name(data)
+
+
+def test_info_hash_hashes_raw_info_dictionary() -> None:
+    info = _encode({"length": 123, "name": "Some.Movie.2023.mkv", "piece length": 16384, "pieces": b"\x00" * 20})
+    torrent = b"d8:announce3:url4:info" + info + b"7:comment4:teste"
+
+    assert bencode.info_hash(torrent) == hashlib.sha1(info).hexdigest()
+
+
+def test_info_hash_rejects_invalid_data() -> None:
+    with pytest.raises(ValueError):
+        bencode.info_hash(b"d8:announce3:urle")
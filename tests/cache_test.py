@@ -0,0 +1,123 @@
+import asyncio
+
+from feral_services.cache import SingleFlight, TTLCache
+from tests.helpers import FakeClock
+
+
+def test_ttl_cache_expires_entries() -> None:
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 59
+    assert cache.get("a") == 1
+
+    clock.now = 60
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl_cache_contains_does_not_count() -> None:
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+
+    assert "a" in cache
+    assert "b" not in cache
+    clock.now = 60
+    assert "a" not in cache
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_disabled_with_zero_ttl() -> None:
+    cache = TTLCache(max_size=10, ttl=0)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+
+
+def test_single_flight_coalesces_concurrent_calls() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run() -> list[int]:
+        results: list[int] = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)))
+        return results
+
+    assert asyncio.run(run()) == [1, 1, 1]
+    assert flight.coalesced == 2
+    assert len(flight) == 0
+
+
+def test_single_flight_propagates_errors_to_all_waiters() -> None:
+    flight = SingleFlight()
+
+    async def fetch() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run() -> list[int | BaseException]:
+        results: list[int | BaseException] = await asyncio.gather(
+            *(flight.do("key", fetch) for _ in range(2)), return_exceptions=True
+        )
+        return results
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError, ValueError]
+
+
+def test_single_flight_keeps_the_call_while_anyone_waits() -> None:
+    flight = SingleFlight()
+
+    async def fetch() -> int:
+        await asyncio.sleep(0.05)
+        return 1
+
+    async def run() -> int:
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result: int = await second
+        return result
+
+    assert asyncio.run(run()) == 1
+
+
+def test_single_flight_cancels_the_call_when_everyone_gives_up() -> None:
+    flight = SingleFlight()
+    finished = False
+
+    async def fetch() -> None:
+        nonlocal finished
+        await asyncio.sleep(0.05)
+        finished = True
+
+    async def run() -> None:
+        waiter = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+    assert not finished
+    assert len(flight) == 0
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any
+
+from feral_services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyWindow, hedged
+from tests.helpers import FakeClock
+
+
+def test_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker("jackett", "all", failures=3, reset_seconds=30, clock=FakeClock())
+
+    for success in (False, False, True, False, False):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CLOSED
+
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+    assert breaker.unavailable("Jackett") == "Jackett is unavailable, retrying in 30s"
+
+
+def test_half_open_lets_one_trial_through() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("jackett", "all", failures=1, reset_seconds=30, clock=clock)
+    breaker.record(False)
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == OPEN
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_half_open_trial_that_never_reports_expires() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("jackett", "all", failures=1, reset_seconds=30, clock=clock)
+    breaker.record(False)
+    clock.now += 30
+    assert breaker.allow()
+
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_latency_window_percentile_over_recent_samples() -> None:
+    window = LatencyWindow(size=10, min_samples=5)
+    for seconds in (1, 2, 3, 4):
+        window.observe(seconds)
+    assert window.percentile(0.95) is None
+
+    for seconds in range(5, 21):
+        window.observe(seconds)
+
+    assert len(window) == 10
+    assert window.percentile(0.5) == 16
+    assert window.percentile(0.95) == 20
+
+
+def _call(results: list[tuple[float, Any]]) -> Any:
+    calls = iter(results)
+
+    async def call(hedge: bool) -> Any:
+        delay, result = next(calls)
+        await asyncio.sleep(delay)
+        return result
+
+    return call
+
+
+def test_hedged_returns_first_answer_without_hedging() -> None:
+    assert asyncio.run(hedged(_call([(0, "first")]), 0.05, lambda result: result is None)) == "first"
+
+
+def test_hedged_second_request_wins_when_first_is_slow() -> None:
+    call = _call([(1, "first"), (0, "hedge")])
+
+    assert asyncio.run(hedged(call, 0.01, lambda result: result is None)) == "hedge"
+
+
+def test_hedged_waits_for_the_other_request_after_a_failure() -> None:
+    call = _call([(0.05, "first"), (0, None)])
+
+    assert asyncio.run(hedged(call, 0.01, lambda result: result is None)) == "first"
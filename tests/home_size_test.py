@@ -0,0 +1,132 @@
+import os
+from pathlib import Path
+from typing import Any
+
+from feral_services import home_size
+from feral_services.home_size import HomeSizeTracker
+
+
+def _walk_size(root: Path) -> int:
+    return sum(os.path.getsize(os.path.join(dirpath, file)) for dirpath, _, files in os.walk(root) for file in files)
+
+
+def _make_tree(root: Path) -> None:
+    for top in ("movies", "tv"):
+        for sub in range(3):
+            directory = root / top / f"release{sub}"
+            directory.mkdir(parents=True)
+            for n in range(4):
+                (directory / f"file{n}.mkv").write_bytes(b"x" * (100 * (sub + 1) + n))
+    (root / "readme.txt").write_bytes(b"hello")
+
+
+def test_scan_matches_full_walk(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    tracker = HomeSizeTracker(str(tmp_path))
+
+    assert tracker.scan() == _walk_size(tmp_path)
+    assert tracker.total == _walk_size(tmp_path)
+    assert tracker.age() is not None
+
+
+def test_scanning_while_scan_runs(tmp_path: Path, mocker: Any) -> None:
+    _make_tree(tmp_path)
+    tracker = HomeSizeTracker(str(tmp_path))
+    seen = []
+    list_dir = home_size._list_dir
+
+    def spy(path: str, mtime_ns: int) -> Any:
+        seen.append(tracker.scanning)
+        return list_dir(path, mtime_ns)
+
+    mocker.patch.object(home_size, "_list_dir", side_effect=spy)
+
+    assert not tracker.scanning
+    tracker.scan()
+
+    assert seen and all(seen)
+    assert not tracker.scanning
+
+
+def test_incremental_scan_only_relists_changed_directories(tmp_path: Path, mocker: Any) -> None:
+    _make_tree(tmp_path)
+    tracker = HomeSizeTracker(str(tmp_path))
+    tracker.scan()
+    list_dir = mocker.spy(home_size, "_list_dir")
+
+    (tmp_path / "tv" / "release1" / "new.mkv").write_bytes(b"y" * 1000)
+
+    assert tracker.scan() == _walk_size(tmp_path)
+    assert [call.args[0] for call in list_dir.call_args_list] == [str(tmp_path / "tv" / "release1")]
+
+
+def test_incremental_scan_picks_up_new_and_removed_directories(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    tracker = HomeSizeTracker(str(tmp_path))
+    tracker.scan()
+
+    new_dir = tmp_path / "movies" / "release9"
+    new_dir.mkdir()
+    (new_dir / "film.mkv").write_bytes(b"z" * 500)
+    for file in (tmp_path / "tv" / "release0").iterdir():
+        file.unlink()
+    (tmp_path / "tv" / "release0").rmdir()
+
+    assert tracker.scan() == _walk_size(tmp_path)
+
+
+def test_periodic_full_scan_catches_files_growing_in_place(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    tracker = HomeSizeTracker(str(tmp_path), full_scan_every=2)
+    tracker.scan()
+
+    with open(tmp_path / "movies" / "release0" / "file0.mkv", "ab") as file:
+        file.write(b"x" * 50)
+
+    tracker.scan()
+    assert tracker.scan() == _walk_size(tmp_path)
+
+
+def test_scan_does_not_follow_directory_symlinks(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    (tmp_path / "loop").symlink_to(tmp_path, target_is_directory=True)
+
+    assert HomeSizeTracker(str(tmp_path)).scan() == _walk_size(tmp_path)
+
+
+def test_scan_counts_hard_links_once(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    (tmp_path / "tv" / "release0" / "linked.mkv").hardlink_to(tmp_path / "movies" / "release0" / "file0.mkv")
+
+    tracker = HomeSizeTracker(str(tmp_path))
+
+    assert tracker.scan() == _walk_size(tmp_path) - 100
+
+
+def test_scan_follows_file_symlinks_like_walk(tmp_path: Path) -> None:
+    home = tmp_path / "home"
+    _make_tree(home)
+    outside = tmp_path / "outside.bin"
+    outside.write_bytes(b"o" * 300)
+    (home / "movies" / "pointer.bin").symlink_to(outside)
+
+    assert HomeSizeTracker(str(home)).scan() == _walk_size(home)
+
+
+def test_scan_skips_broken_symlinks(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    expected = _walk_size(tmp_path)
+    (tmp_path / "movies" / "broken.bin").symlink_to(tmp_path / "missing")
+
+    assert HomeSizeTracker(str(tmp_path)).scan() == expected
+
+
+def test_scan_reports_top_level_totals(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    tracker = HomeSizeTracker(str(tmp_path), workers=2)
+    tracker.scan()
+
+    assert tracker.top_level == {"movies": _walk_size(tmp_path / "movies"), "tv": _walk_size(tmp_path / "tv")}
+    assert tracker.largest(1) == [("movies", _walk_size(tmp_path / "movies"))]
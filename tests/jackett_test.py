@@ -1,9 +1,21 @@
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections.abc import AsyncIterator, Callable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Any
 
+import httpx
 import pytest
-from requests.exceptions import ConnectionError, Timeout
 
 from feral_services import jackett
+from feral_services.cache import TTLCache
+from feral_services.rate_limit import ConcurrencyLimit
+from feral_services.search_index import SearchIndex
 
 _SHAWSHANK_RESULTS = [
     {
@@ -75,6 +87,34 @@ _SHAWSHANK_RESULTS = [
 ]
 
 
+_MOCK_ENV = {
+    "JACKETT_URL": "http://jackett.local",
+    "JACKETT_URL_SEARCH": "/api/v2.0/indexers/all/results",
+    "JACKETT_API_KEY": "mock_value",
+}
+
+
+async def _aiter(chunks: list[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+def _mock_env(mocker: Any) -> None:
+    mocker.patch("os.getenv").side_effect = _MOCK_ENV.get
+
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    jackett._CACHE.clear()
+    jackett._BREAKERS.clear()
+    jackett._LATENCIES.clear()
+
+
+def _mock_client(mocker: Any, handler: Callable[[httpx.Request], Any]) -> None:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mocker.patch.object(jackett, "_get_client", return_value=client)
+
+
 @pytest.mark.parametrize(
     "query, expected_output",
     [
@@ -83,53 +123,440 @@ _SHAWSHANK_RESULTS = [
     ],
 )
 def test_search_valid_query(query: str, expected_output: Any, mocker: Any) -> None:
-    mocker.patch("os.getenv").side_effect = (
-        lambda x: "mock_value" if x in ["JACKETT_URL", "JACKETT_URL_SEARCH", "JACKETT_API_KEY"] else None
-    )
-    mocker.patch("requests.get").return_value.ok = True
-    mocker.patch("requests.get").return_value.json.return_value = {
-        "Results": expected_output,
-    }
+    _mock_env(mocker)
+    _mock_client(mocker, lambda request: httpx.Response(200, json={"Results": expected_output}))
+
+    _, output = asyncio.run(jackett.search(query))
 
-    _, output = jackett.search(query)
+    assert output == [{k: r[k] for k in jackett._RESULT_FIELDS if k in r} for r in expected_output]
 
-    assert output == expected_output
+
+def test_search_sends_query_and_categories(mocker: Any) -> None:
+    _mock_env(mocker)
+    requests_seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_seen.append(request)
+        return httpx.Response(200, json={"Results": []})
+
+    _mock_client(mocker, handler)
+
+    asyncio.run(jackett.search("Arcane"))
+
+    assert requests_seen[0].url.params["Query"] == "Arcane"
+    assert requests_seen[0].url.params.get_list("Category[]") == list(jackett._CATEGORIES)
 
 
 @pytest.mark.parametrize(
     "query, exception, error_message",
     [
-        ("The Godfather", Timeout, "Jackett timed out"),
-        ("The Dark Knight", ConnectionError, "Jackett didn't respond"),
+        ("The Godfather", httpx.ReadTimeout("timed out"), "Jackett timed out"),
+        ("The Dark Knight", httpx.ConnectError("refused"), "Jackett didn't respond"),
     ],
 )
-def test_search_invalid_query(query: str, exception: Any, error_message: str, mocker: Any) -> None:
-    mocker.patch("os.getenv").side_effect = (
-        lambda x: "mock_value" if x in ["JACKETT_URL", "JACKETT_URL_SEARCH", "JACKETT_API_KEY"] else None
-    )
-    mocker.patch("requests.get").side_effect = exception
+def test_search_invalid_query(query: str, exception: Exception, error_message: str, mocker: Any) -> None:
+    _mock_env(mocker)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise exception
 
-    error, _ = jackett.search(query)
+    _mock_client(mocker, handler)
+
+    error, _ = asyncio.run(jackett.search(query))
 
     assert error == error_message
 
 
 def test_search_generic_exception(mocker: Any) -> None:
-    mocker.patch("os.getenv").side_effect = (
-        lambda x: "mock_value" if x in ["JACKETT_URL", "JACKETT_URL_SEARCH", "JACKETT_API_KEY"] else None
-    )
-    mock_exception = ValueError("Test error message")
-    mocker.patch("requests.get").side_effect = mock_exception
+    _mock_env(mocker)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise ValueError("Test error message")
 
-    error, _ = jackett.search("The Lord of the Rings")
+    _mock_client(mocker, handler)
+
+    error, _ = asyncio.run(jackett.search("The Lord of the Rings"))
 
     assert error.startswith("Something went wrong: ValueError: Test error message")
     assert "Stack trace:" in error
     assert "Traceback" in error
 
 
+def test_search_bad_status(mocker: Any) -> None:
+    _mock_env(mocker)
+    _mock_client(mocker, lambda request: httpx.Response(502))
+
+    error, results = asyncio.run(jackett.search("Arcane"))
+
+    assert error == "502"
+    assert results is None
+
+
+def test_search_fails_fast_while_circuit_is_open(mocker: Any) -> None:
+    _mock_env(mocker)
+    handler = mocker.Mock(side_effect=httpx.ConnectError("refused"))
+    _mock_client(mocker, handler)
+
+    for _ in range(5):
+        assert asyncio.run(jackett.search("Arcane")) == ("Jackett didn't respond", None)
+    error, results = asyncio.run(jackett.search("Arcane"))
+
+    assert error == "Jackett is unavailable, retrying in 30s"
+    assert results is None
+    assert handler.call_count == 5
+    assert jackett.circuit_open()
+    assert not jackett.circuit_open("1337x")
+
+
+def test_search_timeout_follows_observed_p95(mocker: Any) -> None:
+    _mock_env(mocker)
+    timeouts: list[Any] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json={"Results": []})
+
+    _mock_client(mocker, handler)
+    for n in range(20):
+        jackett._latency("all").observe(5.0 if n == 19 else 1.0)
+
+    assert jackett.timeout_stats() == {"all": (5.0, 15.0)}
+    asyncio.run(jackett.search("Arcane"))
+
+    assert timeouts == [15.0]
+
+
+def _mock_slow_first_search(mocker: Any) -> Any:
+    _mock_env(mocker)
+    mocker.patch.dict(_MOCK_ENV, {"JACKETT_HEDGE": "1"})
+    for _ in range(20):
+        jackett._latency("all").observe(0.05)
+    calls = 0
+
+    async def search_upstream(query: str, indexer: str | None, timeout: Any) -> Any:
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0.3 if call == 1 else 0)
+        return None, [{"Guid": str(call)}]
+
+    return mocker.patch.object(jackett, "_search_upstream", side_effect=search_upstream)
+
+
+def test_search_hedges_a_slow_request(mocker: Any) -> None:
+    _mock_slow_first_search(mocker)
+
+    started = time.perf_counter()
+    assert asyncio.run(jackett.search("Arcane")) == (None, [{"Guid": "2"}])
+    assert time.perf_counter() - started < 0.25
+
+    # Both attempts are observed: the hedge's own latency, and the first one's time until it lost.
+    latency = jackett._latency("all")
+    assert len(latency) == 22
+    assert min(latency._sorted) < 0.05 <= max(latency._sorted)
+
+
+def test_search_skips_the_hedge_without_a_free_slot(mocker: Any) -> None:
+    search_upstream = _mock_slow_first_search(mocker)
+    mocker.patch.object(jackett, "_CONCURRENCY", ConcurrencyLimit(1))
+
+    assert asyncio.run(jackett.search("Arcane")) == (None, [{"Guid": "1"}])
+    assert search_upstream.call_count == 1
+    assert len(jackett._latency("all")) == 21
+
+
+def test_search_single_indexer_rewrites_path(mocker: Any) -> None:
+    _mock_env(mocker)
+    paths: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        return httpx.Response(200, json={"Results": []})
+
+    _mock_client(mocker, handler)
+
+    asyncio.run(jackett.search("Arcane", "1337x"))
+
+    assert paths == ["/api/v2.0/indexers/1337x/results"]
+
+
+def test_search_indexers_streams_as_they_complete(mocker: Any) -> None:
+    _mock_env(mocker)
+    mocker.patch.object(jackett, "_CONCURRENCY", ConcurrencyLimit(6))
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        indexer = request.url.path.split("/")[-2]
+        await asyncio.sleep({"fast": 0, "medium": 0.05, "dead": 5}[indexer])
+        return httpx.Response(200, json={"Results": [{"Guid": indexer}]})
+
+    _mock_client(mocker, handler)
+
+    async def run() -> list[jackett.IndexerResult]:
+        return [result async for result in jackett.search_indexers("Arcane", ["dead", "medium", "fast"], 0.5)]
+
+    started = time.perf_counter()
+    indexer_results = asyncio.run(run())
+
+    assert time.perf_counter() - started < 2
+    assert indexer_results == [
+        jackett.IndexerResult("fast", None, [{"Guid": "fast"}]),
+        jackett.IndexerResult("medium", None, [{"Guid": "medium"}]),
+        jackett.IndexerResult("dead", "timed out", []),
+    ]
+
+
+def test_search_indexers_deadline_starts_once_a_slot_is_free(mocker: Any) -> None:
+    _mock_env(mocker)
+    mocker.patch.object(jackett, "_CONCURRENCY", ConcurrencyLimit(4))
+    in_flight = peak = calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak, calls
+        calls += 1
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.3)
+        in_flight -= 1
+        return httpx.Response(200, json={"Results": [{"Guid": request.url.path}]})
+
+    _mock_client(mocker, handler)
+    indexers = [f"i{n}" for n in range(8)]
+
+    async def run() -> list[jackett.IndexerResult]:
+        return [result async for result in jackett.search_indexers("Arcane", indexers, 0.5)]
+
+    indexer_results = asyncio.run(run())
+
+    assert sorted(result.indexer for result in indexer_results) == indexers
+    assert all(result.error is None for result in indexer_results)
+    assert calls == 8
+    assert peak == 2
+
+
+def test_search_indexers_cancels_queued_searches_when_abandoned(mocker: Any) -> None:
+    _mock_env(mocker)
+    mocker.patch.object(jackett, "_CONCURRENCY", ConcurrencyLimit(2))
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"Results": []})
+
+    _mock_client(mocker, handler)
+
+    async def run() -> None:
+        async with contextlib.aclosing(jackett.search_indexers("Arcane", ["a", "b", "c", "d"], 1)) as results:
+            async for _ in results:
+                break
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+
+    assert calls == 2
+    assert jackett.concurrency_stats() == {"active": 0, "waiting": 0, "limit": 2}
+
+
+def test_fetch_link_does_not_use_search_slots(mocker: Any) -> None:
+    mocker.patch.object(jackett, "_CONCURRENCY", ConcurrencyLimit(1))
+    _mock_client(mocker, lambda request: httpx.Response(302, headers={"Location": "magnet:?xt=1"}))
+
+    async def run() -> tuple[str | None, str | None, bytes | None]:
+        async with jackett._CONCURRENCY.slot():
+            return await asyncio.wait_for(jackett.fetch_link("http://jackett/dl/1"), 1)
+
+    assert asyncio.run(run()) == (None, "magnet:?xt=1", None)
+
+
+def test_search_caches_normalized_query(mocker: Any) -> None:
+    _mock_env(mocker)
+    handler = mocker.Mock(return_value=httpx.Response(200, json={"Results": [{"Guid": "1"}]}))
+    _mock_client(mocker, handler)
+
+    first = asyncio.run(jackett.search("The  Shawshank Redemption"))
+    second = asyncio.run(jackett.search(" the shawshank redemption "))
+
+    assert first == second == (None, [{"Guid": "1"}])
+    assert handler.call_count == 1
+    assert jackett.cache_stats() == {"hits": 1, "misses": 1, "coalesced": 0, "size": 1}
+
+
+def test_search_writes_results_to_index(mocker: Any, tmp_path: str) -> None:
+    _mock_env(mocker)
+    result = {"Guid": "1", "Title": "The Shawshank Redemption", "Seeders": 5}
+    _mock_client(mocker, mocker.Mock(return_value=httpx.Response(200, json={"Results": [result]})))
+    mocker.patch.object(jackett, "_INDEX", SearchIndex(os.path.join(tmp_path, "index.db"), max_age=60))
+
+    assert asyncio.run(jackett.search_index("shawshank")) is None
+    asyncio.run(jackett.search("The Shawshank Redemption"))
+
+    indexed = asyncio.run(jackett.search_index("shawshank"))
+    assert indexed is not None and indexed[0] == [result]
+    assert jackett.is_cached("the shawshank redemption")
+    assert jackett.index_stats() == {"results": 1, "writes": 1}
+
+
+def test_search_does_not_cache_errors(mocker: Any) -> None:
+    _mock_env(mocker)
+    handler = mocker.Mock(return_value=httpx.Response(500))
+    _mock_client(mocker, handler)
+
+    asyncio.run(jackett.search("Arcane"))
+    asyncio.run(jackett.search("Arcane"))
+
+    assert handler.call_count == 2
+
+
+def test_search_coalesces_concurrent_identical_queries(mocker: Any) -> None:
+    _mock_env(mocker)
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"Results": [{"Guid": "1"}]})
+
+    _mock_client(mocker, handler)
+
+    async def run() -> list[tuple[str | None, list[dict[str, Any]] | None]]:
+        return await asyncio.gather(*(jackett.search("Arcane") for _ in range(5)))
+
+    outputs = asyncio.run(run())
+
+    assert outputs == [(None, [{"Guid": "1"}])] * 5
+    assert calls == 1
+    assert jackett.cache_stats()["coalesced"] == 4
+
+
+def test_search_streams_results_in_small_chunks(mocker: Any) -> None:
+    _mock_env(mocker)
+    body = json.dumps({"Results": _SHAWSHANK_RESULTS + _SHAWSHANK_RESULTS[:1], "Indexers": []}).encode()
+    chunks = [body[i : i + 7] for i in range(0, len(body), 7)]
+    _mock_client(mocker, lambda request: httpx.Response(200, content=_aiter(chunks)))
+
+    _, output = asyncio.run(jackett.search("Shawshank"))
+
+    assert output is not None
+    assert [r["Guid"] for r in output] == ["https://example.com/1", "https://example.com/2"]
+    assert set(output[0]) == set(jackett._RESULT_FIELDS)
+
+
+def test_search_keeps_only_top_k_when_configured(mocker: Any, monkeypatch: Any) -> None:
+    _mock_env(mocker)
+    monkeypatch.setattr(jackett.os, "getenv", lambda x: {**_MOCK_ENV, "JACKETT_STREAM_TOP_K": "1"}.get(x))
+    _mock_client(mocker, lambda request: httpx.Response(200, json={"Results": _SHAWSHANK_RESULTS}))
+
+    _, output = asyncio.run(jackett.search("Shawshank"))
+
+    assert [r["Guid"] for r in output] == ["https://example.com/1"]
+
+
+def test_search_reports_truncated_response(mocker: Any) -> None:
+    _mock_env(mocker)
+    _mock_client(mocker, lambda request: httpx.Response(200, content=b'{"Results": [{"Guid": "1"}, {"Gu'))
+
+    error, results = asyncio.run(jackett.search("Shawshank"))
+
+    assert error.startswith("Something went wrong: ValueError")
+    assert results is None
+
+
+def test_fetch_link_follows_magnet_redirect(mocker: Any) -> None:
+    _mock_client(mocker, lambda request: httpx.Response(302, headers={"Location": "magnet:?xt=urn:btih:abc"}))
+
+    assert asyncio.run(jackett.fetch_link("http://jackett/dl/1")) == (None, "magnet:?xt=urn:btih:abc", None)
+
+
+def test_fetch_link_streams_torrent_file(mocker: Any) -> None:
+    chunks = [b"d4:info", b"d4:name1:xee"]
+    _mock_client(mocker, lambda request: httpx.Response(200, content=_aiter(chunks)))
+
+    assert asyncio.run(jackett.fetch_link("http://jackett/dl/1")) == (None, None, b"d4:infod4:name1:xee")
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        httpx.Response(200, headers={"Content-Length": "2048"}, content=b"x"),
+        httpx.Response(200, content=_aiter([b"x" * 600, b"x" * 600])),
+    ],
+)
+def test_fetch_link_enforces_size_cap(response: httpx.Response, mocker: Any, monkeypatch: Any) -> None:
+    monkeypatch.setenv("TORRENT_MAX_BYTES", "1024")
+    _mock_client(mocker, lambda request: response)
+
+    assert asyncio.run(jackett.fetch_link("http://jackett/dl/1")) == ("Torrent file is too large", None, None)
+
+
+@pytest.mark.parametrize(
+    "outcome, expected_error",
+    [
+        (httpx.Response(404), "Indexer returned 404"),
+        (httpx.ReadTimeout("slow"), "Indexer timed out"),
+        (httpx.ConnectError("refused"), "Indexer didn't respond: ConnectError"),
+    ],
+)
+def test_fetch_link_errors(outcome: httpx.Response | Exception, expected_error: str, mocker: Any) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    _mock_client(mocker, handler)
+
+    assert asyncio.run(jackett.fetch_link("http://jackett/dl/1")) == (expected_error, None, None)
+
+
+class _SlowJackettHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        time.sleep(float(query["Query"][0]))
+        body = json.dumps({"Results": [{"Guid": query["Query"][0]}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def slow_jackett(monkeypatch: Any) -> Iterator[None]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowJackettHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("JACKETT_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("JACKETT_URL_SEARCH", "/api/v2.0/indexers/all/results")
+    monkeypatch.setenv("JACKETT_API_KEY", "key")
+    yield
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_concurrent_searches_overlap(slow_jackett: None) -> None:
+    delays = [0.1, 0.2, 0.3, 0.4, 0.5]
+
+    async def run() -> tuple[float, list[tuple[str | None, list[dict[str, Any]] | None]]]:
+        try:
+            started = time.perf_counter()
+            outputs = await asyncio.gather(*(jackett.search(str(delay)) for delay in delays))
+            return time.perf_counter() - started, outputs
+        finally:
+            await jackett.close()
+
+    elapsed, outputs = asyncio.run(run())
+
+    assert [results for _, results in outputs] == [[{"Guid": str(delay)}] for delay in delays]
+    assert max(delays) <= elapsed < max(delays) + 0.4 < sum(delays)
+
+
 def test_format_and_filter_results(mocker: Any) -> None:
-    mocker.patch("random.randint", side_effect=[11111, 22222])
+    mocker.patch.object(jackett, "_result_id", side_effect=["11111", "22222"])
 
     user_id = 12345
     memory_database: dict[int, dict[str, jackett.TorrentInfo]] = {}
@@ -184,3 +611,175 @@ def test_format_and_filter_results(mocker: Any) -> None:
         assert all(
             hasattr(torrent_info, attr) for attr in ["name", "size", "seeds", "peers", "source", "magnet", "link"]
         )
+
+
+def test_result_ids_are_stable_across_searches() -> None:
+    results = [
+        {
+            "Guid": f"https://example.com/{n}",
+            "Title": f"Title {n}",
+            "Size": 1024**3,
+            "Seeders": n + 1,
+            "Peers": 0,
+            "Tracker": "1337x",
+            "MagnetUri": None,
+            "Link": None,
+        }
+        for n in range(20)
+    ]
+    first: dict[int, dict[str, jackett.TorrentInfo]] = {}
+    second: dict[int, dict[str, jackett.TorrentInfo]] = {}
+
+    jackett.format_and_filter_results(results, 1, first)
+    jackett.format_and_filter_results(list(reversed(results[5:])), 2, second)
+
+    ids_by_name = {info.name: req_id for req_id, info in first[1].items()}
+    assert len(first[1]) == 20
+    assert all(ids_by_name[info.name] == req_id for req_id, info in second[2].items())
+    assert all(10000 <= int(req_id) <= 99999 for req_id in first[1])
+
+
+def test_result_id_probes_past_taken_ids() -> None:
+    result = {"Guid": "https://example.com/1"}
+    req_id = jackett._result_id(result, set())
+
+    next_id = jackett._result_id(result, {req_id})
+
+    assert next_id == str(10000 + (int(req_id) - 10000 + 1) % 90000)
+
+
+def _ranked(n: int, seeders: int, **fields: Any) -> dict[str, Any]:
+    return {"Guid": str(n), "Seeders": seeders, "Size": 1024**3, **fields}
+
+
+def test_rank_results_matches_full_sort_by_seeders() -> None:
+    results = [_ranked(n, seeders) for n, seeders in enumerate([5, 0, 80, 12, 80, 3, 0, 44])]
+
+    ranked = jackett.rank_results(results, 4, jackett.RankingWeights())
+
+    expected = [r for r in sorted(results, key=lambda r: r["Seeders"], reverse=True) if r["Seeders"] >= 1][:4]
+    assert ranked == expected
+
+
+def test_rank_results_filters_unseeded_before_selecting() -> None:
+    results = [_ranked(n, 0, DownloadVolumeFactor=0.0) for n in range(3)] + [_ranked(n, 1) for n in range(3, 6)]
+
+    ranked = jackett.rank_results(results, 3, jackett.RankingWeights(freeleech=100))
+
+    assert [r["Guid"] for r in ranked] == ["3", "4", "5"]
+
+
+def test_rank_results_combines_weights() -> None:
+    small_popular = _ranked(1, 50, Size=1024**3, Gain=1.0)
+    large_freeleech = _ranked(2, 10, Size=40 * 1024**3, Gain=400.0, DownloadVolumeFactor=0.0)
+
+    by_seeders = jackett.rank_results([small_popular, large_freeleech], 2, jackett.RankingWeights())
+    by_gain = jackett.rank_results([small_popular, large_freeleech], 2, jackett.RankingWeights(seeders=0, gain=1))
+
+    assert by_seeders == [small_popular, large_freeleech]
+    assert by_gain == [large_freeleech, small_popular]
+
+
+def _release(tracker: str, seeders: int, **fields: Any) -> dict[str, Any]:
+    return {
+        "Guid": f"https://{tracker}/1",
+        "Title": "Some.Show.S01E01.1080p.WEB.H264-GROUP",
+        "Size": 1_500_000_000,
+        "Seeders": seeders,
+        "Peers": seeders // 2,
+        "Tracker": tracker,
+        "MagnetUri": None,
+        "Link": f"https://{tracker}/dl/1",
+        **fields,
+    }
+
+
+def test_merge_duplicates_by_info_hash_keeps_best_source() -> None:
+    results = [
+        _release("1337x", 40, InfoHash="ABC"),
+        _release("TGx", 90, InfoHash="abc", Title="Other name", Peers=3),
+        _release("IPTorrents", 10, InfoHash="def", Title="Another release"),
+    ]
+
+    merged = jackett.merge_duplicates(results)
+
+    assert merged == [
+        {**results[1], "OtherTrackers": 1, "Peers": 20},
+        results[2],
+    ]
+    assert "OtherTrackers" not in results[1]
+
+
+def test_merge_duplicates_by_normalized_title_and_size() -> None:
+    results = [
+        _release("1337x", 40),
+        _release("TGx", 15, Title="some show s01e01 1080p web h264 group", Size=1_500_000_100),
+        _release("IPTorrents", 50, InfoHash="abc", Title="Some Show - S01E01 [1080p WEB H264] GROUP"),
+        _release("RARBG", 70, Size=3_000_000_000),
+    ]
+
+    merged = jackett.merge_duplicates(results)
+
+    assert [(r["Tracker"], r.get("OtherTrackers"), r["Seeders"], r.get("InfoHash")) for r in merged] == [
+        ("IPTorrents", 2, 50, "abc"),
+        ("RARBG", None, 70, None),
+    ]
+
+
+def test_merge_duplicates_keeps_different_hashes_apart() -> None:
+    results = [_release("1337x", 40, InfoHash="abc"), _release("TGx", 15, InfoHash="def")]
+
+    assert jackett.merge_duplicates(results) == results
+
+
+def test_format_and_filter_results_merges_duplicates() -> None:
+    results = [_release("1337x", 40, InfoHash="abc"), _release("TGx", 90, InfoHash="abc", Guid="https://tgx/2")]
+    user_results: dict[int, dict[str, jackett.TorrentInfo]] = {}
+
+    text = jackett.format_and_filter_results(results, 1, user_results)
+
+    assert text.startswith("Results (1/1)")
+    assert "TGx +1 | Seeds: 90" in text
+    [info] = user_results[1].values()
+    assert (info.source, info.other_sources) == ("TGx", 1)
+    assert (info.link, info.guid, info.info_hash) == ("https://TGx/dl/1", "https://tgx/2", "abc")
+
+
+def test_more_results_pages_through_the_ranked_set() -> None:
+    results = [_release(f"tracker{n}", n, Guid=f"https://example.com/{n}", Title=f"Release {n}") for n in range(50)]
+    user_results: dict[int, dict[str, jackett.TorrentInfo]] = {}
+    pages = TTLCache(max_size=8, ttl=60)
+
+    first = jackett.format_and_filter_results(results, 1, user_results, pages)
+    second = jackett.format_more_results(1, user_results, pages)
+    third = jackett.format_more_results(1, user_results, pages)
+
+    assert first.startswith("Results (20/50)") and first.endswith("/more - next 20 of 29 more")
+    assert second.startswith("Results (21-40/50)") and second.endswith("/more - next 9 of 9 more")
+    assert third.startswith("Results (41-49/50)") and "/more" not in third
+    assert jackett.format_more_results(1, user_results, pages) == "No more results"
+    assert sorted(info.seeds for info in user_results[1].values()) == list(range(1, 50))
+
+
+def test_more_results_ranks_only_when_asked(mocker: Any) -> None:
+    results = [_release(f"tracker{n}", n + 1, Title=f"Release {n}") for n in range(30)]
+    user_results: dict[int, dict[str, jackett.TorrentInfo]] = {}
+    pages = TTLCache(max_size=8, ttl=60)
+    rank = mocker.spy(jackett, "rank_results")
+
+    jackett.format_and_filter_results(results, 1, user_results, pages)
+    assert [call.args[1] for call in rank.call_args_list] == [20]
+
+    jackett.format_more_results(1, user_results, pages)
+    jackett.format_more_results(1, user_results, pages)
+    assert [call.args[1] for call in rank.call_args_list] == [20, 30]
+
+
+def test_more_results_after_expiry() -> None:
+    assert jackett.format_more_results(1, {}, TTLCache(max_size=8, ttl=60)) == "Results expired, please /search again"
+
+
+def test_ranking_weights_from_env(monkeypatch: Any) -> None:
+    monkeypatch.setenv("JACKETT_RANKING", "seeders=1, gain=0.5,freeleech=20,unknown=3")
+
+    assert jackett.ranking_weights() == jackett.RankingWeights(seeders=1, gain=0.5, freeleech=20)
@@ -0,0 +1,364 @@
+import asyncio
+import datetime
+import re
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+import pytest
+from telegram import Chat, Message, Update
+
+import main
+from feral_services import jackett
+from feral_services.cache import TTLCache
+from feral_services.jackett import IndexerResult, TorrentInfo
+from feral_services.result_store import ResultStore
+from feral_services.space_usage import BackgroundUsage, SpaceMonitor, SpaceUsage
+from feral_services.update_processor import ChatOrderedUpdateProcessor
+
+_USER_ID = 42
+
+
+class FakeChat:
+    # What the bot sent, with edits applied in place, so a test reads the chat as the user would.
+    def __init__(self, mocker: Any) -> None:
+        self.messages: list[str] = []
+        self.edits = 0
+        self._mocker = mocker
+
+    def update(self, text: str) -> Any:
+        message = self._mocker.Mock(text=text, reply_text=self._reply)
+        user = self._mocker.Mock(id=_USER_ID, username="user")
+        return self._mocker.Mock(message=message, effective_user=user, effective_chat=self._mocker.Mock(id=_USER_ID))
+
+    async def _reply(self, text: str) -> Any:
+        self.messages.append(text)
+        index = len(self.messages) - 1
+
+        async def edit_text(text: str) -> Any:
+            self.messages[index] = text
+            self.edits += 1
+            return sent
+
+        sent = self._mocker.Mock(message_id=index + 1, text=text, edit_text=edit_text)
+        return sent
+
+
+class FakeContext:
+    def __init__(self, mocker: Any) -> None:
+        self.bot = mocker.Mock(edit_message_text=mocker.AsyncMock())
+        self.application = mocker.Mock(create_task=self._create_task)
+        self.tasks: list[asyncio.Task[Any]] = []
+
+    def _create_task(self, coroutine: Awaitable[Any], update: object = None) -> asyncio.Task[Any]:
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.append(task)
+        return task
+
+    async def finish(self) -> None:
+        await asyncio.gather(*self.tasks)
+
+
+@pytest.fixture(autouse=True)
+def bot_state(mocker: Any) -> None:
+    mocker.patch.object(main, "_USERS", {_USER_ID})
+    mocker.patch.object(main, "_RESULTS", ResultStore(ttl=60, max_results=1000))
+    mocker.patch.object(main, "_LAST_RESULT_MSG_IDS", TTLCache(max_size=10, ttl=60))
+    mocker.patch.object(main, "_RESULT_PAGES", TTLCache(max_size=10, ttl=60))
+    for limiter in main._RATE_LIMITERS.values():
+        mocker.patch.object(limiter, "acquire", return_value=(True, 0.0))
+
+
+def _result(guid: str, seeders: int = 10) -> dict[str, Any]:
+    return {
+        "Guid": guid,
+        "Title": f"Arcane {guid}",
+        "Size": 1024**3,
+        "Seeders": seeders,
+        "Peers": 1,
+        "Tracker": "1337x",
+        "MagnetUri": f"magnet:?xt=urn:btih:{guid}",
+        "Link": "",
+    }
+
+
+def _telegram_update(update_id: int, chat_id: int = _USER_ID) -> Update:
+    chat = Chat(chat_id, Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, datetime.datetime.now(datetime.UTC), chat))
+
+
+async def _in_one_chat(*handlers: Callable[[], Awaitable[Any]]) -> None:
+    # Runs handlers as consecutive updates of one chat, the way the bot orders them; each must finish within 1s.
+    processor = ChatOrderedUpdateProcessor(4)
+    async with processor:
+        for update_id, handler in enumerate(handlers):
+            await asyncio.wait_for(processor.process_update(_telegram_update(update_id), handler()), 1)
+
+
+def _mock_indexers(mocker: Any, indexer_results: list[tuple[float, IndexerResult]]) -> None:
+    async def search_indexers(term: str, indexers: list[str]) -> AsyncIterator[IndexerResult]:
+        for delay, indexer_result in indexer_results:
+            await asyncio.sleep(delay)
+            yield indexer_result
+
+    mocker.patch.object(jackett, "configured_indexers", return_value=[result.indexer for _, result in indexer_results])
+    mocker.patch.object(jackett, "search_index", mocker.AsyncMock(return_value=None))
+    mocker.patch.object(jackett, "search_indexers", search_indexers)
+
+
+def test_indexer_search_shows_only_the_first_line_of_errors(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    error = "Something went wrong: KeyError: 'x'\n\nStack trace:\n" + "  File ...\n" * 500
+    _mock_indexers(mocker, [(0, IndexerResult("a", error, [])), (0, IndexerResult("b", None, [_result("1")]))])
+
+    async def run() -> None:
+        await main.search(chat.update("/search arcane"), context)
+        await context.finish()
+
+    asyncio.run(run())
+
+    assert chat.messages[0].startswith("Results (1/1)")
+    assert chat.messages[0].endswith("a: Something went wrong: KeyError: 'x'")
+
+
+def test_indexer_search_renders_once_per_interval(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    mocker.patch.object(main, "_SEARCH_EDIT_INTERVAL", 0.2)
+    _mock_indexers(mocker, [(0.01, IndexerResult(str(n), None, [_result(str(n))])) for n in range(6)])
+    format_results = mocker.spy(jackett, "format_and_filter_results")
+
+    async def run() -> None:
+        await main.search(chat.update("/search arcane"), context)
+        await context.finish()
+
+    asyncio.run(run())
+
+    assert format_results.call_count == 1
+    assert chat.edits == 1
+    assert chat.messages[0].startswith("Results (6/6)")
+
+
+def test_indexer_search_does_not_hold_the_chat(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    _mock_indexers(mocker, [(0.3, IndexerResult("a", None, [_result("1")]))])
+
+    async def run() -> None:
+        await _in_one_chat(
+            lambda: main.search(chat.update("/search arcane"), context),
+            lambda: main.more(chat.update("/more"), context),
+        )
+        assert chat.messages == ["Searching 1 indexers...\n\nWaiting on: a", "Results expired, please /search again"]
+        await context.finish()
+
+    asyncio.run(run())
+
+    assert chat.messages[0].startswith("Results (1/1)")
+
+
+def test_indexer_search_stops_once_a_newer_search_starts(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+
+    async def search_indexers(term: str, indexers: list[str]) -> AsyncIterator[IndexerResult]:
+        await asyncio.sleep(0.3 if "old" in term else 0)
+        yield IndexerResult("a", None, [_result(term.strip())])
+
+    mocker.patch.object(jackett, "configured_indexers", return_value=["a"])
+    mocker.patch.object(jackett, "search_index", mocker.AsyncMock(return_value=None))
+    mocker.patch.object(jackett, "search_indexers", search_indexers)
+
+    async def run() -> None:
+        await main.search(chat.update("/search old"), context)
+        await main.search(chat.update("/search new"), context)
+        await context.finish()
+
+    asyncio.run(run())
+
+    assert chat.messages[0] == "Searching 1 indexers...\n\nWaiting on: a"
+    assert chat.messages[1].startswith("Results (1/1)")
+    assert [result.name for result in main._RESULTS[_USER_ID].values()] == ["Arcane new"]
+    assert _get_command(chat.messages[1])[len("/get") :] in main._RESULTS[_USER_ID]
+
+
+def test_queued_search_does_not_hold_a_worker(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    processor = ChatOrderedUpdateProcessor(1)
+    context.application.update_processor = processor
+    mocker.patch.object(main._RATE_LIMITERS["search"], "acquire", return_value=(True, 0.5))
+    mocker.patch.object(jackett, "configured_indexers", return_value=[])
+    mocker.patch.object(jackett, "is_cached", return_value=True)
+    mocker.patch.object(jackett, "search", mocker.AsyncMock(return_value=(None, [_result("1")])))
+
+    async def run() -> float:
+        async with processor:
+            queued = asyncio.ensure_future(
+                processor.process_update(_telegram_update(0), main.search(chat.update("/search arcane"), context))
+            )
+            await asyncio.sleep(0.05)
+            started = time.perf_counter()
+            await processor.process_update(_telegram_update(1, chat_id=200), asyncio.sleep(0))
+            other_chat = time.perf_counter() - started
+            await queued
+        return other_chat
+
+    assert asyncio.run(run()) < 0.1
+    assert chat.messages[0] == "Busy, your /search will start in about 1s"
+    assert chat.messages[1].startswith("Results (1/1)")
+
+
+def _mock_indexed_search(mocker: Any, error: str | None, results: list[dict[str, Any]] | None) -> None:
+    async def search(term: str) -> tuple[str | None, list[dict[str, Any]] | None]:
+        await asyncio.sleep(0.3)
+        return error, results
+
+    mocker.patch.object(jackett, "configured_indexers", return_value=[])
+    mocker.patch.object(jackett, "is_cached", return_value=False)
+    mocker.patch.object(jackett, "circuit_open", return_value=False)
+    mocker.patch.object(jackett, "search_index", mocker.AsyncMock(return_value=([_result("1")], time.time() - 120)))
+    mocker.patch.object(jackett, "search", search)
+
+
+def _get_command(text: str) -> str:
+    match = re.search(r"^/get\d+", text, re.MULTILINE)
+    assert match
+    return match.group()
+
+
+def test_indexed_search_refreshes_without_holding_the_chat(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    _mock_indexed_search(mocker, None, [_result("1"), _result("2", seeders=20)])
+    mocker.patch.object(main.ru_torrent, "is_loaded", mocker.AsyncMock(return_value=False))
+    mocker.patch.object(main.ru_torrent, "upload_magnet", mocker.AsyncMock(return_value="Success - Arcane 1"))
+
+    async def run() -> None:
+        await _in_one_chat(
+            lambda: main.search(chat.update("/search arcane"), context),
+            lambda: main.get(chat.update(_get_command(chat.messages[0])), context),
+        )
+        assert chat.messages[0].endswith("Cached 2 min ago, refreshing...")
+        assert chat.messages[1] == "Success - Arcane 1"
+        await context.finish()
+
+    asyncio.run(run())
+
+    assert chat.messages[0].startswith("Results (2/2)")
+
+
+def test_indexed_search_reports_only_the_first_line_of_a_failed_refresh(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    _mock_indexed_search(mocker, "Something went wrong: KeyError: 'x'\n\nStack trace:\n...", None)
+
+    async def run() -> None:
+        await main.search(chat.update("/search arcane"), context)
+        await context.finish()
+
+    asyncio.run(run())
+
+    assert chat.messages[0].endswith("Cached 2 min ago, refresh failed: Something went wrong: KeyError: 'x'")
+
+
+def _store_results(count: int) -> list[str]:
+    results = {
+        str(10000 + n): TorrentInfo(f"Arcane {n}", "1.0 GB", n, 0, "1337x", f"magnet:?xt=urn:btih:{n:040x}", "")
+        for n in range(count)
+    }
+    main._RESULTS[_USER_ID] = results
+    return list(results)
+
+
+def _mock_uploads(mocker: Any, delay: float = 0) -> Any:
+    async def upload_magnet(magnet: str, label: str, username: str, result: TorrentInfo) -> str:
+        await asyncio.sleep(delay)
+        return f"Success - {result.name}"
+
+    mocker.patch.object(main.ru_torrent, "is_loaded", mocker.AsyncMock(return_value=False))
+    return mocker.patch.object(main.ru_torrent, "upload_magnet", side_effect=upload_magnet)
+
+
+def _get(mocker: Any, text: str) -> list[str]:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    asyncio.run(main.get(chat.update(text), context))
+    return chat.messages
+
+
+def test_get_batch_replies_once_and_skips_repeated_ids(mocker: Any) -> None:
+    ids = _store_results(3)
+    upload_magnet = _mock_uploads(mocker)
+
+    messages = _get(mocker, f"/get {ids[0]} {ids[2]} {ids[0]} 999")
+
+    assert messages == ["Success - Arcane 0\n\nSuccess - Arcane 2\n\nNot a valid item: 999"]
+    assert upload_magnet.call_count == 2
+
+
+def test_get_top_picks_the_best_seeded(mocker: Any) -> None:
+    _store_results(5)
+    _mock_uploads(mocker)
+
+    assert _get(mocker, "/get top 2") == ["Success - Arcane 4\n\nSuccess - Arcane 3"]
+    assert _get(mocker, "/get top") == ["Success - Arcane 4"]
+
+
+def test_get_batch_bounds_concurrent_uploads(mocker: Any) -> None:
+    ids = _store_results(8)
+    in_flight = peak = 0
+    upload_magnet = _mock_uploads(mocker, delay=0.01).side_effect
+
+    async def counted(*args: Any) -> str:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            result: str = await upload_magnet(*args)
+            return result
+        finally:
+            in_flight -= 1
+
+    mocker.patch.object(main.ru_torrent, "upload_magnet", side_effect=counted)
+
+    messages = _get(mocker, "/get " + " ".join(ids))
+
+    assert len(messages) == 1 and messages[0].count("Success") == 8
+    assert peak == main._GET_CONCURRENCY
+
+
+def test_get_batch_reports_ids_over_the_limit(mocker: Any) -> None:
+    ids = _store_results(12)
+    upload_magnet = _mock_uploads(mocker)
+
+    (message,) = _get(mocker, "/get " + " ".join(ids))
+
+    assert upload_magnet.call_count == main._GET_BATCH_LIMIT
+    assert message.endswith(f"Skipped 2 more, /get takes up to {main._GET_BATCH_LIMIT} at a time")
+    assert _get(mocker, "/get top 15")[0].endswith("Skipped 2 more, /get takes up to 10 at a time")
+
+
+def test_space_does_not_wait_for_du(mocker: Any) -> None:
+    chat = FakeChat(mocker)
+    context: Any = FakeContext(mocker)
+    measured = threading.Event()
+    reading = SpaceUsage(2 * 1024**3, measured_at=time.time())
+    du = BackgroundUsage(mocker.Mock(side_effect=lambda: measured.wait(1) and reading), ttl=60)
+    mocker.patch.object(main, "_SPACE", SpaceMonitor([("du", du)], ttl=60, limit=4 * 1024**3))
+
+    async def run() -> None:
+        await asyncio.wait_for(main.spaceforce(chat.update("/spaceforce"), context), 0.5)
+        measured.set()
+        while du.refreshing:
+            await asyncio.sleep(0.001)
+        await asyncio.wait_for(main.space(chat.update("/space"), context), 0.5)
+
+    asyncio.run(run())
+
+    assert chat.messages == [
+        "Space used: still calculating, try again in a minute",
+        "Space used: 2.00/4 GB (50%) (via du, updated just now)",
+    ]
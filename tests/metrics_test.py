@@ -0,0 +1,102 @@
+import asyncio
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+
+import pytest
+
+from feral_services import metrics
+
+
+@pytest.fixture
+def registered() -> Iterator[list[str]]:
+    names: list[str] = []
+    yield names
+    for name in names:
+        metrics.unregister(name)
+
+
+def test_counter_renders_per_label(registered: list[str]) -> None:
+    counter = metrics.counter("test_requests_total", "Requests", ("command",))
+    registered.append(counter.name)
+    counter.inc(command="search")
+    counter.inc(2, command="search")
+    counter.inc(command='we"ird')
+
+    assert counter.value(command="search") == 3
+    assert 'test_requests_total{command="search"} 3.0' in metrics.render()
+    assert 'test_requests_total{command="we\\"ird"} 1.0' in metrics.render()
+
+
+def test_histogram_buckets_are_cumulative(registered: list[str]) -> None:
+    histogram = metrics.histogram("test_seconds", "Latency")
+    registered.append(histogram.name)
+    for value in (0.003, 0.2, 0.2, 100):
+        histogram.observe(value)
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{le="0.005"} 1' in lines
+    assert 'test_seconds_bucket{le="0.25"} 3' in lines
+    assert 'test_seconds_bucket{le="60.0"} 3' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 4' in lines
+    assert "test_seconds_count 4" in lines
+    assert "test_seconds_sum 100.403" in lines
+
+
+def test_callback_is_read_at_render_time(registered: list[str]) -> None:
+    values: dict[tuple[str, ...], float] = {("hits",): 1.0}
+    metrics.callback("test_cache", "Cache", "gauge", lambda: values, ("stat",))
+    metrics.callback("test_broken", "Broken", "gauge", lambda: 1 / 0)
+    registered += ["test_cache", "test_broken"]
+    values[("misses",)] = 2.0
+
+    rendered = metrics.render()
+
+    assert 'test_cache{stat="hits"} 1.0' in rendered
+    assert 'test_cache{stat="misses"} 2.0' in rendered
+    assert "# test_broken failed: ZeroDivisionError" in rendered
+
+
+def test_duplicate_names_are_rejected(registered: list[str]) -> None:
+    registered.append(metrics.counter("test_duplicate", "Duplicate").name)
+
+    with pytest.raises(ValueError):
+        metrics.counter("test_duplicate", "Duplicate")
+
+
+def test_timed_records_duration_and_errors(registered: list[str]) -> None:
+    duration = metrics.histogram("test_command_seconds", "Duration", ("command",))
+    errors = metrics.counter("test_command_errors_total", "Errors", ("command",))
+    registered += [duration.name, errors.name]
+
+    @metrics.timed(duration, errors, command="search")
+    async def handler(fail: bool) -> str:
+        if fail:
+            raise RuntimeError("boom")
+        return "ok"
+
+    assert asyncio.run(handler(False)) == "ok"
+    with pytest.raises(RuntimeError):
+        asyncio.run(handler(True))
+
+    assert duration.count(command="search") == 2
+    assert errors.value(command="search") == 1
+
+
+def test_serve_exposes_metrics_endpoint(registered: list[str]) -> None:
+    registered.append(metrics.counter("test_served_total", "Served").name)
+    server = metrics.serve(0)
+    port = server.server_address[1]
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain")
+        assert "# TYPE test_served_total counter" in body
+        assert "# TYPE feral_upstream_request_seconds histogram" in body
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
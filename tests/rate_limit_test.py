@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from feral_services.rate_limit import ConcurrencyLimit, Limit, RateLimiter, TokenBucket
+from tests.helpers import FakeClock
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("3/30", Limit(3, 30)), ("5", Limit(5, 1)), ("0.5/1", Limit(0.5, 1))],
+)
+def test_limit_parse(value: str, expected: Limit) -> None:
+    assert Limit.parse(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "x/10", "0/10", "3/0", "-1/5"])
+def test_limit_parse_rejects_invalid(value: str) -> None:
+    with pytest.raises(ValueError):
+        Limit.parse(value)
+
+
+def test_token_bucket_refills_up_to_burst() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(Limit(2, 10), clock)
+
+    for _ in range(2):
+        assert bucket.wait_time() == 0
+        bucket.take()
+    assert bucket.wait_time() == pytest.approx(5)
+
+    clock.now += 100
+    bucket.wait_time()
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time() == pytest.approx(5)
+
+
+def test_rate_limiter_queues_then_rejects() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(Limit(2, 10), Limit(100, 1), max_wait=10, clock=clock)
+
+    results = [limiter.acquire("user") for _ in range(5)]
+
+    assert results == [(True, 0), (True, 0), (True, pytest.approx(5)), (True, pytest.approx(10)), (False, 15)]
+    assert (limiter.admitted, limiter.queued, limiter.rejected) == (4, 2, 1)
+
+
+def test_rate_limiter_budgets_are_per_user() -> None:
+    limiter = RateLimiter(Limit(1, 60), Limit(100, 1), max_wait=0, clock=FakeClock())
+
+    assert limiter.acquire("a")[0]
+    assert not limiter.acquire("a")[0]
+    assert limiter.acquire("b")[0]
+
+
+def test_rate_limiter_global_budget_is_shared() -> None:
+    limiter = RateLimiter(Limit(10, 1), Limit(2, 60), max_wait=0, clock=FakeClock())
+
+    assert [limiter.acquire(user)[0] for user in ("a", "b", "c")] == [True, True, False]
+
+
+def test_rate_limiter_rejection_takes_no_tokens() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(Limit(1, 10), Limit(100, 1), max_wait=0, clock=clock)
+    limiter.acquire("user")
+    for _ in range(10):
+        limiter.acquire("user")
+
+    clock.now += 10
+    assert limiter.acquire("user") == (True, 0)
+
+
+def test_concurrency_limit_bounds_active_calls() -> None:
+    limit = ConcurrencyLimit(2)
+    peak = 0
+
+    async def call() -> None:
+        nonlocal peak
+        async with limit.slot():
+            peak = max(peak, limit.active)
+            await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        tasks = [asyncio.create_task(call()) for _ in range(6)]
+        await asyncio.sleep(0)
+        assert limit.waiting == 4
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    asyncio.run(run())
+
+    assert peak == 2
+    assert (limit.active, limit.waiting) == (0, 0)
@@ -0,0 +1,121 @@
+import contextlib
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+from feral_services.jackett import TorrentInfo
+from feral_services.result_store import ResultStore
+from tests.helpers import FakeClock
+
+
+def _results(*req_ids: str) -> dict[str, TorrentInfo]:
+    return {
+        req_id: TorrentInfo(f"name{req_id}", "1.0 GB", 10, 1, "1337x", f"magnet:{req_id}", "") for req_id in req_ids
+    }
+
+
+def test_store_returns_results_until_they_expire() -> None:
+    clock = FakeClock()
+    store = ResultStore(ttl=60, max_results=100, clock=clock)
+    store[1] = _results("11111")
+
+    clock.now += 59
+    assert store.get(1) == _results("11111")
+
+    clock.now += 1
+    assert store.get(1) is None
+    assert 1 not in store
+    assert store.result_count == 0
+
+
+def test_store_evicts_least_recently_used_users_over_the_cap() -> None:
+    store = ResultStore(ttl=60, max_results=4)
+    store[1] = _results("1", "2")
+    store[2] = _results("3", "4")
+    store.get(1)
+    store[3] = _results("5")
+
+    assert set(store) == {1, 3}
+    assert store.result_count == 3
+
+
+def test_store_replacing_results_updates_count() -> None:
+    store = ResultStore(ttl=60, max_results=10)
+    store[1] = _results("1", "2", "3")
+    store[1] = _results("4")
+
+    assert store.result_count == 1
+    del store[1]
+    assert store.result_count == 0
+
+
+def test_store_persists_across_restarts(tmp_path: Path) -> None:
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(ttl=60, max_results=10, path=path)
+    store[1] = _results("11111", "22222")
+    store.close()
+
+    reopened = ResultStore(ttl=60, max_results=10, path=path)
+
+    assert reopened[1] == _results("11111", "22222")
+    reopened.close()
+
+
+def test_store_reloads_evicted_users_from_disk(tmp_path: Path) -> None:
+    store = ResultStore(ttl=60, max_results=1, path=str(tmp_path / "results.sqlite"))
+    store[1] = _results("1")
+    store[2] = _results("2")
+
+    assert len(store) == 1
+    assert store[1] == _results("1")
+    store.close()
+
+
+def test_store_drops_expired_rows_on_open(tmp_path: Path) -> None:
+    clock = FakeClock()
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(ttl=60, max_results=10, path=path, clock=clock)
+    store[1] = _results("1")
+    store.close()
+
+    clock.now += 120
+    reopened = ResultStore(ttl=60, max_results=10, path=path, clock=clock)
+
+    with pytest.raises(KeyError):
+        reopened[1]
+    reopened.close()
+
+
+def _stored_users(path: str) -> list[int]:
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        return [user_id for (user_id,) in db.execute("SELECT user_id FROM results ORDER BY user_id")]
+
+
+def test_store_batches_writes_until_flushed(tmp_path: Path) -> None:
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(ttl=60, max_results=10, path=path, delay=60)
+    store[1] = _results("1")
+    store[2] = _results("2")
+    store[1] = _results("3")
+    del store[2]
+
+    assert _stored_users(path) == []
+    store.flush()
+    assert _stored_users(path) == [1]
+    assert store.writes == 1
+    store.close()
+
+
+def test_store_flushes_in_the_background(tmp_path: Path) -> None:
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(ttl=60, max_results=10, path=path, delay=0.01)
+    store[1] = _results("1")
+
+    deadline = time.monotonic() + 2
+    while not store.writes and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert _stored_users(path) == [1]
+    store.close()
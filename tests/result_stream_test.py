@@ -0,0 +1,60 @@
+import json
+from typing import Any
+
+import pytest
+
+from feral_services.result_stream import ResultCollector, ResultsParser
+
+_FIELDS = ("Guid", "Title", "Seeders")
+
+
+def _results(count: int) -> list[dict[str, Any]]:
+    return [
+        {"Guid": f"guid-{n}", "Title": f'Título {n} \\u00e9 "quoted"', "Seeders": n, "Unused": [n, {"x": "]"}]}
+        for n in range(count)
+    ]
+
+
+def _parse(body: bytes, chunk_size: int) -> list[dict[str, Any]]:
+    parser = ResultsParser(_FIELDS)
+    parsed = []
+    for i in range(0, len(body), chunk_size):
+        parsed.extend(parser.feed(body[i : i + chunk_size]))
+    parser.close()
+    return parsed
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 10_000])
+def test_parser_handles_any_chunk_boundary(chunk_size: int) -> None:
+    results = _results(25)
+    body = json.dumps({"Results": results, "Indexers": [{"ID": "x", "Results": 25}]}, ensure_ascii=False).encode()
+
+    assert _parse(body, chunk_size) == [{field: r[field] for field in _FIELDS} for r in results]
+
+
+def test_parser_without_results_returns_nothing() -> None:
+    assert _parse(b'{"Indexers": []}', 4) == []
+    assert _parse(b'{"Results": []}', 4) == []
+
+
+def test_parser_rejects_truncated_array() -> None:
+    parser = ResultsParser(_FIELDS)
+    parser.feed(b'{"Results": [{"Guid": "1"}, {"Gu')
+
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_collector_deduplicates_by_guid() -> None:
+    collector = ResultCollector()
+    collector.extend([{"Guid": "a", "Seeders": 1}, {"Guid": "b", "Seeders": 2}, {"Guid": "a", "Seeders": 3}])
+
+    assert collector.results() == [{"Guid": "a", "Seeders": 3}, {"Guid": "b", "Seeders": 2}]
+    assert collector.seen == 3
+
+
+def test_collector_keeps_top_k_seeded_results() -> None:
+    collector = ResultCollector(limit=3)
+    collector.extend({"Guid": str(n), "Seeders": seeders} for n, seeders in enumerate([5, 0, 9, 1, 9, 7, 0]))
+
+    assert [r["Guid"] for r in collector.results()] == ["2", "4", "5"]
@@ -1,11 +1,13 @@
+import asyncio
 import urllib.parse
+from collections.abc import Callable
 from typing import Any
 
-import bencodepy
+import httpx
 import pytest
-import requests
 
 from feral_services import ru_torrent
+from feral_services.circuit_breaker import CircuitBreaker
 
 
 @pytest.mark.parametrize(
@@ -35,11 +37,8 @@ def test_format_return_url_key_error(url: str) -> None:
         ru_torrent._format_return_url(url)
 
 
-class MockResponse:
-    def __init__(self, status_code: int, ok: bool = True, url: str | None = None) -> None:
-        self.status_code = status_code
-        self.ok = ok
-        self.url = url
+def _torrent(name: bytes) -> bytes:
+    return b"d8:announce3:url4:infod6:lengthi1e4:name" + str(len(name)).encode() + b":" + name + b"ee"
 
 
 class MockTorrentInfo:
@@ -47,9 +46,37 @@ class MockTorrentInfo:
         return "formatted_response"
 
 
+def _ru_torrent_handler(
+    status_code: int, result: str | None = None, seen: list[httpx.Request] | None = None
+) -> Callable[[httpx.Request], httpx.Response]:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200)
+        if seen is not None:
+            seen.append(request)
+        if result:
+            return httpx.Response(302, headers={"Location": f"http://example.com/done?result[]={result}"})
+        return httpx.Response(status_code)
+
+    return handler
+
+
+def _mock_client(mocker: Any, handler: Callable[[httpx.Request], httpx.Response]) -> ru_torrent.RuTorrentClient:
+    client = ru_torrent.RuTorrentClient(
+        {"Authorization": "Basic test_token"}, backoff=0, transport=httpx.MockTransport(handler)
+    )
+    mocker.patch.object(ru_torrent, "_get_client", return_value=client)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def reset_breaker(mocker: Any) -> None:
+    mocker.patch.object(ru_torrent, "_BREAKER", CircuitBreaker("rutorrent", "all", failures=2))
+
+
 @pytest.fixture
 def mock_env(mocker: Any) -> None:
-    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com")
+    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com/addtorrent.php")
     mocker.patch.object(ru_torrent, "_HEADERS", {"Authorization": "Basic test_token"})
 
 
@@ -71,18 +98,14 @@ def mock_torrent_info() -> Any:
 def test_upload_torrent_label_formatting(
     mocker: Any, mock_env: Any, mock_torrent_info: Any, username: str, label: str, expected_label: str
 ) -> None:
-    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com")
-    mocker.patch.object(ru_torrent, "_HEADERS", {"Authorization": "Basic test_token"})
-    mock_response = MockResponse(status_code=200, ok=True, url="http://example.com?result[]=Success")
-    mocker.patch.object(requests, "post", return_value=mock_response)
-    mocker.patch.object(bencodepy, "decode", return_value={b"info": {b"name": b"test.torrent"}})
-    mocker.patch.object(urllib.parse, "quote", return_value="test.torrent")
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _ru_torrent_handler(200, "Success", seen))
 
-    ru_torrent.upload_torrent(b"fake_torrent", label, username, mock_torrent_info)
+    asyncio.run(ru_torrent.upload_torrent(_torrent(b"test.torrent"), label, username, mock_torrent_info))
 
-    assert requests.post.called
-    _, kwargs = requests.post.call_args
-    assert kwargs["params"]["label"] == expected_label
+    assert len(seen) == 1
+    assert seen[0].url.params["label"] == expected_label
+    assert seen[0].headers["Authorization"] == "Basic test_token"
 
 
 @pytest.mark.parametrize(
@@ -94,47 +117,33 @@ def test_upload_torrent_label_formatting(
     ],
 )
 def test_upload_torrent_name_encoding(
-    mocker: Any, mock_env: Any, mock_torrent_info: Any, torrent_name: str, quoted_name: str
+    mocker: Any, mock_env: Any, mock_torrent_info: Any, torrent_name: bytes, quoted_name: str
 ) -> None:
-    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com")
-    mocker.patch.object(ru_torrent, "_HEADERS", {"Authorization": "Basic test_token"})
-    mock_response = MockResponse(status_code=200, ok=True, url="http://example.com?result[]=Success")
-    mocker.patch.object(requests, "post", return_value=mock_response)
-    mocker.patch.object(bencodepy, "decode", return_value={b"info": {b"name": torrent_name}})
-    mocker.patch.object(urllib.parse, "quote", side_effect=urllib.parse.quote)
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _ru_torrent_handler(200, "Success", seen))
 
-    ru_torrent.upload_torrent(b"fake_torrent", "label", "user", mock_torrent_info)
+    asyncio.run(ru_torrent.upload_torrent(_torrent(torrent_name), "label", "user", mock_torrent_info))
 
-    assert requests.post.called
-    _, kwargs = requests.post.call_args
-    assert kwargs["files"]["torrent_file"][0] == quoted_name
+    assert f'name="torrent_file"; filename="{quoted_name}"'.encode() in seen[0].read()
 
 
 @pytest.mark.parametrize(
-    "response_data",
+    "status_code, result, expected_result",
     [
-        {"status_code": 200, "ok": True, "url": "http://example.com?result[]=Success"},
-        {"status_code": 400, "ok": False},
-        {"status_code": 500, "ok": False},
-        {"status_code": 200, "ok": True, "url": "http://example.com?result[]=Failure"},
+        (200, "Success", "formatted_response"),
+        (400, None, "Error: 400"),
+        (500, None, "Error: 500"),
+        (200, "Failure", "Error: 200"),
     ],
 )
-def test_upload_torrent_responses(mocker: Any, mock_env: Any, mock_torrent_info: Any, response_data: Any) -> None:
-    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com")
-    mocker.patch.object(ru_torrent, "_HEADERS", {"Authorization": "Basic test_token"})
-    mock_response = MockResponse(**response_data)
-    mocker.patch.object(requests, "post", return_value=mock_response)
-    mocker.patch.object(bencodepy, "decode", return_value={b"info": {b"name": b"test.torrent"}})
-    mocker.patch.object(urllib.parse, "quote", return_value="test.torrent")
+def test_upload_torrent_responses(
+    mocker: Any, mock_env: Any, mock_torrent_info: Any, status_code: int, result: str | None, expected_result: str
+) -> None:
+    _mock_client(mocker, _ru_torrent_handler(status_code, result))
 
-    result = ru_torrent.upload_torrent(b"fake_torrent", "label", "user", mock_torrent_info)
+    output = asyncio.run(ru_torrent.upload_torrent(_torrent(b"test.torrent"), "label", "user", mock_torrent_info))
 
-    if not mock_response.ok:
-        assert result == f"Error: {mock_response.status_code}"
-    elif "url" in response_data and "Success" in response_data["url"]:
-        assert result == "formatted_response"
-    else:
-        assert "Error" in result
+    assert output == expected_result
 
 
 @pytest.mark.parametrize(
@@ -150,43 +159,171 @@ def test_upload_torrent_responses(mocker: Any, mock_env: Any, mock_torrent_info:
 def test_upload_magnet_label_formatting(
     mocker: Any, mock_env: Any, username: str, label: str, expected_label: str
 ) -> None:
-    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com")
-    mocker.patch.object(ru_torrent, "_HEADERS", {"Authorization": "Basic test_token"})
-    mock_response = MockResponse(status_code=200, ok=True, url="http://example.com?result[]=Success")
-    mocker.patch.object(requests, "post", return_value=mock_response)
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _ru_torrent_handler(200, "Success", seen))
 
-    ru_torrent.upload_magnet("magnet:?xt=test", label, username)
+    asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", label, username))
 
-    assert requests.post.called
-    _, kwargs = requests.post.call_args
-    assert kwargs["params"]["label"] == expected_label
+    assert seen[0].url.params["label"] == expected_label
+    assert urllib.parse.parse_qs(seen[0].read().decode()) == {"url": ["magnet:?xt=test"]}
 
 
 @pytest.mark.parametrize(
-    "response_data, torrent_info, expected_result",
+    "status_code, result, torrent_info, expected_result",
     [
-        (
-            {"status_code": 200, "ok": True, "url": "http://example.com?result[]=Success"},
-            MockTorrentInfo(),
-            "formatted_response",
-        ),
-        ({"status_code": 200, "ok": True, "url": "http://example.com?result[]=Success"}, None, "Success"),
-        ({"status_code": 400, "ok": False}, MockTorrentInfo(), "Error: 400"),
-        ({"status_code": 400, "ok": False}, None, "Error: 400"),
-        (
-            {"status_code": 200, "ok": True, "url": "http://example.com?result[]=Failure"},
-            MockTorrentInfo(),
-            "Error: 200",
-        ),
+        (200, "Success", MockTorrentInfo(), "formatted_response"),
+        (200, "Success", None, "Success"),
+        (400, None, MockTorrentInfo(), "Error: 400"),
+        (400, None, None, "Error: 400"),
+        (200, "Failure", MockTorrentInfo(), "Error: 200"),
     ],
 )
 def test_upload_magnet_responses(
-    mocker: Any, mock_env: Any, response_data: Any, torrent_info: Any, expected_result: str
+    mocker: Any, mock_env: Any, status_code: int, result: str | None, torrent_info: Any, expected_result: str
 ) -> None:
-    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com")
-    mocker.patch.object(ru_torrent, "_HEADERS", {"Authorization": "Basic test_token"})
-    mock_response = MockResponse(**response_data)
-    mocker.patch.object(requests, "post", return_value=mock_response)
+    _mock_client(mocker, _ru_torrent_handler(status_code, result))
+
+    output = asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", "label", "user", torrent_info))
+
+    assert output == expected_result
+
+
+def test_upload_not_configured(mocker: Any) -> None:
+    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", None)
+
+    output = asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", "label", "user"))
+
+    assert output == "Error: RU_TORRENT_URL not configured"
+
+
+def test_upload_retries_server_errors_and_connection_errors(mocker: Any, mock_env: Any) -> None:
+    outcomes: list[Exception | int] = [httpx.ConnectError("refused"), 503]
+    success = _ru_torrent_handler(200, "Success")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST" and outcomes:
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return httpx.Response(outcome)
+        return success(request)
+
+    _mock_client(mocker, handler)
+
+    output = asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", "label", "user"))
+
+    assert output == "Success"
+    assert outcomes == []
+
+
+def test_upload_gives_up_after_retries(mocker: Any, mock_env: Any) -> None:
+    attempts = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal attempts
+        attempts += 1
+        raise httpx.ConnectError("refused")
+
+    _mock_client(mocker, handler)
+
+    output = asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", "label", "user"))
+
+    assert output == "Error: ruTorrent didn't respond"
+    assert attempts == ru_torrent._RETRIES + 1
+
+
+def test_upload_fails_fast_while_circuit_is_open(mocker: Any, mock_env: Any) -> None:
+    handler = mocker.Mock(side_effect=httpx.ConnectError("refused"))
+    _mock_client(mocker, handler)
+
+    for _ in range(2):
+        asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", "label", "user"))
+    output = asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", "label", "user"))
+
+    assert output == "Error: ruTorrent is unavailable, retrying in 30s"
+    assert handler.call_count == 2 * (ru_torrent._RETRIES + 1)
+
+
+def test_upload_does_not_retry_client_errors(mocker: Any, mock_env: Any) -> None:
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _ru_torrent_handler(403, seen=seen))
+
+    output = asyncio.run(ru_torrent.upload_magnet("magnet:?xt=test", "label", "user"))
+
+    assert output == "Error: 403"
+    assert len(seen) == 1
+
+
+def test_upload_torrent_rejects_invalid_file(mocker: Any, mock_env: Any, mock_torrent_info: Any) -> None:
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _ru_torrent_handler(200, "Success", seen))
+
+    output = asyncio.run(ru_torrent.upload_torrent(b"<html>login</html>", "label", "user", mock_torrent_info))
+
+    assert output == "Error: Not a valid torrent file"
+    assert seen == []
+
+
+def _httprpc_handler(hashes: list[str], seen: list[httpx.Request]) -> Callable[[httpx.Request], httpx.Response]:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200)
+        seen.append(request)
+        if request.url.path.endswith("action.php"):
+            return httpx.Response(200, json={"t": {info_hash: [] for info_hash in hashes}, "cid": 1})
+        return httpx.Response(302, headers={"Location": "http://example.com/done?result[]=Success"})
+
+    return handler
+
+
+@pytest.fixture
+def mock_rpc_env(mocker: Any, mock_env: Any) -> None:
+    mocker.patch.object(ru_torrent, "_RU_TORRENT_URL", "http://example.com/rutorrent/php/addtorrent.php")
+    mocker.patch.object(ru_torrent, "_LOADED", ru_torrent.TTLCache(max_size=1, ttl=30))
+    mocker.patch.dict("os.environ", {"RU_TORRENT_RPC_URL": ""})
+
+
+def test_is_loaded_lists_torrents_once(mocker: Any, mock_rpc_env: Any) -> None:
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _httprpc_handler(["ABCDEF"], seen))
+
+    async def check() -> list[bool]:
+        return [await ru_torrent.is_loaded("abcdef"), await ru_torrent.is_loaded("012345")]
+
+    assert asyncio.run(check()) == [True, False]
+    assert len(seen) == 1
+    assert str(seen[0].url) == "http://example.com/rutorrent/plugins/httprpc/action.php"
+    assert seen[0].content == b"mode=list"
+
+
+def test_is_loaded_relists_after_upload(mocker: Any, mock_rpc_env: Any) -> None:
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _httprpc_handler([], seen))
+
+    async def check() -> None:
+        await ru_torrent.is_loaded("abcdef")
+        await ru_torrent.upload_magnet("magnet:?xt=test", "label", "user")
+        await ru_torrent.is_loaded("abcdef")
+
+    asyncio.run(check())
+
+    assert [request.url.path.rsplit("/", 1)[-1] for request in seen] == ["action.php", "addtorrent.php", "action.php"]
+
+
+@pytest.mark.parametrize(
+    "response",
+    [httpx.Response(404), httpx.Response(200, text="not json"), httpx.Response(200, json=[])],
+)
+def test_is_loaded_unknown_when_listing_fails(mocker: Any, mock_rpc_env: Any, response: httpx.Response) -> None:
+    _mock_client(mocker, lambda request: response)
+
+    assert asyncio.run(ru_torrent.is_loaded("abcdef")) is False
+
+
+def test_is_loaded_without_rpc_url(mocker: Any, mock_env: Any) -> None:
+    mocker.patch.dict("os.environ", {"RU_TORRENT_RPC_URL": ""})
+    seen: list[httpx.Request] = []
+    _mock_client(mocker, _httprpc_handler(["abcdef"], seen))
 
-    result = ru_torrent.upload_magnet("magnet:?xt=test", "label", "user", torrent_info)
-    assert result == expected_result
+    assert asyncio.run(ru_torrent.is_loaded("abcdef")) is False
+    assert seen == []
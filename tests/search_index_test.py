@@ -0,0 +1,61 @@
+import os
+from typing import Any
+
+from feral_services.search_index import SearchIndex
+from tests.helpers import FakeClock
+
+
+def _result(guid: str, title: str, seeders: int) -> dict[str, Any]:
+    return {"Guid": guid, "Title": title, "Seeders": seeders, "Size": 1024**3, "Tracker": "1337x"}
+
+
+def test_search_matches_every_word_in_any_order(tmp_path: str) -> None:
+    index = SearchIndex(os.path.join(tmp_path, "index.db"), max_age=3600)
+    index.add(
+        [
+            _result("1", "Arcane.S01E01.1080p.WEB-GROUP", 10),
+            _result("2", "Arcane S02E01 2160p", 50),
+            _result("3", "Arcade Fire Live", 99),
+        ]
+    )
+
+    results, _ = index.search("arcane") or ([], 0)
+    assert [r["Guid"] for r in results] == ["2", "1"]
+    results, _ = index.search("1080p ARCANE") or ([], 0)
+    assert [r["Guid"] for r in results] == ["1"]
+    assert index.search("arcane 720p") is None
+    assert index.search("...") is None
+
+
+def test_add_upserts_by_guid(tmp_path: str) -> None:
+    clock = FakeClock()
+    index = SearchIndex(os.path.join(tmp_path, "index.db"), max_age=3600, clock=clock)
+    index.add([_result("1", "Old Title", 5)])
+    clock.now += 60
+    index.add([_result("1", "New Title", 7)])
+
+    assert index.search("old") is None
+    assert index.search("new title") == ([_result("1", "New Title", 7)], clock.now)
+    assert len(index) == 1
+
+
+def test_results_expire_and_are_pruned(tmp_path: str) -> None:
+    clock = FakeClock()
+    index = SearchIndex(os.path.join(tmp_path, "index.db"), max_age=3600, clock=clock)
+    index.add([_result("1", "Some Show", 5)])
+    clock.now += 3600
+
+    assert index.search("show") is None
+    index.add([_result("2", "Other Show", 5)])
+    assert len(index) == 1
+
+
+def test_persists_and_opens_lazily(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "index.db")
+    index = SearchIndex(path, max_age=3600)
+    assert not os.path.exists(path)
+
+    index.add([_result("1", "Some Show", 5)])
+    index.close()
+
+    assert SearchIndex(path, max_age=3600).search("show") is not None
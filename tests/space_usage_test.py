@@ -0,0 +1,184 @@
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from feral_services import space_usage
+from feral_services.home_size import HomeSizeTracker
+from feral_services.space_usage import BackgroundUsage, SpaceMonitor, SpaceUsage
+from tests.helpers import FakeClock
+
+_QUOTA_OUTPUT = """Disk quotas for user feral (uid 1000):
+     Filesystem  blocks   quota   limit   grace   files   quota   limit   grace
+      /dev/md0  1048576*  1000000  2097152   6days    1234       0       0
+"""
+
+
+def _run(stdout: str) -> Any:
+    return lambda *args, **kwargs: subprocess.CompletedProcess(args, 1, stdout=stdout)
+
+
+def test_quota_usage_parses_blocks_and_limit(mocker: Any) -> None:
+    mocker.patch.object(space_usage.shutil, "which", return_value="/usr/bin/quota")
+    mocker.patch.object(space_usage.subprocess, "run", side_effect=_run(_QUOTA_OUTPUT))
+
+    usage = space_usage.quota_usage()
+
+    assert usage is not None and (usage.used, usage.limit) == (1024**3, 2 * 1024**3)
+
+
+def test_quota_usage_without_quotas(mocker: Any) -> None:
+    mocker.patch.object(space_usage.shutil, "which", return_value="/usr/bin/quota")
+    mocker.patch.object(space_usage.subprocess, "run", side_effect=_run("Disk quotas for user feral (uid 1000): none"))
+
+    assert space_usage.quota_usage() is None
+
+
+def test_statvfs_usage_reports_the_filesystem(tmp_path: Path) -> None:
+    usage = space_usage.statvfs_usage(str(tmp_path))
+    stats = os.statvfs(tmp_path)
+
+    assert usage is not None and usage.limit == stats.f_blocks * stats.f_frsize
+    assert 0 < usage.used <= usage.limit
+
+
+def test_du_usage_counts_the_tree(tmp_path: Path) -> None:
+    (tmp_path / "file").write_bytes(b"x" * 100_000)
+
+    usage = space_usage.du_usage(str(tmp_path))
+
+    assert usage is not None and usage.used >= 100_000 and usage.limit is None
+
+
+def test_walk_usage_waits_for_the_first_scan(tmp_path: Path) -> None:
+    (tmp_path / "file").write_bytes(b"x" * 10)
+    tracker = HomeSizeTracker(str(tmp_path))
+
+    assert space_usage.walk_usage(tracker) is None
+    tracker.scan()
+    assert space_usage.walk_usage(tracker) == SpaceUsage(10, measured_at=tracker.updated_at or 0)
+
+
+def test_monitor_falls_through_failing_providers_and_caches(mocker: Any) -> None:
+    clock = FakeClock()
+    broken = mocker.Mock(side_effect=OSError)
+    missing = mocker.Mock(return_value=None)
+    working = mocker.Mock(return_value=SpaceUsage(5, 10))
+    monitor = SpaceMonitor([("a", broken), ("b", missing), ("c", working)], ttl=60, clock=clock)
+
+    assert monitor.usage() == SpaceUsage(5, 10, source="c")
+    clock.now = 59
+    monitor.usage()
+    assert working.call_count == 1
+
+    clock.now = 60
+    monitor.usage()
+    monitor.usage(refresh=True)
+    assert working.call_count == 3
+
+
+def _wait_for(background: BackgroundUsage) -> None:
+    deadline = time.monotonic() + 1
+    while background.refreshing and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_background_usage_answers_with_the_last_reading(mocker: Any) -> None:
+    clock = FakeClock()
+    measured = threading.Event()
+    readings = iter([SpaceUsage(1), SpaceUsage(2)])
+    provider = mocker.Mock(side_effect=lambda: measured.wait(1) and next(readings))
+    background = BackgroundUsage(provider, ttl=60, clock=clock)
+
+    assert background.read() == (None, True)
+    measured.set()
+    _wait_for(background)
+    assert background.read() == (SpaceUsage(1), False)
+
+    measured.clear()
+    clock.now = 60
+    assert background.read() == (SpaceUsage(1), False)
+    assert background.refreshing
+    measured.set()
+    _wait_for(background)
+    assert background.read() == (SpaceUsage(2), False)
+    assert provider.call_count == 2
+
+
+def test_background_usage_keeps_the_last_reading_when_one_fails(mocker: Any) -> None:
+    provider = mocker.Mock(side_effect=[SpaceUsage(1), subprocess.TimeoutExpired("du", 300)])
+    background = BackgroundUsage(provider, ttl=60)
+
+    background.read()
+    _wait_for(background)
+    background.read(refresh=True)
+    _wait_for(background)
+
+    assert background.read() == (SpaceUsage(1), False)
+    assert provider.call_count == 2
+
+
+def test_monitor_does_not_wait_for_a_background_reading(mocker: Any) -> None:
+    measured = threading.Event()
+    du = BackgroundUsage(mocker.Mock(side_effect=lambda: measured.wait(1) and SpaceUsage(7)), ttl=60)
+    walk = mocker.Mock(return_value=SpaceUsage(9))
+    monitor = SpaceMonitor([("du", du), ("walk", walk)], ttl=60)
+
+    assert monitor.usage() is None
+    assert monitor.refreshing("du")
+    measured.set()
+    _wait_for(du)
+
+    assert monitor.usage() == SpaceUsage(7, source="du")
+    assert not walk.called
+
+
+def test_monitor_falls_back_when_a_background_reading_fails(mocker: Any) -> None:
+    du = BackgroundUsage(mocker.Mock(side_effect=OSError), ttl=60)
+    monitor = SpaceMonitor([("du", du), ("walk", lambda: SpaceUsage(9))], ttl=60)
+
+    monitor.usage()
+    _wait_for(du)
+
+    assert monitor.usage() == SpaceUsage(9, source="walk")
+
+
+def test_monitor_limit_overrides_provider_limit() -> None:
+    monitor = SpaceMonitor([("a", lambda: SpaceUsage(5, 10))], ttl=60, limit=100)
+
+    assert monitor.usage() == SpaceUsage(5, 100, source="a")
+
+
+def test_monitor_does_not_cache_a_missing_answer(mocker: Any) -> None:
+    provider = mocker.Mock(side_effect=[None, SpaceUsage(1)])
+    monitor = SpaceMonitor([("a", provider)], ttl=60)
+
+    assert monitor.usage() is None
+    assert monitor.usage() == SpaceUsage(1, source="a")
+
+
+@pytest.mark.parametrize(
+    ("setting", "expected"),
+    [(None, ["quota", "du", "walk"]), ("walk, statvfs,unknown", ["walk", "statvfs"])],
+)
+def test_providers_from_env(setting: str | None, expected: list[str], monkeypatch: Any, tmp_path: Path) -> None:
+    if setting is None:
+        monkeypatch.delenv("SPACE_PROVIDERS", raising=False)
+    else:
+        monkeypatch.setenv("SPACE_PROVIDERS", setting)
+
+    providers = space_usage.providers_from_env(str(tmp_path), HomeSizeTracker(str(tmp_path)))
+
+    assert [name for name, _ in providers] == expected
+
+
+def test_tree_providers_measure_hourly(monkeypatch: Any, tmp_path: Path) -> None:
+    monkeypatch.setenv("SPACE_PROVIDERS", "du,walk")
+
+    providers = dict(space_usage.providers_from_env(str(tmp_path), HomeSizeTracker(str(tmp_path))))
+
+    assert all(isinstance(provider, BackgroundUsage) and provider.ttl == 3600 for provider in providers.values())
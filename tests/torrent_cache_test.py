@@ -0,0 +1,148 @@
+import os
+import time
+
+import pytest
+
+from feral_services.torrent_cache import ResolvedTorrent, TorrentCache, magnet_info_hash
+from tests.helpers import FakeClock
+
+_HASH = "c12fe1c06bba254a9dc9f519b335aa7c1367a88a"
+_MAGNET = f"magnet:?xt=urn:btih:{_HASH.upper()}&dn=Some.Movie"
+
+
+def _torrent(name: bytes) -> bytes:
+    return b"d8:announce3:url4:infod6:lengthi1e4:name" + str(len(name)).encode() + b":" + name + b"ee"
+
+
+@pytest.mark.parametrize(
+    "magnet, expected",
+    [
+        (_MAGNET, _HASH),
+        ("magnet:?dn=x&xt=urn:btih:YEX6DQDLXISUVHOJ6UM3GNNKPQJWPKEK", _HASH),
+        ("magnet:?xt=urn:sha1:YEX6DQDLUISUVHOJ6UM3GNNKPQJWPKEK", None),
+        ("magnet:?xt=urn:btih:tooshort", None),
+    ],
+)
+def test_magnet_info_hash(magnet: str, expected: str | None) -> None:
+    assert magnet_info_hash(magnet) == expected
+
+
+def test_resolved_torrent_hashes_torrent_file_or_magnet() -> None:
+    assert ResolvedTorrent.create(_MAGNET, None).info_hash == _HASH
+    assert ResolvedTorrent.create(None, _torrent(b"name")).info_hash
+    assert ResolvedTorrent.create(None, b"not a torrent").info_hash is None
+
+
+def test_get_by_guid_and_info_hash(tmp_path: str) -> None:
+    cache = TorrentCache(str(tmp_path), max_bytes=1024, ttl=60)
+    torrent = ResolvedTorrent.create(None, _torrent(b"name"))
+    cache.put("guid-1", torrent)
+
+    assert cache.get("guid-1") == torrent
+    assert cache.get("other-guid", torrent.info_hash or "") == torrent
+    assert cache.get("unknown") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_magnets_are_cached(tmp_path: str) -> None:
+    cache = TorrentCache(str(tmp_path), max_bytes=1024, ttl=60)
+    cache.put("guid-1", ResolvedTorrent.create(_MAGNET, None))
+
+    assert cache.get("guid-1") == ResolvedTorrent(_HASH, _MAGNET, None)
+
+
+def test_survives_restart(tmp_path: str) -> None:
+    torrent = ResolvedTorrent.create(None, _torrent(b"name"))
+    TorrentCache(str(tmp_path), max_bytes=1024, ttl=60).put("guid-1", torrent)
+
+    assert TorrentCache(str(tmp_path), max_bytes=1024, ttl=60).get("guid-1") == torrent
+
+
+def test_directory_is_created_on_first_use(tmp_path: str) -> None:
+    directory = os.path.join(tmp_path, "cache")
+    cache = TorrentCache(directory, max_bytes=1024, ttl=60)
+
+    assert not os.path.exists(directory)
+    assert cache.get("guid-1") is None
+    assert os.path.isdir(directory)
+
+
+def test_entries_expire(tmp_path: str) -> None:
+    clock = FakeClock()
+    cache = TorrentCache(str(tmp_path), max_bytes=1024, ttl=60, clock=clock)
+    torrent = ResolvedTorrent.create(_MAGNET, None)
+    cache.put("guid-1", torrent)
+    for name in os.listdir(tmp_path):
+        os.utime(os.path.join(tmp_path, name), (clock.now, clock.now))
+
+    clock.now += 59
+    assert cache.get("guid-1") == torrent
+    clock.now += 1
+    assert cache.get("guid-1") is None
+    assert cache.get("guid-1", _HASH) is None
+    assert len(cache) == 0
+
+
+def _entry_size(torrent: ResolvedTorrent) -> int:
+    return len(torrent.torrent_file or b"") + len(torrent.info_hash or "")
+
+
+def test_evicts_least_recently_used(tmp_path: str) -> None:
+    torrents = [ResolvedTorrent.create(None, _torrent(name)) for name in (b"aaaa", b"bbbb", b"cccc")]
+    cache = TorrentCache(str(tmp_path), max_bytes=_entry_size(torrents[0]) * 2, ttl=60)
+    cache.put("a", torrents[0])
+    cache.put("b", torrents[1])
+    cache.get("a")
+    cache.put("c", torrents[2])
+
+    assert cache.get("a") == torrents[0]
+    assert cache.get("b") is None
+    assert cache.get("c") == torrents[2]
+
+
+def test_skips_entries_without_info_hash_or_too_large(tmp_path: str) -> None:
+    cache = TorrentCache(str(tmp_path), max_bytes=8, ttl=60)
+    cache.put("a", ResolvedTorrent.create(None, b"not a torrent"))
+    cache.put("b", ResolvedTorrent.create(None, _torrent(b"name")))
+
+    assert len(cache) == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_aliases_count_towards_the_limit_and_go_with_their_content(tmp_path: str) -> None:
+    torrents = [ResolvedTorrent.create(None, _torrent(name)) for name in (b"aaaa", b"bbbb")]
+    cache = TorrentCache(str(tmp_path), max_bytes=_entry_size(torrents[0]) + 40 * 3, ttl=60)
+    for guid in ("a1", "a2", "a3"):
+        cache.put(guid, torrents[0])
+    cache.put("b", torrents[1])
+
+    assert cache.get("a1") is None
+    assert cache.get("b") == torrents[1]
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{torrents[1].info_hash}.torrent", cache._alias_name("b")])
+
+
+def test_orphaned_aliases_are_removed_on_load(tmp_path: str) -> None:
+    torrent = ResolvedTorrent.create(_MAGNET, None)
+    TorrentCache(str(tmp_path), max_bytes=1024, ttl=60).put("guid-1", torrent)
+    os.remove(os.path.join(tmp_path, f"{_HASH}.magnet"))
+
+    cache = TorrentCache(str(tmp_path), max_bytes=1024, ttl=60)
+
+    assert cache.get("guid-1") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_hits_keep_entries_across_restarts(tmp_path: str) -> None:
+    torrents = [ResolvedTorrent.create(None, _torrent(name)) for name in (b"aaaa", b"bbbb", b"cccc")]
+    clock = FakeClock()
+    clock.now = time.time() + 100
+    first = TorrentCache(str(tmp_path), max_bytes=_entry_size(torrents[0]) * 2, ttl=600, clock=clock)
+    first.put("a", torrents[0])
+    first.put("b", torrents[1])
+    first.get("a")
+
+    restarted = TorrentCache(str(tmp_path), max_bytes=_entry_size(torrents[0]) * 2, ttl=600, clock=clock)
+    restarted.put("c", torrents[2])
+
+    assert restarted.get("a") == torrents[0]
+    assert restarted.get("b") is None
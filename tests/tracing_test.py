@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+from typing import Any
+
+import pytest
+
+from feral_services import tracing
+from tests.helpers import FakeClock
+
+
+def _read_traces(path: str) -> list[dict]:
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_span_outside_a_trace_is_a_no_op() -> None:
+    with tracing.span("orphan") as span:
+        tracing.annotate(ignored=True)
+
+    assert span is None
+
+
+def test_slow_requests_are_written_with_their_span_tree(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "traces.jsonl")
+    tracer = tracing.Tracer(path, slow_seconds=0)
+
+    @tracer.trace("search")
+    async def handler() -> str:
+        tracing.annotate(query="arcane")
+        with tracing.span("jackett.search", indexer="all"):
+            await asyncio.gather(child("a"), child("b"))
+        with tracing.span("format_results"):
+            pass
+        return "done"
+
+    async def child(name: str) -> None:
+        with tracing.span("rutorrent.post", target=name):
+            await asyncio.sleep(0)
+
+    assert asyncio.run(handler()) == "done"
+    tracer.close()
+
+    [trace] = _read_traces(path)
+    assert trace["name"] == "search"
+    assert trace["attributes"] == {"query": "arcane"}
+    assert [child["name"] for child in trace["children"]] == ["jackett.search", "format_results"]
+    assert [child["attributes"]["target"] for child in trace["children"][0]["children"]] == ["a", "b"]
+    assert trace["duration"] >= trace["children"][0]["duration"]
+
+
+def test_fast_requests_are_not_written(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "traces.jsonl")
+    tracer = tracing.Tracer(path, slow_seconds=60)
+
+    @tracer.trace("space")
+    async def handler() -> None:
+        pass
+
+    asyncio.run(handler())
+    tracer.close()
+
+    assert (tracer.traced, tracer.written) == (1, 0)
+    assert not os.path.exists(path)
+
+
+def test_errors_are_recorded(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "traces.jsonl")
+    tracer = tracing.Tracer(path, slow_seconds=0)
+
+    @tracer.trace("get")
+    async def handler() -> None:
+        with tracing.span("jackett.fetch_link"):
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(handler())
+    tracer.close()
+
+    [trace] = _read_traces(path)
+    assert trace["attributes"] == {"error": "RuntimeError"}
+    assert trace["children"][0]["attributes"] == {"error": "RuntimeError"}
+
+
+def test_keeps_profiles_of_the_slowest_requests(tmp_path: str) -> None:
+    profile_dir = os.path.join(tmp_path, "profiles")
+    clock = FakeClock()
+    tracer = tracing.Tracer(
+        os.path.join(tmp_path, "traces.jsonl"), slow_seconds=60, profile_top=2, profile_dir=profile_dir, clock=clock
+    )
+
+    @tracer.trace("search")
+    async def handler(delay: float) -> None:
+        clock.now += delay
+
+    for delay in (3, 1, 4, 2):
+        asyncio.run(handler(delay))
+    tracer.close()
+
+    kept = sorted(tracer._slowest, reverse=True)
+    assert [duration for duration, _ in kept] == [4, 3]
+    assert sorted(os.listdir(profile_dir)) == sorted(os.path.basename(path) for _, path in kept)
+
+
+def test_from_env(mocker: Any, tmp_path: str) -> None:
+    mocker.patch.dict("os.environ", {"PROFILE": ""})
+    assert tracing.from_env() is None
+
+    mocker.patch.dict(
+        "os.environ",
+        {"PROFILE": "1", "PROFILE_SLOW_SECONDS": "2.5", "PROFILE_TRACE_FILE": os.path.join(tmp_path, "t.jsonl")},
+    )
+    tracer = tracing.from_env()
+    assert tracer is not None
+    assert (tracer.slow_seconds, tracer.profile_top) == (2.5, 0)
+    tracer.close()
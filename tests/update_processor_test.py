@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+
+import pytest
+from telegram import Chat, Message, Update
+
+from feral_services.update_processor import ChatOrderedUpdateProcessor
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(chat_id, Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, datetime.datetime.now(datetime.UTC), chat))
+
+
+def _run(processor: ChatOrderedUpdateProcessor, updates: list[tuple[Update | object, float]]) -> list[str]:
+    events: list[str] = []
+
+    async def handle(name: str, delay: float) -> None:
+        events.append(f"start {name}")
+        await asyncio.sleep(delay)
+        events.append(f"end {name}")
+
+    async def run() -> None:
+        async with processor:
+            await asyncio.gather(
+                *(processor.process_update(update, handle(str(n), delay)) for n, (update, delay) in enumerate(updates))
+            )
+
+    asyncio.run(run())
+    return events
+
+
+def test_updates_from_one_chat_run_in_order() -> None:
+    events = _run(ChatOrderedUpdateProcessor(4), [(_update(n, 1), delay) for n, delay in enumerate([0.03, 0, 0.01])])
+
+    assert events == ["start 0", "end 0", "start 1", "end 1", "start 2", "end 2"]
+
+
+def test_chats_run_concurrently() -> None:
+    events = _run(ChatOrderedUpdateProcessor(4), [(_update(0, 1), 0.02), (_update(1, 2), 0.01)])
+
+    assert events == ["start 0", "start 1", "end 1", "end 0"]
+
+
+def test_worker_limit_is_respected() -> None:
+    processor = ChatOrderedUpdateProcessor(2)
+    peak = 0
+
+    async def handle() -> None:
+        nonlocal peak
+        peak = max(peak, processor.active)
+        await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        async with processor:
+            await asyncio.gather(*(processor.process_update(_update(n, n), handle()) for n in range(6)))
+
+    asyncio.run(run())
+
+    assert peak == 2
+    assert (processor.active, processor.pending) == (0, 0)
+
+
+def test_chat_backlog_does_not_hold_workers() -> None:
+    updates: list[tuple[Update | object, float]] = [(_update(n, 1), 0.02) for n in range(4)]
+    updates.append((_update(4, 2), 0))
+
+    events = _run(ChatOrderedUpdateProcessor(2), updates)
+
+    assert events.index("end 4") < events.index("end 0")
+
+
+def test_idle_lends_the_worker_but_keeps_the_chat_order() -> None:
+    processor = ChatOrderedUpdateProcessor(1)
+    events: list[str] = []
+
+    async def queued(name: str) -> None:
+        events.append(f"start {name}")
+        async with processor.idle():
+            await asyncio.sleep(0.05)
+        events.append(f"end {name}")
+
+    async def handle(name: str) -> None:
+        events.append(f"start {name}")
+        events.append(f"end {name}")
+
+    async def run() -> None:
+        async with processor:
+            await asyncio.gather(
+                processor.process_update(_update(0, 1), queued("0")),
+                processor.process_update(_update(1, 1), handle("1")),
+                processor.process_update(_update(2, 2), handle("2")),
+            )
+
+    asyncio.run(run())
+
+    assert events == ["start 0", "start 2", "end 2", "end 0", "start 1", "end 1"]
+    assert (processor.active, processor.pending) == (0, 0)
+
+
+def test_idle_outside_an_update_is_a_no_op() -> None:
+    processor = ChatOrderedUpdateProcessor(1)
+
+    async def run() -> None:
+        async with processor:
+            async with processor.idle():
+                pass
+            await processor.process_update(_update(0, 1), asyncio.sleep(0))
+
+    asyncio.run(run())
+
+    assert processor.active == 0
+
+
+def test_updates_without_a_chat_are_processed() -> None:
+    assert _run(ChatOrderedUpdateProcessor(1), [(object(), 0)]) == ["start 0", "end 0"]
+
+
+def test_rejects_invalid_worker_count() -> None:
+    with pytest.raises(ValueError):
+        ChatOrderedUpdateProcessor(0)
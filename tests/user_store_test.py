@@ -0,0 +1,95 @@
+import json
+import os
+import time
+
+from feral_services.user_store import UserStore
+
+
+def _write_users(path: str, users: list[int]) -> None:
+    with open(path, "w") as file:
+        json.dump(users, file)
+
+
+def test_loads_existing_users(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "users.json")
+    _write_users(path, [1, 2])
+
+    store = UserStore(path)
+
+    assert 1 in store
+    assert 3 not in store
+    assert len(store) == 2
+
+
+def test_missing_file_is_empty(tmp_path: str) -> None:
+    store = UserStore(os.path.join(tmp_path, "users.json"))
+
+    assert len(store) == 0
+
+
+def test_file_is_read_on_first_use(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "users.json")
+    store = UserStore(path)
+    _write_users(path, [1])
+
+    assert 1 in store
+
+
+def test_writes_are_coalesced(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "users.json")
+    store = UserStore(path, delay=60)
+
+    for user_id in range(5000):
+        store.add(user_id)
+
+    assert 4999 in store
+    assert store.writes == 0
+    assert not os.path.exists(path)
+
+    store.close()
+
+    assert store.writes == 1
+    with open(path) as file:
+        assert json.load(file) == list(range(5000))
+    assert os.listdir(tmp_path) == ["users.json"]
+
+
+def test_flushes_after_delay(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "users.json")
+    store = UserStore(path, delay=0.01)
+
+    store.add(1)
+    deadline = time.monotonic() + 5
+    while store.writes == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert store.writes == 1
+    assert 1 in UserStore(path)
+
+
+def test_adding_known_user_does_not_write(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "users.json")
+    _write_users(path, [1])
+    store = UserStore(path)
+
+    store.add(1)
+    store.flush()
+
+    assert store.writes == 0
+
+
+def test_sqlite_imports_json_and_persists(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "users.json")
+    db_path = os.path.join(tmp_path, "users.sqlite")
+    _write_users(path, [1, 2])
+
+    store = UserStore(path, db_path=db_path, delay=60)
+    store.add(3)
+    assert 3 in store
+    assert len(store) == 3
+    store.close()
+
+    _write_users(path, [])
+    reopened = UserStore(path, db_path=db_path)
+    assert [user_id in reopened for user_id in (1, 2, 3, 4)] == [True, True, True, False]
+    reopened.close()